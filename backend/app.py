@@ -1,37 +1,95 @@
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flask_cors import CORS
-from google import genai
-from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import base64
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 import pickle       
 import numpy as np
+import json
 import uuid
 import os
+import time
+import threading
 from functools import wraps
+from model_registry import ModelRegistry
+from disease_specs import DISEASES
+from feature_schema import SchemaError
+from metrics import registry as metrics_registry, start_trace, finish_trace, span, record_inference, record_tokens
+from batching import MicroBatcher
+from batch_records import parse_batch_records
+from prediction_cache import PredictionCache, make_key
+from recommendation_cache import RecommendationCache
+from streaming import TimeToFirstByte, sse_event
+from auth_cache import TokenCache, start_token_watcher
+from db_indexes import ensure_indexes
+from chat_history import ChatSummarizer, append_messages_update, recent_messages_projection, needs_message_count, backfill_message_count
+from clients import Clients, CircuitOpenError, classify_upstream_error
+from jobs import JobQueue, QueueFullError
+from history_writer import HistoryWriter
+from passwords import PasswordHasher, PasswordHasherBusyError
+from prompts import Prompt, PromptBuilder, PreambleCache, TokenCounter
+from shadow import ShadowEvaluator
+from static_assets import StaticAssets, cached_response
+from disease_catalog import DiseaseCatalog
 
 load_dotenv()
 
-app = Flask(__name__, static_folder='./dist', static_url_path='')
+app = Flask(__name__, static_folder=None)
 CORS(app, origins=["http://localhost:5173", "*"])
 
 # Set the absolute path for the training folder
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'training')
 
-# MongoDB Configuration
-mongodb_uri = os.getenv('MONGODB_URI')
-
-client = MongoClient(mongodb_uri)
-db = client["insights_db"]
+# MongoDB and Gemini clients, created per process on first use with pooled,
+# time-limited connections behind circuit breakers (see clients.py)
+clients = Clients(os.getenv('MONGODB_URI'), os.getenv('GEMINI_API_KEY'))
 
 # User Schema
-users_collection = db["users"]
+users_collection = clients.managed_collection("users")
 # Chat History Schema
-chat_history_collection = db["chat_history"]
+chat_history_collection = clients.managed_collection("chat_history")
 # Form History Schema
-prediction_history_collection = db["prediction_history"]
+prediction_history_collection = clients.managed_collection("prediction_history")
+# Generated Recommendations Cache
+recommendation_cache_collection = clients.managed_collection("recommendation_cache")
+# Background Recommendation Jobs
+recommendation_jobs_collection = clients.managed_collection("recommendation_jobs")
+
+# Prediction history upserts, optionally buffered and flushed in bulk (see history_writer.py)
+history_writer = HistoryWriter(
+    prediction_history_collection,
+    enabled=os.getenv('HISTORY_WRITE_BEHIND', 'false').lower() == 'true',
+    flush_interval=int(os.getenv('HISTORY_FLUSH_INTERVAL_MS', '200')) / 1000,
+    max_batch=int(os.getenv('HISTORY_FLUSH_MAX_OPS', '500')),
+    max_pending=int(os.getenv('HISTORY_MAX_PENDING', '10000')),
+    max_attempts=int(os.getenv('HISTORY_FLUSH_MAX_ATTEMPTS', '5')),
+    retry_backoff=int(os.getenv('HISTORY_FLUSH_RETRY_BACKOFF_MS', '500')) / 1000
+)
+
+# Seconds finished recommendation jobs are kept, in memory and by the TTL index
+RECOMMENDATION_JOB_TTL = int(os.getenv('RECOMMENDATION_JOB_TTL', '3600'))
+# Seconds generated recommendations are reused, in memory and by the TTL index
+RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Build missing indexes in the background so startup does not wait on MongoDB
+if os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() == 'true':
+    threading.Thread(target=lambda: ensure_indexes(clients.db(), RECOMMENDATION_JOB_TTL, RECOMMENDATION_CACHE_TTL), daemon=True).start()
+
+# An open circuit breaker or a saturated password pool means try again later, not that the request failed
+def error_status(error):
+    return 503 if isinstance(error, (CircuitOpenError, PasswordHasherBusyError)) else 500
+
+# Password hashing runs on a few low-priority worker processes (see passwords.py)
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32')),
+    nice=int(os.getenv('PASSWORD_HASH_NICE', '10'))
+)
 
 JWT_SECRET_KEY = os.getenv('JWT_SECRET', 'super_secret_jwt_auth_key_which_is_not_so_secret') 
 
@@ -53,73 +111,334 @@ def decode_token(token):
         return None
         
 
-# Load the models and scalers
-def load_pickle(file_name):
-    with open(os.path.join(MODEL_DIR, file_name), 'rb') as f:
-        return pickle.load(f)
-
-# Load models
-models = {
-    'diabetes': load_pickle('diabetes_model.pkl'),
-    'heart': load_pickle('heart_model.pkl'),
-    'lung': load_pickle('lung_model.pkl'),
-    'parkinsons': load_pickle('parkinsons_model.pkl'),
-    'liver': load_pickle('liver_model.pkl')
-}
-
-# Load scalers
-scalers = {
-    'diabetes': load_pickle('diabetes_scaler.pkl'),
-    'heart': load_pickle('heart_scaler.pkl'),
-    'lung': load_pickle('lung_scaler.pkl'),
-    'parkinsons': load_pickle('parkinsons_scaler.pkl'),
-    'liver': load_pickle('liver_scaler.pkl')
-}
-
-# Optional: Set expected input counts for validation
-expected_input_counts = {
-    'diabetes': 8,
-    'heart': 13,
-    'lung': 15,
-    'parkinsons': 22,
-    'liver': 10
-}
-
-# Initialize Gemini AI with environment variable
-client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-
-def get_optional_user_id():
-    auth_header = request.headers.get('Authorization', None)
-    if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header.split(' ')[1]
-        user_id = decode_token(token)
+# Cache of prediction results keyed on disease, model version and feature vector
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+)
+
+# Models are loaded on first use and hot-swapped when train_models.py publishes a
+# new release (checked at most every MODEL_RELOAD_INTERVAL seconds). Cached
+# predictions of the replaced model are dropped.
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '5'))
+model_registry = ModelRegistry(
+    MODEL_DIR, list(DISEASES),
+    reload_interval=MODEL_RELOAD_INTERVAL,
+    on_reload=prediction_cache.invalidate
+)
+
+def current_model_version(disease):
+    return model_registry.version(disease)
+
+# Candidates staged with train_models.py --candidate score the same rows in the
+# background, and optionally serve a share of single predictions (see shadow.py)
+shadow = ShadowEvaluator(
+    model_registry,
+    enabled=os.getenv('SHADOW_EVALUATION', 'true').lower() == 'true',
+    sample_rate=float(os.getenv('SHADOW_SAMPLE_RATE', '1.0')),
+    traffic_percent=float(os.getenv('CANDIDATE_TRAFFIC_PERCENT', '0')),
+    max_pending=int(os.getenv('SHADOW_MAX_PENDING', '256')),
+    refresh_interval=MODEL_RELOAD_INTERVAL
+)
+
+# Prediction form metadata for the frontend, rebuilt when a model release changes (see disease_catalog.py)
+disease_catalog = DiseaseCatalog(model_registry, DISEASES)
+DISEASE_METADATA_CACHE_CONTROL = f"public, max-age={int(os.getenv('DISEASE_METADATA_MAX_AGE', '300'))}"
+
+# Built frontend, served from memory with precompressed variants (see static_assets.py)
+static_assets = StaticAssets(os.getenv('STATIC_DIR') or os.path.join(os.path.dirname(__file__), 'dist'))
+
+# Expected input counts for validation, from the training spec
+expected_input_counts = {disease: len(spec['features']) for disease, spec in DISEASES.items()}
+
+# Upper bound on the number of records accepted by the batch prediction endpoint
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '10000'))
+
+# Decode one record through the disease's feature schema into out (a float64 row),
+# returns (values, error)
+def extract_features(disease, input_data, out=None):
+    try:
+        return model_registry.get(disease).schema.decode(input_data, out), None
+    except SchemaError as e:
+        return None, str(e)
+
+# Run the model once over a whole matrix of records, returns one result dict per row.
+# With explain the same pass also yields the probability of the positive class and
+# how much each feature moved it away from the base probability of the forest.
+# Rows scored by the live model are shadowed by its candidate, if any.
+def run_predictions(disease, rows, explain=False, model_set=None):
+    data = rows if isinstance(rows, np.ndarray) else np.vstack(rows)
+    live = model_set is None
+    if live:
+        model_set = model_registry.get(disease)
+    started = time.perf_counter()
+    if explain:
+        predictions, probabilities, bias, contributions = model_set.explain(data)
+    else:
+        predictions = model_set.predict(data)
+    elapsed = time.perf_counter() - started
+    record_inference(disease, len(data), elapsed)
+    shadow.count_served(disease, 'live' if live else 'candidate', len(data))
+    if live:
+        shadow.observe(disease, model_set, data, predictions, elapsed)
+    positive = DISEASES[disease]['positive']
+    results = [{'prediction': 'Positive' if prediction == positive else 'Negative'} for prediction in predictions]
+    if explain:
+        for i, result in enumerate(results):
+            result['probability'] = round(float(probabilities[i]), 4)
+            if contributions is not None:
+                result['base_probability'] = round(bias, 4)
+                result['contributions'] = dict(zip(model_set.schema.features, np.round(contributions[i], 4).tolist()))
+    return results
+
+def wants_explanation():
+    return request.args.get('explain', 'false').lower() in ('1', 'true', 'yes')
+
+# Cached result of one decoded record, computed (and cached) on a miss. Explained
+# results also answer plain requests, plain ones are recomputed when explain is asked.
+def predict_values(disease, values, explain=False):
+    candidate = shadow.route(disease)
+    if candidate is not None:
+        # A/B traffic of the candidate bypasses the cache and the batcher
+        return run_predictions(disease, [values], explain, candidate)[0]
+    cache_key = make_key(disease, current_model_version(disease), values)
+    result = prediction_cache.get(cache_key)
+    if result is None or (explain and 'probability' not in result):
+        if MICRO_BATCHING and not explain:
+            result = batcher.predict(disease, values)
+        else:
+            result = run_predictions(disease, [values], explain)[0]
+        prediction_cache.set(cache_key, result)
+    return result
+
+# Keep only the prediction of a cached result unless an explanation was asked for
+def prediction_response(result, explain):
+    return dict(result) if explain else {'prediction': result['prediction']}
+
+# Coalesce concurrent single-row predictions into one vectorized call per disease
+MICRO_BATCHING = os.getenv('PREDICT_MICRO_BATCHING', 'true').lower() == 'true'
+batcher = MicroBatcher(
+    run_predictions,
+    window_ms=float(os.getenv('PREDICT_BATCH_WINDOW_MS', '2')),
+    max_batch_size=int(os.getenv('PREDICT_BATCH_MAX_SIZE', '64')),
+    timeout_ms=float(os.getenv('PREDICT_BATCH_TIMEOUT_MS', '250'))
+)
+
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-001')
+
+# Chat and recommendation prompts: fixed preambles, optionally held in Gemini's context
+# cache, and per-request text fitted to a token budget (see prompts.py)
+prompt_builder = PromptBuilder(
+    TokenCounter(GEMINI_MODEL),
+    token_budget=int(os.getenv('PROMPT_TOKEN_BUDGET', '4000'))
+)
+preamble_cache = PreambleCache(
+    clients.gemini, GEMINI_MODEL,
+    enabled=os.getenv('GEMINI_CONTEXT_CACHE', 'false').lower() == 'true',
+    ttl_seconds=int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600'))
+)
+
+# generate_content arguments for a Prompt or plain prompt text
+def gemini_request(prompt):
+    if isinstance(prompt, Prompt):
+        return {'contents': prompt.text, 'config': preamble_cache.config(prompt.preamble)}
+    return {'contents': prompt}
+
+def gemini_failed(prompt, request_args, error):
+    if isinstance(prompt, Prompt):
+        preamble_cache.failed(prompt.preamble, request_args['config'], error)
+
+# Gemini calls, each through the Gemini circuit breaker
+def gemini_generate(prompt):
+    request_args = gemini_request(prompt)
+    try:
+        with clients.gemini_breaker.guard():
+            response = clients.gemini().models.generate_content(model=GEMINI_MODEL, **request_args)
+    except Exception as e:
+        gemini_failed(prompt, request_args, e)
+        raise
+    prompt_builder.observe(prompt, response)
+    return response
+
+def gemini_stream(prompt):
+    request_args = gemini_request(prompt)
+    try:
+        with clients.gemini_breaker.guard():
+            yield from clients.gemini().models.generate_content_stream(model=GEMINI_MODEL, **request_args)
+    except Exception as e:
+        gemini_failed(prompt, request_args, e)
+        raise
+
+# Time to first byte of the LLM routes, streamed and buffered
+stream_stats = TimeToFirstByte()
+
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Cache of Gemini recommendations shared by identical recommend requests
+recommendation_cache = RecommendationCache(
+    recommendation_cache_collection,
+    ttl_seconds=RECOMMENDATION_CACHE_TTL,
+    memory_entries=int(os.getenv('RECOMMENDATION_CACHE_MEMORY_SIZE', '1000')),
+    model_version=current_model_version
+)
+
+# Optionally seed the recommendation cache from saved prediction history in the background
+RECOMMENDATION_CACHE_WARM_LIMIT = int(os.getenv('RECOMMENDATION_CACHE_WARM_LIMIT', '0'))
+if RECOMMENDATION_CACHE_WARM_LIMIT > 0:
+    threading.Thread(
+        target=recommendation_cache.warm_from_history,
+        args=(prediction_history_collection, RECOMMENDATION_CACHE_WARM_LIMIT),
+        daemon=True
+    ).start()
+
+# Tokens already confirmed against the users collection, kept for a short TTL
+token_cache = TokenCache(
+    ttl_seconds=float(os.getenv('AUTH_TOKEN_CACHE_TTL', '30')),
+    max_entries=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+)
+if os.getenv('AUTH_CHANGE_STREAM', 'false').lower() == 'true':
+    start_token_watcher(users_collection, token_cache)
+
+def token_query(token, user_id):
+    return {'id': user_id, 'auth_token': token}
+
+# Check that a decoded token is still the user's current one, returns the user_id or None
+def verify_token(token, user_id=None):
+    user_id = user_id or decode_token(token)
+    if not user_id:
+        return None
+    if token_cache.get(token) == user_id:
         return user_id
-    return None
+    if not users_collection.find_one(token_query(token, user_id), {'_id': 1}):
+        return None
+    token_cache.set(token, user_id)
+    return user_id
+
+def get_bearer_token(headers):
+    auth_header = headers.get('Authorization', None)
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1].strip()
+
+# Read the SessionId and bearer token of a request, returns (session_id, token, user_id)
+def parse_session_headers(headers):
+    session_id = headers.get('SessionId', None)
+    if not session_id:
+        return None, None, None
+    # create or update based on session_id
+    token = get_bearer_token(headers) or ''
+    return session_id, token, decode_token(token)
+
+# Resolve the signed-in user of a session request, returns (session_id, user_id, error_response)
+def get_session_user():
+    with span('auth'):
+        session_id, token, user_id = parse_session_headers(request.headers)
+        if user_id and not verify_token(token, user_id):
+            return session_id, None, (jsonify({'error': 'Invalid token'}), 401)
+    return session_id, user_id, None
 
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization', None)
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token = get_bearer_token(request.headers)
+        if not token:
             return jsonify({'error': 'Authorization header missing or invalid'}), 401
-        token = auth_header.split(' ')[1]
-        user_id = decode_token(token)
+        with span('auth'):
+            user_id = verify_token(token)
         if not user_id:
             return jsonify({'error': 'Invalid or expired token'}), 401
         g.user_id = user_id
         return f(*args, **kwargs)
     return decorated
 
-# serve index.html on / route
+# Time every request, its stages are added with span() and sent back as Server-Timing
+@app.before_request
+def start_request_trace():
+    disease = (request.view_args or {}).get('disease', '').strip().lower()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    start_trace(route, disease if disease in model_registry else ('other' if disease else ''))
+
+@app.after_request
+def finish_request_trace(response):
+    server_timing = finish_trace(request.method, response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+# serve the frontend: its files, and index.html on / and on client-side routes
 @app.route('/', methods=['GET'])
-def serve_index():
-    return app.send_static_file('index.html')
+@app.route('/<path:path>', methods=['GET'])
+def serve_index(path=''):
+    response = None if path.startswith('api/') else static_assets.response(path, request.headers)
+    if response is None:
+        return jsonify({'error': 'Not found'}), 404
+    return response
 
 
 # ping route
 @app.route('/health', methods=['GET'])
 def ping():
-    return jsonify({'status': 'ok'}), 200
+    return jsonify({
+        'status': 'ok',
+        'micro_batching': batcher.metrics(),
+        'prediction_cache': prediction_cache.stats(),
+        'recommendation_cache': recommendation_cache.stats(),
+        'time_to_first_byte': stream_stats.snapshot(),
+        'auth_token_cache': token_cache.stats(),
+        'chat_summaries': chat_summarizer.stats(),
+        'models': model_registry.stats(),
+        'clients': clients.stats(),
+        'recommendation_jobs': recommendation_jobs.stats(),
+        'history_writes': history_writer.stats(),
+        'password_hashing': password_hasher.stats(),
+        'prompts': prompt_builder.stats(),
+        'preamble_cache': preamble_cache.stats(),
+        'shadow_models': shadow.stats(),
+        'static_assets': static_assets.stats(),
+        'disease_catalog': disease_catalog.stats()
+    }), 200
+
+# Prometheus metrics, the /health counters are exported as gauges next to the histograms
+metrics_registry.register_stats('prediction_cache', prediction_cache.stats)
+metrics_registry.register_stats('recommendation_cache', recommendation_cache.stats)
+metrics_registry.register_stats('auth_token_cache', token_cache.stats)
+metrics_registry.register_stats('chat_summaries', lambda: chat_summarizer.stats())
+metrics_registry.register_stats('model_registry', model_registry.stats)
+metrics_registry.register_stats('mongo_pool', lambda: clients.pool_monitor.stats())
+metrics_registry.register_stats('mongo_breaker', clients.mongo_breaker.stats)
+metrics_registry.register_stats('gemini_breaker', clients.gemini_breaker.stats)
+metrics_registry.register_stats('recommendation_jobs', lambda: recommendation_jobs.stats())
+metrics_registry.register_stats('history_writes', history_writer.stats)
+metrics_registry.register_stats('password_hashing', password_hasher.stats)
+metrics_registry.register_stats('prompts', prompt_builder.stats)
+metrics_registry.register_stats('preamble_cache', preamble_cache.stats)
+metrics_registry.register_stats('shadow_models', shadow.stats)
+metrics_registry.register_stats('static_assets', static_assets.stats)
+metrics_registry.register_stats('disease_catalog', disease_catalog.stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Disease metadata Endpoints, the prediction forms and the inputs the current models accept
+@app.route('/api/diseases', methods=['GET'])
+@app.route('/api/diseases/<disease>', methods=['GET'])
+def get_diseases(disease=None):
+    try:
+        if disease is not None:
+            disease = disease.strip().lower()
+            if disease not in disease_catalog:
+                return jsonify({'error': f"Unsupported disease type: {disease}"}), 400
+        body, etag, variants = disease_catalog.get(disease)
+        return cached_response(body, etag, variants, request.headers, DISEASE_METADATA_CACHE_CONTROL,
+                               'application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
 
 # User Sign-In Endpoint
 @app.route('/api/sign-in', methods=['POST'])
@@ -136,7 +455,8 @@ def signin():
         if not user_data:
             return jsonify({'error': 'User not found'}), 401
         
-        is_valid_password = check_password_hash(user_data.get("password") ,password)
+        with span('password'):
+            is_valid_password, new_password_hash = password_hasher.verify(user_data.get("password"), password)
         if not is_valid_password:
             return jsonify({'error': 'Invalid password'}), 401
         
@@ -146,16 +466,21 @@ def signin():
 
         token = generate_token(user_data['id'])
 
-        # update auth token in the user schema
+        # update auth token in the user schema, and the password hash if it used outdated parameters
+        update = {'auth_token': token}
+        if new_password_hash:
+            update['password'] = new_password_hash
         users_collection.update_one(
             {'email': email},
-            {'$set': {'auth_token': token}}
+            {'$set': update}
         )
+        # the previous token is no longer valid
+        token_cache.invalidate_user(user_data['id'])
 
         return jsonify({ 'message': 'User Login successfully', 'token': token, 'user_data': user_data }), 201
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
 # User Sign-Up Endpoint
 @app.route('/api/sign-up', methods=['POST'])
@@ -171,279 +496,616 @@ def signup():
         if not name or not email or not password:
             return jsonify({'error': 'Missing required fields'}), 400
 
-        if users_collection.find_one({'email': email}):
-            return jsonify({'error': 'Email already registered'}), 409
-
-        hashed_password = generate_password_hash(password)
+        with span('password'):
+            hashed_password = password_hasher.hash(password)
 
+        # The id and token are known before the write, so the user is created complete
+        user_id = ObjectId()
+        token = generate_token(str(user_id))
         user_data = {
+            '_id': user_id,
             'name': name,
-            'email': email,
             'password': hashed_password,
             'provider': provider,
             'avatar': avatar,
-            'auth_token': "",
-            'id': "",
+            'auth_token': token,
+            'id': str(user_id),
             'created_at': datetime.now(),
             'updated_at': datetime.now()
         }
 
-        result = users_collection.insert_one(user_data)
-        
-        users_collection.update_one(
-            {'_id': result.inserted_id},
-            {'$set': {'id': str(result.inserted_id)}}
-        )
-
-        created_user = users_collection.find_one({'_id': result.inserted_id})
-
-        if not created_user:
-            return jsonify({'error': 'Failed to create user'}), 500
+        # One atomic write: inserts the user unless the email is already registered
+        try:
+            result = users_collection.update_one({'email': email}, {'$setOnInsert': user_data}, upsert=True)
+        except DuplicateKeyError:
+            result = None
+        if result is None or result.upserted_id is None:
+            return jsonify({'error': 'Email already registered'}), 409
 
-        created_user['id'] = str(created_user.get('_id', ''))
+        created_user = dict(user_data, email=email)
         created_user.pop('password', None)
         created_user.pop('_id', None)
 
-        token = generate_token(created_user['id'])
-
-        # update auth token in the user schema
-        users_collection.update_one(
-            {'email': email},
-            {'$set': {'auth_token': token}}
-        )
-
         return jsonify({ 'message': 'User registered successfully', 'token': token,  'user_data': created_user }), 201
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
 # User Sign-Out Endpoint
 @app.route('/api/sign-out', methods=['POST'])
 def signout():
     try:
-        auth_header = request.headers.get('Authorization', None)
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token = get_bearer_token(request.headers)
+        if not token:
             return jsonify({'error': 'Authorization header missing or invalid'}), 401
-        token = auth_header.split(' ')[1]
         user_id = decode_token(token)
         if not user_id:
             return jsonify({'error': 'Invalid or expired token'}), 401
-        users_collection.find_one_and_update({'id': user_id, 'auth_token': token}, {'$set': {'auth_token': ''}})
+        users_collection.find_one_and_update(token_query(token, user_id), {'$set': {'auth_token': ''}})
+        token_cache.invalidate_user(user_id)
         return jsonify({'message': 'User signed out successfully'}), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
 # Prediction endpoint
 @app.route('/api/predict/<disease>', methods=['POST'])
 def predict_disease(disease):
     try:
         disease = disease.strip().lower()
-        if disease not in models:
+        if disease not in model_registry:
             return jsonify({'error': f"Unsupported disease type: {disease}"}), 400
         input_data = request.get_json()
         if input_data is None:
             return jsonify({'error': 'No input data provided'}), 400
-        values = list(input_data.values())
-        if len(values) != expected_input_counts[disease]:
-            return jsonify({
-                'error': f"{disease.capitalize()} model expects {expected_input_counts[disease]} input values, but got {len(values)}"
-            }), 400
-        scaler = scalers[disease]
-        model = models[disease]
-        scaled_data = scaler.transform([values])
-        prediction = model.predict(scaled_data)[0]
-        result = 'Positive' if prediction == 1 else 'Negative'
-
-        session_id = request.headers.get('SessionId', None)
-        if session_id:
-            # create or update based on session_id
-            auth_header = request.headers.get('Authorization', "Bearer ")
-            token = str(auth_header.split(' ')[1])
-            user_id = decode_token(token.strip())
-            if user_id:
-                user = users_collection.find_one({'auth_token': token})
-                if not user or user.get('auth_token') != token:
-                    return jsonify({'error': 'Invalid token'}), 401
-
-                prediction_history_collection.update_one(
+        with span('decode'):
+            values, error = extract_features(disease, input_data)
+        if error:
+            return jsonify({'error': error}), 400
+        if isinstance(input_data, list):
+            # History keeps the form by field name
+            input_data = dict(zip(model_registry.get(disease).schema.features, input_data))
+        explain = wants_explanation()
+        with span('inference'):
+            result = predict_values(disease, values, explain)
+
+        session_id, user_id, error = get_session_user()
+        if error:
+            return error
+        if user_id:
+            with span('history_write'):
+                history_writer.update(
                     {'session_id': session_id, 'user_id': user_id, 'disease': disease},
-                    {'$set': {'prediction': result, 'input_data': input_data, 'updated_at': datetime.now()}, "$setOnInsert": {"created_at": datetime.now()}},
-                    upsert=True
+                    {'$set': {'prediction': result['prediction'], 'input_data': input_data, 'updated_at': datetime.now()}, "$setOnInsert": {"created_at": datetime.now()}}
                 )
 
-        return jsonify({'prediction': result})
+        return jsonify(prediction_response(result, explain))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
-# Recommendation endpoint
-@app.route('/api/recommend/<disease>', methods=['POST'])
-def recommend_disease(disease):
+# Batch prediction endpoint, accepts a JSON array or NDJSON of input records
+@app.route('/api/predict/<disease>/batch', methods=['POST'])
+def predict_disease_batch(disease):
     try:
         disease = disease.strip().lower()
-        if disease not in models:
+        if disease not in model_registry:
             return jsonify({'error': f"Unsupported disease type: {disease}"}), 400
-        input_data = request.get_json()
-        if input_data is None:
+        try:
+            records = parse_batch_records(request.get_data(), request.content_type)
+        except ValueError as e:
+            return jsonify({'error': f"Invalid batch payload: {e}"}), 400
+        if not records:
             return jsonify({'error': 'No input data provided'}), 400
-        prediction = input_data.get('prediction', 'Unknown')
-        prompt = (f"""The following health parameters were provided:\n{input_data}\n\nThe diagnosis is: {prediction}.\nBased on the values given, if the person has the disease, explain the possible causes (with subheading). \nIf not, skip this section. Then, in the next subheading, highlight any abnormal (high/low) values and provide normal ranges. \nNext, give proper health recommendations. Lastly, suggest appropriate foods that can help improve any abnormal values."""
-        )
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-001', contents=prompt
-        )
-        recommendations = response.text
-        
-        session_id = request.headers.get('SessionId', None)
-        if session_id:
-            # create or update based on session_id
-            auth_header = request.headers.get('Authorization', "Bearer ")
-            token = str(auth_header.split(' ')[1])
-            user_id = decode_token(token.strip())
-            if user_id:
-                user = users_collection.find_one({'auth_token': token})
-                if not user or user.get('auth_token') != token:
-                    return jsonify({'error': 'Invalid token'}), 401
-                prediction_history_collection.update_one(
-                    {'session_id': session_id, 'user_id': user_id, 'disease': disease},
-                    {'$set': {'recommendation': recommendations, 'input_data': input_data, 'updated_at': datetime.now()}, "$setOnInsert": {"created_at": datetime.now()}},
-                    upsert=True
-                )
-
-        return jsonify({'recommendations': recommendations})
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({'error': f"Batch size {len(records)} exceeds the limit of {MAX_BATCH_SIZE} records"}), 413
+
+        version = current_model_version(disease)
+        explain = wants_explanation()
+        # Every record is decoded straight into its row of one preallocated matrix
+        matrix = np.empty((len(records), expected_input_counts[disease]), dtype=np.float64)
+        results = [None] * len(records)
+        errors = 0
+        missed_indices = []
+        missed_keys = []
+        for index, (record, error) in enumerate(records):
+            if not error:
+                values, error = extract_features(disease, record, matrix[index])
+            if error:
+                results[index] = {'index': index, 'error': error}
+                errors += 1
+                continue
+            cache_key = make_key(disease, version, values)
+            cached = prediction_cache.get(cache_key)
+            if cached is not None and (not explain or 'probability' in cached):
+                results[index] = {'index': index, **prediction_response(cached, explain)}
+                continue
+            missed_indices.append(index)
+            missed_keys.append(cache_key)
+
+        if missed_indices:
+            with span('inference'):
+                predictions = run_predictions(disease, matrix[missed_indices], explain)
+            for index, cache_key, result in zip(missed_indices, missed_keys, predictions):
+                prediction_cache.set(cache_key, result)
+                results[index] = {'index': index, **prediction_response(result, explain)}
+
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': errors
+        })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# Chat endpoint
-@app.route('/api/chat/<disease>', methods=['POST'])
-def chat(disease):
-    try:
-        disease = disease.strip().lower()
-        if disease not in models:
-            return jsonify({'error': f"Unsupported disease type: {disease}"}), 400
-
-        default_messages = [
-            { "user": False, "message": "Hello! I'm your health assistant. How can I help you today?" }
-        ]
-
-        input_data = request.get_json()
-        if input_data is None:
-            return jsonify({'error': 'No input data provided'}), 400
-        
-        user_messages = input_data.get('messages', default_messages)
-        form_data = input_data.get('form_data')
-        prediction = input_data.get('prediction', "Form Data needed to get prediction" if len(form_data.items()) >= 0 else None)
-        recommendation = input_data.get('recommendation', "Form Data needed to get recommendation" if len(form_data.items()) >= 0 else None)
-
-        session_id = request.headers.get('SessionId', None)
-        if session_id:
-            # create or update based on session_id
-            auth_header = request.headers.get('Authorization', "Bearer ")
-            token = str(auth_header.split(' ')[1])
-            user_id = decode_token(token.strip())
-            if user_id:
-                user = users_collection.find_one({'auth_token': token})
-                if not user or user.get('auth_token') != token:
-                    return jsonify({'error': 'Invalid token'}), 401
-                
-                prediction_history = prediction_history_collection.find_one({'session_id': session_id, 'user_id': user_id, 'disease': disease})
-                if prediction_history:
-                    default_messages = prediction_history.get('messages', default_messages)
-                    user_messages = prediction_history.get('messages', default_messages)
-                    message = input_data.get('message', "Hi")
-                    user_messages.append({ "user": True, "message": message })
-        else:
-            user_messages.append({ "user": True, "message": "Hi" })
-
-        # Properly format user messages
-        formatted_messages = [
-            f"User: {msg['message']}" if msg["user"] else f"Assistant: {msg['message']}"
-            for msg in user_messages
-        ]
-
-        prompt = f"""You are a professional, AI-powered **medical assistant chatbot** specializing in diseases related to the **heart, lungs, liver, parkinsons, and diabetes**. You are not a doctor, but you provide **medically accurate, empathetic, and easy-to-understand explanations**. You act as a supportive first step in a patient's health journey and always encourage consulting a licensed healthcare provider for diagnosis, treatment, or emergencies.
-
-Your communication style should be:
-
-* **Professional and caring**
-* **Short, clear sentences**, like a helpful human would speak
-* **Simple language**, avoiding complex jargon unless it's explained
-* **Reassuring and non-alarming**, especially when discussing serious topics
-
-When responding:
+        return jsonify({'error': str(e)}), error_status(e)
 
-* Use a **natural, conversational tone**—you should sound like a real person who cares.
-* Keep sentences **concise and human-like**, especially in follow-up answers.
-* Provide helpful guidance on symptoms, risk factors, diagnosis, and general treatment options.
-* Encourage users to seek professional care for medical decisions or emergencies.
-* Never offer a direct diagnosis or prescribe treatments.
-* If the user describes urgent symptoms (like chest pain or shortness of breath), **strongly recommend immediate medical attention.**
+# Number of strongest contributions listed each way in the recommendation prompt
+RECOMMENDATION_TOP_FINDINGS = int(os.getenv('RECOMMENDATION_TOP_FINDINGS', '3'))
 
-Include statements like:
+def format_feature(schema, name, value):
+    if name in schema.categories:
+        return f"{name} {schema.categories[name][int(value)]}"
+    return f"{name} {value:g}"
 
-* "I'm here to help explain things, but a doctor should confirm anything medical."
-* "If you feel worse or unsure, it's safest to talk to a healthcare provider."
-* "That sounds serious—please get medical help right away."
-
-Current context:
-
-- User has access to our disease prediction system
-- Available predictions: diabetes, parkinsons, heart disease, lung disease and liver disease.
-- User is currently consulting for {disease} related disease
-- Our system provides recommendations based on AI analysis
-
-Form Data:
-{('\n'.join([f"- {k}: {v}" for k, v in form_data.items()]) if form_data else "User has not provided any form data")}
+# Form data as one compact "Name value, ..." line in schema order, None without form data
+def health_parameters(disease, form_data, values=None):
+    if not form_data:
+        return None
+    if values is None:
+        values, error = extract_features(disease, {name: value for name, value in form_data.items() if name != 'prediction'})
+        if error:
+            # Incomplete forms are listed as submitted, empty fields left out
+            return ', '.join(f"{name} {value}" for name, value in form_data.items() if value not in (None, ''))
+    schema = model_registry.get(disease).schema
+    return ', '.join(format_feature(schema, name, values[i]) for i, name in enumerate(schema.features))
+
+# Compact findings for the recommendation prompt: every submitted value once, the
+# model's probability and the values that moved it most. Returns None when the form
+# does not decode, the prompt then falls back to the raw input.
+def recommendation_findings(disease, input_data):
+    record = {name: value for name, value in input_data.items() if name != 'prediction'}
+    values, error = extract_features(disease, record)
+    if error:
+        return None
+    result = predict_values(disease, values, explain=True)
+    schema = model_registry.get(disease).schema
+    lines = [
+        'Health parameters: ' + health_parameters(disease, record, values),
+        f"Model estimate: {result['probability']:.0%} probability of a Positive diagnosis.",
+    ]
+    contributions = result.get('contributions')
+    if contributions:
+        ranked = sorted(contributions.items(), key=lambda item: item[1])
+        raised = [item for item in reversed(ranked) if item[1] > 0][:RECOMMENDATION_TOP_FINDINGS]
+        lowered = [item for item in ranked if item[1] < 0][:RECOMMENDATION_TOP_FINDINGS]
+        for title, items in (('Raised the estimate most', raised), ('Lowered the estimate most', lowered)):
+            if items:
+                lines.append(f"{title}: " + ', '.join(
+                    f"{format_feature(schema, name, values[schema.index[name]])} ({contribution:+.0%})"
+                    for name, contribution in items
+                ))
+    return '\n'.join(lines)
+
+# Build the recommendation prompt for the submitted health parameters
+def build_recommendation_prompt(disease, input_data, prediction):
+    findings = recommendation_findings(disease, input_data)
+    if findings is None:
+        findings = 'Health parameters: ' + (health_parameters(disease, input_data) or 'not provided')
+    return prompt_builder.recommendation(findings, prediction)
+
+# Validate a recommend request body, returns (context, (error_payload, status))
+def parse_recommendation(disease, input_data):
+    disease = disease.strip().lower()
+    if disease not in model_registry:
+        return None, ({'error': f"Unsupported disease type: {disease}"}, 400)
+    if input_data is None:
+        return None, ({'error': 'No input data provided'}, 400)
+    return {
+        'disease': disease,
+        'input_data': input_data,
+        'prediction': input_data.get('prediction', 'Unknown')
+    }, None
+
+# History upsert (filter, update) storing a generated recommendation
+def recommendation_history_update(context, recommendations):
+    return (
+        {'session_id': context['session_id'], 'user_id': context['user_id'], 'disease': context['disease']},
+        {'$set': {
+            'recommendation': recommendations, 'input_data': context['input_data'],
+            'recommendation_model_version': current_model_version(context['disease']), 'updated_at': datetime.now()
+        }, "$setOnInsert": {"created_at": datetime.now()}}
+    )
+
+# Parse a recommend request, returns (context, error_response)
+def prepare_recommendation(disease):
+    context, error = parse_recommendation(disease, request.get_json())
+    if error:
+        return None, (jsonify(error[0]), error[1])
+    session_id, user_id, error = get_session_user()
+    if error:
+        return None, error
+    context.update(session_id=session_id, user_id=user_id)
+    return context, None
+
+def save_recommendation(context, recommendations):
+    if context['user_id'] and recommendations:
+        with span('history_write'):
+            history_writer.update(*recommendation_history_update(context, recommendations))
+
+# Cached recommendation of a parsed recommend request, generated with Gemini on a miss
+def generate_recommendation(context):
+    def generate_recommendations():
+        with span('prompt'):
+            prompt = build_recommendation_prompt(context['disease'], context['input_data'], context['prediction'])
+        with span('gemini'):
+            response = gemini_generate(prompt)
+        record_tokens(response)
+        return response.text
+
+    with span('recommendation_cache'):
+        return recommendation_cache.get_or_generate(context['disease'], context['input_data'], generate_recommendations)
 
-Prediction:
-{f"User has been tested for {disease} and the result is {prediction}" if prediction else f"user has not predicted anything for {disease}. Ask user to fill form data and hit get prediction button"}
+# Recommendation endpoint
+@app.route('/api/recommend/<disease>', methods=['POST'])
+def recommend_disease(disease):
+    try:
+        started = time.perf_counter()
+        context, error = prepare_recommendation(disease)
+        if error:
+            return error
 
-Recommendation:
-{recommendation if recommendation else f"user has not recommended anything for {disease}. Ask user to fill form data and hit get recommendation button"}
+        recommendations = generate_recommendation(context)
+        save_recommendation(context, recommendations)
+        stream_stats.record('recommend', time.perf_counter() - started)
 
-Conversation History:
+        return jsonify({'recommendations': recommendations})
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
 
-{"\n".join(formatted_messages)}
+# Streaming recommendation endpoint, sends the text as Server-Sent Events while it is generated
+@app.route('/api/recommend/<disease>/stream', methods=['POST'])
+def recommend_disease_stream(disease):
+    try:
+        started = time.perf_counter()
+        context, error = prepare_recommendation(disease)
+        if error:
+            return error
+        with span('recommendation_cache'):
+            cached = recommendation_cache.get_cached(context['disease'], context['input_data'])
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
+
+    def generate():
+        try:
+            if cached is not None:
+                chunks = [cached]
+                stream_stats.record('recommend_stream', time.perf_counter() - started)
+                yield sse_event({'delta': cached})
+            else:
+                chunks = []
+                chunk = None
+                with span('prompt'):
+                    prompt = build_recommendation_prompt(context['disease'], context['input_data'], context['prediction'])
+                for chunk in gemini_stream(prompt):
+                    if not chunk.text:
+                        continue
+                    if not chunks:
+                        stream_stats.record('recommend_stream', time.perf_counter() - started)
+                    chunks.append(chunk.text)
+                    yield sse_event({'delta': chunk.text})
+                # The last chunk carries the usage of the whole stream
+                record_tokens(chunk)
+            recommendations = ''.join(chunks)
+            # An empty stream (safety block, nothing generated) is neither cached nor saved
+            if cached is None and recommendations:
+                recommendation_cache.put(context['disease'], context['input_data'], recommendations)
+            save_recommendation(context, recommendations)
+            yield sse_event({'recommendations': recommendations}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    return sse_response(generate())
+
+# Background job: generate the recommendation and store it in the prediction history.
+# Gemini failures propagate so the job queue can retry them.
+def run_recommendation_job(context):
+    start_trace('recommendation_job', context['disease'])
+    recommendations = generate_recommendation(context)
+    save_recommendation(context, recommendations)
+    return recommendations
+
+# Recommendations generated off the request by a bounded worker pool, with retries,
+# backoff and a pool-wide pause while Gemini is rate limited (see jobs.py)
+recommendation_jobs = JobQueue(
+    run_recommendation_job,
+    recommendation_jobs_collection,
+    workers=int(os.getenv('RECOMMENDATION_JOB_WORKERS', '4')),
+    max_pending=int(os.getenv('RECOMMENDATION_JOB_QUEUE_SIZE', '100')),
+    max_attempts=int(os.getenv('RECOMMENDATION_JOB_ATTEMPTS', '4')),
+    backoff_seconds=float(os.getenv('RECOMMENDATION_JOB_BACKOFF', '1')),
+    classify=classify_upstream_error,
+    ttl_seconds=RECOMMENDATION_JOB_TTL
+)
+
+# Longest a poll may wait for its job to finish
+RECOMMENDATION_JOB_MAX_WAIT = 30
+
+def job_response(job):
+    payload = {'job_id': job['job_id'], 'status': job['status'], 'attempts': job['attempts']}
+    if job['status'] == 'done':
+        payload['recommendations'] = job['result']
+    elif job['status'] == 'failed':
+        payload['error'] = job['error']
+    return payload
+
+# Asynchronous recommendation endpoint, returns a job id to poll instead of waiting on Gemini
+@app.route('/api/recommend/<disease>/jobs', methods=['POST'])
+def submit_recommendation_job(disease):
+    try:
+        context, error = prepare_recommendation(disease)
+        if error:
+            return error
+        with span('recommendation_cache'):
+            cached = recommendation_cache.get_cached(context['disease'], context['input_data'])
+        if cached is not None:
+            save_recommendation(context, cached)
+            return jsonify({'job_id': None, 'status': 'done', 'attempts': 0, 'recommendations': cached}), 200
+        try:
+            job = recommendation_jobs.submit(context, owner=context['user_id'])
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+        return jsonify(job_response(job)), 202, {'Location': f"/api/recommend/jobs/{job['job_id']}"}
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
 
-Use this context to generate a short, supportive, and medically-informed response.
-"""
+# Poll a recommendation job, ?wait=<seconds> holds the request until it finishes
+@app.route('/api/recommend/jobs/<job_id>', methods=['GET'])
+def get_recommendation_job(job_id):
+    try:
+        try:
+            wait_seconds = min(max(float(request.args.get('wait', '0')), 0), RECOMMENDATION_JOB_MAX_WAIT)
+        except ValueError:
+            return jsonify({'error': 'wait must be a number of seconds'}), 400
+        # The token must be the user's current one, a merely well-signed token could be
+        # a signed-out one
+        token = get_bearer_token(request.headers)
+        user_id = None
+        if token:
+            with span('auth'):
+                user_id = verify_token(token)
+            if not user_id:
+                return jsonify({'error': 'Invalid or expired token'}), 401
+        job, owner = recommendation_jobs.get(job_id, wait_seconds)
+        # Jobs of signed in users are only visible to them
+        if job is None or (owner and owner != user_id):
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_response(job)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
+
+# Chat history: messages always kept in the prompt, messages kept per conversation, and
+# how many messages leave the prompt before they are folded into the summary
+CHAT_CONTEXT_MESSAGES = int(os.getenv('CHAT_CONTEXT_MESSAGES', '12'))
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '200'))
+
+def generate_chat_summary(prompt):
+    return gemini_generate(prompt).text
+
+chat_summarizer = ChatSummarizer(
+    prediction_history_collection, generate_chat_summary,
+    window=CHAT_CONTEXT_MESSAGES,
+    batch=int(os.getenv('CHAT_SUMMARY_BATCH', '8'))
+)
+
+# Validate a chat request body, returns (context, (error_payload, status))
+def parse_chat(disease, input_data):
+    disease = disease.strip().lower()
+    if disease not in model_registry:
+        return None, ({'error': f"Unsupported disease type: {disease}"}, 400)
+
+    default_messages = [
+        { "user": False, "message": "Hello! I'm your health assistant. How can I help you today?" }
+    ]
+
+    if input_data is None:
+        return None, ({'error': 'No input data provided'}, 400)
+
+    form_data = input_data.get('form_data')
+    return {
+        'disease': disease,
+        'input_data': input_data,
+        'messages': input_data.get('messages', default_messages),
+        'form_data': form_data,
+        'prediction': input_data.get('prediction', "Form Data needed to get prediction" if len(form_data.items()) >= 0 else None),
+        'recommendation': input_data.get('recommendation', "Form Data needed to get recommendation" if len(form_data.items()) >= 0 else None)
+    }, None
+
+# Merge the stored conversation of the session into the context and build the prompt.
+# context['pending'] holds the messages that are not stored yet.
+def apply_chat_history(context, session_id, user_id, prediction_history):
+    context.update(session_id=session_id, user_id=user_id, summary=None, message_count=0, summarized_count=0,
+                   context_size=CHAT_CONTEXT_MESSAGES)
+    context['pending'] = context['messages']
+    if session_id:
+        if user_id and prediction_history:
+            stored = prediction_history.get('messages')
+            message = { "user": True, "message": context['input_data'].get('message', "Hi") }
+            if stored is None:
+                context['pending'] = context['messages'] + [message]
+            else:
+                context['pending'] = [message]
+                context['messages'] = stored
+            context['messages'] = context['messages'] + [message]
+            context['summary'] = prediction_history.get('chat_summary')
+            context['message_count'] = prediction_history.get('message_count', 0)
+            context['summarized_count'] = prediction_history.get('summarized_count', 0)
+            # The new message is not counted yet
+            context['context_size'] = chat_summarizer.context_size(
+                context['message_count'] + 1, context['summarized_count']
+            )
+    else:
+        context['messages'].append({ "user": True, "message": "Hi" })
+    with span('prompt'):
+        context['prompt'] = build_chat_prompt(context)
+    return context
+
+# Older turns are covered by the running summary, the builder trims further to the token budget
+def build_chat_prompt(context):
+    return prompt_builder.chat(
+        context['disease'],
+        health_parameters(context['disease'], context['form_data']),
+        context['prediction'],
+        context['recommendation'],
+        context.get('summary'),
+        context['messages'][-context['context_size']:]
+    )
+
+# Append the assistant reply, returns the history upsert (filter, update) for the conversation
+def chat_history_update(context, message):
+    reply = { "user": False, "message": message }
+    context['messages'].append(reply)
+    update = append_messages_update(context['pending'] + [reply], CHAT_HISTORY_MAX_MESSAGES)
+    context['message_count'] += len(context['pending']) + 1
+    update.update({'$set': {'updated_at': datetime.now()}, "$setOnInsert": {"created_at": datetime.now()}})
+    return (
+        {'session_id': context['session_id'], 'user_id': context['user_id'], 'disease': context['disease']},
+        update
+    )
+
+# Parse a chat request and build its prompt, returns (context, error_response)
+def prepare_chat(disease):
+    context, error = parse_chat(disease, request.get_json())
+    if error:
+        return None, (jsonify(error[0]), error[1])
+    session_id, user_id, error = get_session_user()
+    if error:
+        return None, error
+    prediction_history = None
+    if session_id and user_id:
+        with span('history_read'):
+            history_filter = {'session_id': session_id, 'user_id': user_id, 'disease': context['disease']}
+            history_writer.sync(**history_filter)
+            prediction_history = prediction_history_collection.find_one(
+                history_filter, recent_messages_projection(chat_summarizer.max_context)
+            )
+            if needs_message_count(prediction_history):
+                prediction_history['message_count'] = backfill_message_count(prediction_history_collection, history_filter)
+    return apply_chat_history(context, session_id, user_id, prediction_history), None
+
+# Persist the conversation of signed-in sessions
+def save_chat_reply(context, message):
+    if context['user_id']:
+        history_filter, update = chat_history_update(context, message)
+        # Summarize once the messages are stored, the summarizer reads them back
+        with span('history_write'):
+            history_writer.update(history_filter, update, lambda: chat_summarizer.submit(
+                history_filter, context['message_count'], context['summarized_count']
+            ))
 
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-001', contents=prompt,
-        )
+# Chat endpoint
+@app.route('/api/chat/<disease>', methods=['POST'])
+def chat(disease):
+    try:
+        started = time.perf_counter()
+        context, error = prepare_chat(disease)
+        if error:
+            return error
+
+        with span('gemini'):
+            response = gemini_generate(context['prompt'])
+        record_tokens(response)
         message = response.text
-
-        if user_id:
-            user_messages.append({ "user": False, "message": message })
-            prediction_history_collection.update_one(
-                {'session_id': session_id, 'user_id': user_id, 'disease': disease},
-                {'$set': {'messages': user_messages, 'updated_at': datetime.now()}, "$setOnInsert": {"created_at": datetime.now()}},
-                upsert=True
-            )
+        save_chat_reply(context, message)
+        stream_stats.record('chat', time.perf_counter() - started)
 
         return jsonify({'message': message})
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
+
+# Streaming chat endpoint, sends the reply as Server-Sent Events while it is generated
+@app.route('/api/chat/<disease>/stream', methods=['POST'])
+def chat_stream(disease):
+    try:
+        started = time.perf_counter()
+        context, error = prepare_chat(disease)
+        if error:
+            return error
+    except Exception as e:
+        return jsonify({'error': str(e)}), error_status(e)
+
+    def generate():
+        try:
+            chunks = []
+            chunk = None
+            for chunk in gemini_stream(context['prompt']):
+                if not chunk.text:
+                    continue
+                if not chunks:
+                    stream_stats.record('chat_stream', time.perf_counter() - started)
+                chunks.append(chunk.text)
+                yield sse_event({'delta': chunk.text})
+            record_tokens(chunk)
+            message = ''.join(chunks)
+            save_chat_reply(context, message)
+            yield sse_event({'message': message}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    return sse_response(generate())
+
+# Prediction history is served newest first in pages of summary fields
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '20'))
+HISTORY_MAX_PAGE_SIZE = 100
+HISTORY_SUMMARY_PROJECTION = {'session_id': 1, 'disease': 1, 'prediction': 1, 'updated_at': 1}
+
+def encode_history_cursor(document):
+    payload = json.dumps([document['updated_at'].isoformat(), str(document['_id'])])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_history_cursor(cursor):
+    updated_at, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(updated_at), ObjectId(last_id)
 
 # Prediction History Endpoint
 @app.route('/api/prediction_history', methods=['GET'])
+@require_auth
 def get_chat_history():
     try:
-        auth_header = request.headers.get('Authorization', "Bearer ")
-        token = str(auth_header.split(' ')[1])
-        user_id = decode_token(token.strip())
-        if not user_id:
-            return jsonify({'error': 'Invalid token'}), 401
-        user = users_collection.find_one({'id': user_id})
-        if not user or user.get('auth_token') != token:
-            return jsonify({'error': 'Invalid token'}), 401
-        history = list(prediction_history_collection.find({'user_id': user_id}, {'_id': 0, 'user_id': 0, 'created_at': 0}))
-        return jsonify({'history': history})
+        user_id = g.user_id
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+
+        query = {'user_id': user_id}
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                updated_at, last_id = decode_history_cursor(cursor)
+            except (ValueError, TypeError, InvalidId):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query['$or'] = [
+                {'updated_at': {'$lt': updated_at}},
+                {'updated_at': updated_at, '_id': {'$lt': last_id}}
+            ]
+
+        with span('history_read'):
+            history_writer.sync(user_id=user_id)
+            documents = list(
+                prediction_history_collection.find(query, HISTORY_SUMMARY_PROJECTION)
+                .sort([('updated_at', -1), ('_id', -1)])
+                .limit(limit + 1)
+            )
+        next_cursor = encode_history_cursor(documents[limit - 1]) if len(documents) > limit else None
+        history = []
+        for document in documents[:limit]:
+            document.pop('_id')
+            history.append(document)
+        return jsonify({'history': history, 'next_cursor': next_cursor})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
 # Session History Endpoint
 @app.route('/api/session_history', methods=['GET'])
+@require_auth
 def get_session_history():
     try:
         # Get session_id and disease from query parameters (?session_id=...)
@@ -451,21 +1113,16 @@ def get_session_history():
         disease = request.args.get('disease')
         if not session_id:
             return jsonify({'error': 'Session ID is required'}), 400
-        auth_header = request.headers.get('Authorization', "Bearer ")
-        token = str(auth_header.split(' ')[1])
-        user_id = decode_token(token.strip())
-        if not user_id:
-            return jsonify({'error': 'Invalid token'}), 401
-        user = users_collection.find_one({'id': user_id})
-        if not user or user.get('auth_token') != token:
-            return jsonify({'error': 'Invalid token'}), 401
-        session_history = prediction_history_collection.find_one(
-            {'session_id': session_id, 'user_id': user_id, 'disease': disease},
-            {'_id': 0, 'user_id': 0, 'created_at': 0, 'updated_at': 0}
-        )
+        user_id = g.user_id
+        with span('history_read'):
+            history_writer.sync(session_id=session_id, user_id=user_id, disease=disease)
+            session_history = prediction_history_collection.find_one(
+                {'session_id': session_id, 'user_id': user_id, 'disease': disease},
+                {'_id': 0, 'user_id': 0, 'created_at': 0, 'updated_at': 0, 'message_count': 0, 'summarized_count': 0, 'summarized_at': 0, 'write_ids': 0, 'recommendation_model_version': 0}
+            )
         return jsonify({'history': session_history})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), error_status(e)
 
 # Run the server
 if __name__ == '__main__':
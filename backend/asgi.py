@@ -0,0 +1,304 @@
+import asyncio
+import time
+from functools import wraps
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+import app as flask_app
+from streaming import sse_event
+from chat_history import needs_message_count, message_count_backfill
+from metrics import start_trace, finish_trace, span, record_tokens
+
+# Async serving mode, run with: uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# The LLM-bound routes (chat and recommend, buffered and streaming) are served
+# natively on the event loop with the async genai and MongoDB clients, so a pending
+# Gemini call no longer pins a worker thread. Every other route is served by the
+# Flask app through a WSGI adapter, unchanged.
+
+# Same pool settings and MongoDB breaker as the Flask app's client (see clients.py)
+clients = flask_app.clients
+users_collection = clients.async_collection("users")
+prediction_history_collection = clients.async_collection("prediction_history")
+
+recommendation_cache = flask_app.recommendation_cache
+recommendation_cache.attach_async_collection(clients.async_collection("recommendation_cache"))
+stream_stats = flask_app.stream_stats
+history_writer = flask_app.history_writer
+token_cache = flask_app.token_cache
+
+
+# Trace a route like the Flask before/after_request hooks do
+def traced(route):
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            disease = request.path_params.get('disease', '').strip().lower()
+            start_trace(route, disease if disease in flask_app.model_registry else ('other' if disease else ''))
+            response = await handler(request)
+            server_timing = finish_trace(request.method, response.status_code)
+            if server_timing:
+                response.headers['Server-Timing'] = server_timing
+            return response
+        return wrapper
+    return decorator
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def error_response(error):
+    payload, status = error
+    return JSONResponse(payload, status_code=status)
+
+
+# Async twin of app.verify_token, shares its verified-token cache
+async def verify_token(token, user_id):
+    if token_cache.get(token) == user_id:
+        return user_id
+    if not await users_collection.find_one(flask_app.token_query(token, user_id), {'_id': 1}):
+        return None
+    token_cache.set(token, user_id)
+    return user_id
+
+
+# Async twin of app.get_session_user, returns (session_id, user_id, error_response)
+async def get_session_user(headers):
+    with span('auth'):
+        session_id, token, user_id = flask_app.parse_session_headers(headers)
+        if user_id and not await verify_token(token, user_id):
+            return session_id, None, JSONResponse({'error': 'Invalid token'}, status_code=401)
+    return session_id, user_id, None
+
+
+async def prepare_recommendation(request):
+    context, error = flask_app.parse_recommendation(request.path_params['disease'], await read_json(request))
+    if error:
+        return None, error_response(error)
+    session_id, user_id, error = await get_session_user(request.headers)
+    if error:
+        return None, error
+    context.update(session_id=session_id, user_id=user_id)
+    return context, None
+
+
+# With write-behind the upsert only joins the Flask app's buffer, its flusher thread writes it
+async def save_recommendation(context, recommendations):
+    if context['user_id'] and recommendations:
+        with span('history_write'):
+            if history_writer.enabled:
+                history_writer.update(*flask_app.recommendation_history_update(context, recommendations))
+            else:
+                await prediction_history_collection.update_one(
+                    *flask_app.recommendation_history_update(context, recommendations), upsert=True
+                )
+
+
+async def prepare_chat(request):
+    context, error = flask_app.parse_chat(request.path_params['disease'], await read_json(request))
+    if error:
+        return None, error_response(error)
+    session_id, user_id, error = await get_session_user(request.headers)
+    if error:
+        return None, error
+    prediction_history = None
+    if session_id and user_id:
+        with span('history_read'):
+            history_match = {'session_id': session_id, 'user_id': user_id, 'disease': context['disease']}
+            if history_writer.has_pending(**history_match):
+                await asyncio.to_thread(history_writer.sync, **history_match)
+            prediction_history = await prediction_history_collection.find_one(
+                history_match, flask_app.recent_messages_projection(flask_app.chat_summarizer.max_context)
+            )
+            if needs_message_count(prediction_history):
+                await prediction_history_collection.update_one(*message_count_backfill(history_match))
+                counted = await prediction_history_collection.find_one(history_match, {'message_count': 1})
+                prediction_history['message_count'] = (counted or {}).get('message_count', 0)
+    return flask_app.apply_chat_history(context, session_id, user_id, prediction_history), None
+
+
+# Summaries are generated on the Flask app's background workers, off the event loop
+async def save_chat_reply(context, message):
+    if context['user_id']:
+        history_filter, update = flask_app.chat_history_update(context, message)
+        with span('history_write'):
+            if history_writer.enabled:
+                history_writer.update(history_filter, update, lambda: flask_app.chat_summarizer.submit(
+                    history_filter, context['message_count'], context['summarized_count']
+                ))
+                return
+            await prediction_history_collection.update_one(history_filter, update, upsert=True)
+        flask_app.chat_summarizer.submit(history_filter, context['message_count'], context['summarized_count'])
+
+
+def sse_response(events):
+    return StreamingResponse(
+        events,
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# Gemini calls on the async genai client, each through the Gemini circuit breaker
+async def gemini_generate(prompt):
+    request_args = flask_app.gemini_request(prompt)
+    try:
+        with clients.gemini_breaker.guard():
+            response = await clients.gemini().aio.models.generate_content(model=flask_app.GEMINI_MODEL, **request_args)
+    except Exception as e:
+        flask_app.gemini_failed(prompt, request_args, e)
+        raise
+    flask_app.prompt_builder.observe(prompt, response)
+    return response
+
+
+async def stream_text(route, prompt, started):
+    first_byte = True
+    chunk = None
+    request_args = flask_app.gemini_request(prompt)
+    try:
+        with clients.gemini_breaker.guard():
+            async for chunk in await clients.gemini().aio.models.generate_content_stream(
+                model=flask_app.GEMINI_MODEL, **request_args
+            ):
+                if not chunk.text:
+                    continue
+                if first_byte:
+                    stream_stats.record(route, time.perf_counter() - started)
+                    first_byte = False
+                yield chunk.text
+    except Exception as e:
+        flask_app.gemini_failed(prompt, request_args, e)
+        raise
+    # The last chunk carries the usage of the whole stream
+    record_tokens(chunk)
+
+
+@traced('/api/recommend/<disease>')
+async def recommend_disease(request):
+    try:
+        started = time.perf_counter()
+        context, error = await prepare_recommendation(request)
+        if error:
+            return error
+
+        async def generate_recommendations():
+            with span('prompt'):
+                prompt = flask_app.build_recommendation_prompt(context['disease'], context['input_data'], context['prediction'])
+            with span('gemini'):
+                response = await gemini_generate(prompt)
+            record_tokens(response)
+            return response.text
+
+        with span('recommendation_cache'):
+            recommendations = await recommendation_cache.aget_or_generate(
+                context['disease'], context['input_data'], generate_recommendations
+            )
+        await save_recommendation(context, recommendations)
+        stream_stats.record('recommend', time.perf_counter() - started)
+
+        return JSONResponse({'recommendations': recommendations})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=flask_app.error_status(e))
+
+
+@traced('/api/recommend/<disease>/stream')
+async def recommend_disease_stream(request):
+    try:
+        started = time.perf_counter()
+        context, error = await prepare_recommendation(request)
+        if error:
+            return error
+        with span('recommendation_cache'):
+            cached = await recommendation_cache.aget_cached(context['disease'], context['input_data'])
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=flask_app.error_status(e))
+
+    async def generate():
+        try:
+            if cached is not None:
+                chunks = [cached]
+                stream_stats.record('recommend_stream', time.perf_counter() - started)
+                yield sse_event({'delta': cached})
+            else:
+                chunks = []
+                prompt = flask_app.build_recommendation_prompt(context['disease'], context['input_data'], context['prediction'])
+                async for text in stream_text('recommend_stream', prompt, started):
+                    chunks.append(text)
+                    yield sse_event({'delta': text})
+            recommendations = ''.join(chunks)
+            # An empty stream (safety block, nothing generated) is neither cached nor saved
+            if cached is None and recommendations:
+                await recommendation_cache.aput(context['disease'], context['input_data'], recommendations)
+            await save_recommendation(context, recommendations)
+            yield sse_event({'recommendations': recommendations}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    return sse_response(generate())
+
+
+@traced('/api/chat/<disease>')
+async def chat(request):
+    try:
+        started = time.perf_counter()
+        context, error = await prepare_chat(request)
+        if error:
+            return error
+
+        with span('gemini'):
+            response = await gemini_generate(context['prompt'])
+        record_tokens(response)
+        message = response.text
+        await save_chat_reply(context, message)
+        stream_stats.record('chat', time.perf_counter() - started)
+
+        return JSONResponse({'message': message})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=flask_app.error_status(e))
+
+
+@traced('/api/chat/<disease>/stream')
+async def chat_stream(request):
+    try:
+        started = time.perf_counter()
+        context, error = await prepare_chat(request)
+        if error:
+            return error
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=flask_app.error_status(e))
+
+    async def generate():
+        try:
+            chunks = []
+            async for text in stream_text('chat_stream', context['prompt'], started):
+                chunks.append(text)
+                yield sse_event({'delta': text})
+            message = ''.join(chunks)
+            await save_chat_reply(context, message)
+            yield sse_event({'message': message}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    return sse_response(generate())
+
+
+app = Starlette(
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["http://localhost:5173", "*"], allow_methods=["*"], allow_headers=["*"])
+    ],
+    routes=[
+        Route('/api/recommend/{disease}', recommend_disease, methods=['POST']),
+        Route('/api/recommend/{disease}/stream', recommend_disease_stream, methods=['POST']),
+        Route('/api/chat/{disease}', chat, methods=['POST']),
+        Route('/api/chat/{disease}/stream', chat_stream, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app.app)),
+    ]
+)
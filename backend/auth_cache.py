@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Short-lived cache of bearer tokens already confirmed against the users collection.
+#
+# A token stays valid until it is replaced on sign-in or cleared on sign-out, so a
+# confirmed token is remembered for a few seconds instead of querying MongoDB on
+# every request. Sign-in/sign-out invalidate the cache of the worker that handled
+# them; other workers either pick the change up from a MongoDB change stream or
+# fall back to the TTL.
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, user_id):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[token] = (user_id, time.monotonic() + self.ttl)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self.lock:
+            self.entries.pop(token, None)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for token in [token for token, entry in self.entries.items() if entry[0] == user_id]:
+                del self.entries[token]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
+
+
+# Invalidate cached tokens whenever a user's auth_token changes in any worker.
+# Change streams need a replica set, so this runs only when enabled.
+def watch_token_changes(users_collection, token_cache, retry_seconds=5):
+    pipeline = [{'$match': {'operationType': {'$in': ['update', 'replace', 'delete']}}}]
+    while True:
+        try:
+            with users_collection.watch(pipeline) as stream:
+                for change in stream:
+                    updated = change.get('updateDescription', {}).get('updatedFields', {})
+                    if change['operationType'] == 'update' and 'auth_token' not in updated:
+                        continue
+                    # users.id is the string form of the document _id
+                    token_cache.invalidate_user(str(change['documentKey']['_id']))
+        except Exception as e:
+            logger.warning("Token change stream interrupted: %s", e)
+            time.sleep(retry_seconds)
+
+
+def start_token_watcher(users_collection, token_cache):
+    watcher = threading.Thread(target=watch_token_changes, args=(users_collection, token_cache), daemon=True)
+    watcher.start()
+    return watcher
@@ -0,0 +1,41 @@
+import json
+
+# Body of a batch prediction request: a JSON array of records or NDJSON, one
+# record per line.
+#
+# A body sent as application/x-ndjson is always read line by line, so a first
+# record that is itself an array (positional values) is not mistaken for the whole
+# batch. Otherwise the body is read as one JSON document when it parses as one, and
+# line by line when it does not. A line that is not valid JSON fails only its own
+# record.
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+
+def is_ndjson(content_type):
+    return (content_type or '').split(';')[0].strip().lower() in NDJSON_TYPES
+
+
+# [(record, error)] in request order; raises ValueError when the body is not text
+def parse_batch_records(body, content_type=None):
+    text = body.decode('utf-8').strip()
+    if not is_ndjson(content_type):
+        try:
+            document = json.loads(text)
+        except ValueError:
+            document = None
+        else:
+            if isinstance(document, list):
+                return [(record, None) for record in document]
+            # A single record
+            return [(document, None)]
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append((json.loads(line), None))
+        except ValueError as e:
+            records.append((None, f"Invalid JSON record: {e}"))
+    return records
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# In-process request coalescing for single-row predictions.
+#
+# Each disease gets its own queue and worker thread. The worker takes the first
+# waiting request, keeps collecting requests until the batch window closes or the
+# batch is full, runs one vectorized predict for all of them and hands every
+# result back to the request thread waiting on it.
+#
+# A request that arrives while nothing else is queued or being predicted has no one
+# to share a batch with, so it is dispatched at once instead of waiting out the
+# window. A request thread waits at most `timeout` for its batch; if the worker
+# stalls or died it cancels its queued row and predicts the row itself.
+
+
+class BatchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.immediate = 0
+        self.timeouts = 0
+
+    def record(self, batch_size, waits):
+        with self.lock:
+            self.requests += batch_size
+            self.batches += 1
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.total_wait += sum(waits)
+            self.max_wait = max(self.max_wait, max(waits))
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'avg_wait_ms': round(self.total_wait / self.requests * 1000, 3) if self.requests else 0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'immediate': self.immediate,
+                'timeouts': self.timeouts,
+            }
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, window_ms=2, max_batch_size=64, timeout_ms=250):
+        # predict_fn(key, rows) must return one result per row
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000
+        self.queues = {}
+        self.workers = {}
+        self.stats = {}
+        # key -> requests submitted and not answered yet
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    # The queue of key, (re)starting its worker if it is not running
+    def _queue_for(self, key):
+        with self.lock:
+            if key not in self.queues:
+                self.queues[key] = queue.Queue()
+                self.stats[key] = BatchStats()
+                self.in_flight[key] = 0
+            if key not in self.workers or not self.workers[key].is_alive():
+                self.workers[key] = threading.Thread(target=self._worker, args=(key,), daemon=True)
+                self.workers[key].start()
+            return self.queues[key]
+
+    def submit(self, key, row):
+        future = Future()
+        pending = self._queue_for(key)
+        with self.lock:
+            alone = self.in_flight[key] == 0
+            self.in_flight[key] += 1
+        future.add_done_callback(lambda _: self._answered(key))
+        pending.put((row, future, time.perf_counter(), alone))
+        return future
+
+    def _answered(self, key):
+        with self.lock:
+            self.in_flight[key] -= 1
+
+    def predict(self, key, row, timeout=None):
+        future = self.submit(key, row)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # The worker is stalled or gone; a cancelled row is skipped if it ever gets to it
+            future.cancel()
+            self.stats[key].count('timeouts')
+            return self.predict_fn(key, [row])[0]
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        if batch[0][3] and pending.empty():
+            return batch
+        deadline = batch[0][2] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(pending.get_nowait())
+                else:
+                    batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self, key):
+        pending = self.queues[key]
+        while True:
+            # Rows whose request timed out and cancelled are dropped
+            batch = [item for item in self._collect(pending) if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            if len(batch) == 1 and batch[0][3]:
+                self.stats[key].count('immediate')
+            started = time.perf_counter()
+            try:
+                results = self.predict_fn(key, [row for row, _, _, _ in batch])
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _, _), result in zip(batch, results):
+                future.set_result(result)
+            self.stats[key].record(len(batch), [started - enqueued for _, _, enqueued, _ in batch])
+
+    def metrics(self):
+        with self.lock:
+            keys = list(self.queues)
+        return {
+            key: dict(self.stats[key].snapshot(), queue_depth=self.queues[key].qsize())
+            for key in keys
+        }
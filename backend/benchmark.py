@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Offline benchmark suite for the Flask backend.
+#
+# MongoDB is replaced by mongomock and Gemini by a fake client with a fixed
+# latency, so the numbers only measure this process. Request payloads are sampled
+# from the training CSVs. Results are saved as JSON baselines and can be compared
+# against a previous run to catch regressions:
+#
+#   pip install -r requirements-dev.txt
+#   python benchmark.py --save benchmarks/baseline.json
+#   python benchmark.py --compare benchmarks/baseline.json --threshold 0.15
+#
+# Metrics ending in _ms are lower-is-better, metrics ending in _rps higher-is-better.
+
+try:
+    import mongomock
+except ImportError:
+    sys.exit('benchmark.py needs mongomock as an in-memory MongoDB: pip install -r requirements-dev.txt')
+import pymongo
+
+pymongo.MongoClient = mongomock.MongoClient
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+os.environ.setdefault('AUTH_CHANGE_STREAM', 'false')
+# Measure the uncached path one request at a time unless told otherwise
+os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+os.environ.setdefault('PREDICT_MICRO_BATCHING', 'false')
+
+import app as flask_app
+from disease_specs import DISEASES
+
+TRAINING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training')
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, model, contents, **kwargs):
+        time.sleep(self.latency)
+        return FakeResponse('Please talk to a doctor about these results.')
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        time.sleep(self.latency)
+        for text in ('Please talk ', 'to a doctor ', 'about these results.'):
+            yield FakeResponse(text)
+
+
+class FakeClient:
+    def __init__(self, latency):
+        self.models = FakeModels(latency)
+
+
+def timings_summary(timings):
+    timings_ms = np.array(timings) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(timings_ms, 50)), 4),
+        'p99_ms': round(float(np.percentile(timings_ms, 99)), 4),
+        'mean_ms': round(float(timings_ms.mean()), 4),
+    }
+
+
+def measure(fn, repeat, warmup=5):
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - started)
+    return timings_summary(timings)
+
+
+def check(response):
+    if response.status_code not in (200, 201):
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+
+# Realistic request records for a disease, taken from its training CSV
+def sample_records(disease):
+    spec = DISEASES[disease]
+    df = pd.read_csv(os.path.join(TRAINING_DIR, spec['csv']))
+    return json.loads(df[spec['features']].to_json(orient='records'))
+
+
+def bench_predict(client, repeat, batch_size):
+    results = {}
+    for disease in DISEASES:
+        records = sample_records(disease)
+        single = measure(lambda i: check(client.post(f'/api/predict/{disease}', json=records[i % len(records)])), repeat)
+        batch = [records[i % len(records)] for i in range(batch_size)]
+        batched = measure(lambda i: check(client.post(f'/api/predict/{disease}/batch', json=batch)), max(repeat // 10, 5), warmup=1)
+        batched['rows_rps'] = round(batch_size / (batched['mean_ms'] / 1000), 1)
+        results[disease] = {'single': single, f'batch_{batch_size}': batched}
+    return results
+
+
+def sign_up(client, email):
+    response = check(client.post('/api/sign-up', json={'name': 'Benchmark', 'email': email, 'password': 'benchmark-password'}))
+    return response.get_json()
+
+
+def bench_auth(client, repeat):
+    email = f'auth-{time.time_ns()}@benchmark.local'
+    user = sign_up(client, email)
+    user_id = user['user_data']['id']
+    results = {
+        'sign_in': measure(
+            lambda i: check(client.post('/api/sign-in', json={'email': email, 'password': 'benchmark-password'})),
+            max(repeat // 10, 5), warmup=1
+        ),
+    }
+    # Signing in replaced the token, take the current one
+    token = flask_app.users_collection.find_one({'id': user_id})['auth_token']
+
+    def verify_cold(i):
+        flask_app.token_cache.invalidate(token)
+        flask_app.verify_token(token, user_id)
+
+    results['verify_token_cold'] = measure(verify_cold, repeat)
+    results['verify_token_cached'] = measure(lambda i: flask_app.verify_token(token, user_id), repeat)
+    return results
+
+
+# Sign-in throughput, and what a burst of sign-ins does to prediction latency
+def bench_logins(threads, total, repeat):
+    client = flask_app.app.test_client()
+    emails = [f'login-{i}-{time.time_ns()}@benchmark.local' for i in range(threads)]
+    for email in emails:
+        sign_up(client, email)
+    flask_app.password_hasher.warm()
+    records = sample_records('diabetes')
+
+    def predict(i):
+        check(client.post('/api/predict/diabetes', json=records[i % len(records)]))
+
+    results = {'predict_idle': measure(predict, repeat)}
+    latencies = []
+    lock = threading.Lock()
+
+    def sign_in(i):
+        login_client = flask_app.app.test_client()
+        started = time.perf_counter()
+        check(login_client.post('/api/sign-in', json={'email': emails[i % threads], 'password': 'benchmark-password'}))
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        logins = executor.map(sign_in, range(total))
+        # Predictions sent while the sign-ins are running
+        timings = []
+        i = 0
+        while len(latencies) < total:
+            predict_started = time.perf_counter()
+            predict(i)
+            timings.append(time.perf_counter() - predict_started)
+            i += 1
+        list(logins)
+    wall = time.perf_counter() - started
+
+    results['predict_during_logins'] = timings_summary(timings)
+    results['sign_in'] = dict(
+        timings_summary(latencies), threads=threads, requests=total, logins_rps=round(total / wall, 1),
+        method=flask_app.password_hasher.method, hash_workers=flask_app.password_hasher.workers
+    )
+    return results
+
+
+def bench_history(client, repeat, sessions, messages):
+    user = sign_up(client, f'history-{time.time_ns()}@benchmark.local')
+    user_id = user['user_data']['id']
+    headers = {'Authorization': f"Bearer {user['token']}"}
+    conversation = [
+        {'user': i % 2 == 0, 'message': f'Benchmark message {i} about my blood sugar and diet.'}
+        for i in range(messages)
+    ]
+    now = datetime.now()
+    flask_app.prediction_history_collection.insert_many([
+        {
+            'session_id': f'session-{i}', 'user_id': user_id, 'disease': 'diabetes',
+            'input_data': {'Glucose': 148}, 'prediction': 'Positive', 'recommendation': 'Eat well.',
+            'messages': conversation, 'message_count': messages, 'created_at': now, 'updated_at': now,
+        }
+        for i in range(sessions)
+    ])
+    return {
+        'sessions': sessions,
+        'messages_per_session': messages,
+        'prediction_history_page': measure(lambda i: check(client.get('/api/prediction_history', headers=headers)), repeat),
+        'session_history': measure(
+            lambda i: check(client.get(
+                f'/api/session_history?session_id=session-{i % sessions}&disease=diabetes', headers=headers
+            )),
+            repeat
+        ),
+    }
+
+
+def bench_chat(threads, total):
+    user = sign_up(flask_app.app.test_client(), f'chat-{time.time_ns()}@benchmark.local')
+    records = sample_records('diabetes')
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i):
+        client = flask_app.app.test_client()
+        headers = {
+            'Authorization': f"Bearer {user['token']}",
+            'SessionId': f'chat-{i % threads}',
+        }
+        started = time.perf_counter()
+        check(client.post('/api/chat/diabetes', headers=headers, json={
+            'form_data': records[i % len(records)], 'message': f'What does my result mean? ({i})'
+        }))
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(one, range(total)))
+    wall = time.perf_counter() - started
+    return dict(timings_summary(latencies), threads=threads, requests=total, throughput_rps=round(total / wall, 1))
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for name, value in results.items():
+        key = f'{prefix}{name}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, key + '.'))
+        else:
+            flat[key] = value
+    return flat
+
+
+# Print the change of every metric and return the ones that got worse than threshold
+def compare(results, baseline, threshold):
+    current, previous = flatten(results), flatten(baseline['results'])
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta']['created_at']})")
+    for key, value in current.items():
+        old = previous.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        if not key.endswith(('_ms', '_rps')):
+            continue
+        change = (value - old) / old
+        worse = change > threshold if key.endswith('_ms') else change < -threshold
+        if worse:
+            regressions.append(key)
+        print(f"{'REGRESSION ' if worse else '':>11}{key:<55}{old:>12.3f} -> {value:>12.3f}  ({change:+.1%})")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline backend benchmarks')
+    parser.add_argument('--repeat', type=int, default=200, help='timed requests per latency metric')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--sessions', type=int, default=50, help='history sessions to seed')
+    parser.add_argument('--messages', type=int, default=500, help='chat messages per seeded session')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake Gemini latency in seconds')
+    parser.add_argument('--chat-threads', type=int, default=16)
+    parser.add_argument('--chat-requests', type=int, default=400)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--login-requests', type=int, default=100)
+    parser.add_argument('--only', nargs='*', choices=['predict', 'auth', 'logins', 'history', 'chat'])
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    flask_app.clients.gemini_override = FakeClient(args.latency)
+    client = flask_app.app.test_client()
+    suites = {
+        'predict': lambda: bench_predict(client, args.repeat, args.batch_size),
+        'auth': lambda: bench_auth(client, args.repeat),
+        'logins': lambda: bench_logins(args.login_threads, args.login_requests, args.repeat),
+        'history': lambda: bench_history(client, args.repeat, args.sessions, args.messages),
+        'chat': lambda: bench_chat(args.chat_threads, args.chat_requests),
+    }
+    results = {}
+    for name, run in suites.items():
+        if args.only and name not in args.only:
+            continue
+        started = time.perf_counter()
+        results[name] = run()
+        print(f"{name}: done in {time.perf_counter() - started:.1f}s")
+
+    output = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Bounded chat history for the conversations stored in prediction_history.
+#
+# Each turn is appended with $push (capped with $slice) instead of rewriting the
+# whole `messages` array, and only the most recent messages are read back for the
+# prompt. Messages that fall out of that window are folded into a running
+# `chat_summary` in the background, so document size, MongoDB I/O and prompt size
+# stay flat however long a conversation gets.
+#
+# Summaries are made in batches, so up to `window + batch` messages can be waiting
+# for the next one. The prompt takes every message not in the summary yet, so none
+# is missing between the summary and the recent messages.
+
+logger = logging.getLogger(__name__)
+
+
+# Projection that reads only the last `window` messages and the summary state
+def recent_messages_projection(window):
+    return {'messages': {'$slice': -window}, 'chat_summary': 1, 'message_count': 1, 'summarized_count': 1}
+
+
+# Documents written before message_count existed have no count. The prompt only
+# reads the last messages, so the count is set once from the full stored array,
+# atomically on the server, before the first new message is counted on top of it.
+def needs_message_count(document):
+    return bool(document) and document.get('messages') is not None and 'message_count' not in document
+
+
+def message_count_backfill(history_filter):
+    return (
+        dict(history_filter, message_count={'$exists': False}),
+        [{'$set': {'message_count': {'$size': {'$ifNull': ['$messages', []]}}}}],
+    )
+
+
+def backfill_message_count(collection, history_filter):
+    collection.update_one(*message_count_backfill(history_filter))
+    document = collection.find_one(history_filter, {'message_count': 1})
+    return (document or {}).get('message_count', 0)
+
+
+# Append-only update for new messages, keeps at most `max_messages` stored
+def append_messages_update(messages, max_messages):
+    return {
+        '$push': {'messages': {'$each': messages, '$slice': -max_messages}},
+        '$inc': {'message_count': len(messages)},
+    }
+
+
+# Messages that left the context window but are not in the summary yet,
+# returns (messages, summarized_count after folding them in)
+def summary_chunk(document, window):
+    stored = document.get('messages') or []
+    total = document.get('message_count', len(stored))
+    summarized = document.get('summarized_count', 0)
+    end = total - window
+    if end <= summarized:
+        return [], summarized
+    # Positions are counted from the end of the array since older messages may have been trimmed
+    offset = len(stored) - total
+    return stored[max(0, summarized + offset):max(0, end + offset)], end
+
+
+def build_summary_prompt(previous_summary, messages):
+    formatted_messages = "\n".join(
+        f"User: {msg['message']}" if msg['user'] else f"Assistant: {msg['message']}"
+        for msg in messages
+    )
+    return f"""Summarize this conversation between a patient and a medical assistant chatbot in a few short sentences.
+Keep the symptoms, concerns, test results and advice that were discussed, and leave out greetings and small talk.
+
+Summary so far:
+{previous_summary or "None"}
+
+New messages:
+{formatted_messages}
+"""
+
+
+class ChatSummarizer:
+    def __init__(self, collection, generate, window=12, batch=8, max_workers=2):
+        self.collection = collection
+        self.generate = generate
+        self.window = window
+        self.batch = batch
+        # Most messages that can be outside the summary, what the prompt reads back
+        self.max_context = window + batch
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-summary')
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.summaries = 0
+        self.failures = 0
+
+    # Number of latest messages the prompt needs: every one the summary does not cover
+    # yet, at least the window and at most max_context while a summary is catching up
+    def context_size(self, message_count, summarized_count):
+        return min(max(self.window, message_count - summarized_count), self.max_context)
+
+    # Summarize in batches so the summary is not regenerated on every turn
+    def needs_summary(self, message_count, summarized_count):
+        return message_count - summarized_count >= self.window + self.batch
+
+    # Schedule a background summary of the conversation when enough messages left the window
+    def submit(self, history_filter, message_count, summarized_count):
+        if not self.needs_summary(message_count, summarized_count):
+            return False
+        key = tuple(sorted(history_filter.items()))
+        with self.lock:
+            if key in self.pending:
+                return False
+            self.pending.add(key)
+        self.executor.submit(self._run, key, history_filter)
+        return True
+
+    def _run(self, key, history_filter):
+        try:
+            self.summarize(history_filter)
+        except Exception as e:
+            self.failures += 1
+            logger.warning("Chat summary failed: %s", e)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def summarize(self, history_filter):
+        document = self.collection.find_one(
+            history_filter, {'messages': 1, 'chat_summary': 1, 'message_count': 1, 'summarized_count': 1}
+        )
+        if not document:
+            return None
+        messages, summarized_count = summary_chunk(document, self.window)
+        if not messages:
+            return None
+        summary = self.generate(build_summary_prompt(document.get('chat_summary'), messages))
+        # Only apply the summary if no other worker folded in these messages meanwhile
+        self.collection.update_one(
+            dict(history_filter, summarized_count=document.get('summarized_count', {'$exists': False})),
+            {'$set': {'chat_summary': summary, 'summarized_count': summarized_count, 'summarized_at': datetime.now()}}
+        )
+        self.summaries += 1
+        return summary
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.pending)
+        return {'summaries': self.summaries, 'failures': self.failures, 'pending': pending}
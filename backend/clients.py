@@ -0,0 +1,389 @@
+import inspect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+import httpx
+import pymongo
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure
+
+# Managed MongoDB and Gemini clients.
+#
+# Neither client survives a fork: a MongoClient created in a pre-forking master
+# would hand the same sockets to every worker, and so would the httpx pool behind
+# genai. Clients are therefore created on first use and dropped in a forked child,
+# which builds its own, sized by the MONGO_* and GEMINI_* settings below.
+#
+# Each upstream sits behind a circuit breaker. After *_BREAKER_FAILURES consecutive
+# upstream failures it opens and calls fail immediately with CircuitOpenError for
+# *_BREAKER_RESET_SECONDS, then a single trial call decides whether it closes again. Pool usage and breaker state are exported by stats().
+
+MONGO_DATABASE = 'insights_db'
+
+
+def mongo_options():
+    return {
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', '50')),
+        'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_MS', '60000')),
+        'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000')),
+        # Waiting for a free pooled connection fails instead of hanging the request
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+        'appname': os.getenv('MONGO_APP_NAME', 'medinsight'),
+    }
+
+
+def gemini_http_options():
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('GEMINI_MAX_CONNECTIONS', '20')),
+        max_keepalive_connections=int(os.getenv('GEMINI_MAX_KEEPALIVE', '10')),
+        keepalive_expiry=float(os.getenv('GEMINI_KEEPALIVE_SECONDS', '30')),
+    )
+    return genai_types.HttpOptions(
+        timeout=int(float(os.getenv('GEMINI_TIMEOUT_SECONDS', '60')) * 1000),
+        client_args={'limits': limits},
+        async_client_args={'limits': limits},
+    )
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Errors that mean the upstream is unhealthy: rate limiting, server errors, timeouts
+# and connection failures. Anything else (a bad request, a duplicate key) only fails
+# that one call.
+def is_upstream_failure(error):
+    if isinstance(error, genai_errors.APIError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionFailure, TimeoutError))
+
+
+# Delay the upstream asked for in a 429 response: the Retry-After header or the
+# RetryInfo detail of a Gemini error, None when it gave none
+def advised_delay(error):
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        pass
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        for detail in details.get('error', {}).get('details', []):
+            delay = str(detail.get('retryDelay', ''))
+            if delay.endswith('s'):
+                try:
+                    return float(delay[:-1])
+                except ValueError:
+                    pass
+    return None
+
+
+# Retry policy for background jobs calling an upstream, returns (retryable, delay, rate_limited)
+def classify_upstream_error(error):
+    if isinstance(error, CircuitOpenError):
+        return True, error.retry_after, True
+    if isinstance(error, genai_errors.APIError) and error.code == 429:
+        return True, advised_delay(error), True
+    return is_upstream_failure(error), None, False
+
+
+class CircuitBreaker:
+    STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30, is_failure=is_upstream_failure):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.is_failure = is_failure
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    # Raise CircuitOpenError unless a call may go through now
+    def before(self):
+        with self.lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return
+            self.rejected += 1
+            retry_after = self.retry_after()
+        raise CircuitOpenError(f"{self.name} is unavailable, retry in {math.ceil(retry_after)}s", retry_after)
+
+    def success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_running = False
+
+    # The call ended without an outcome (e.g. a stream the client walked away from)
+    def release(self):
+        with self.lock:
+            self.trial_running = False
+
+    def failure(self, error):
+        if not self.is_failure(error):
+            # The upstream answered, only the call was wrong
+            self.success()
+            return
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    # Seconds until an open breaker lets a trial call through. While a half-open trial
+    # is in flight its outcome is unknown, and a failure reopens the breaker for a full
+    # reset_seconds, so callers wait that long rather than retry at once.
+    def retry_after(self):
+        if self.state == 'half_open':
+            return float(self.reset_seconds)
+        if self.state != 'open':
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    @contextmanager
+    def guard(self):
+        self.before()
+        try:
+            yield
+        except Exception as e:
+            self.failure(e)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.success()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'state_code': self.STATES[self.state],
+                'consecutive_failures': self.failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+# Connection pool usage of one MongoClient, from pymongo's pool monitoring events.
+# Checkout waits are matched by thread, so on the async client max_wait_ms is a lower bound.
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+        self.lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.waits = {}
+        self.max_wait = 0.0
+
+    def connection_check_out_started(self, event):
+        with self.lock:
+            self.waits[threading.get_ident()] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            started = self.waits.pop(threading.get_ident(), None)
+            if started is not None:
+                self.max_wait = max(self.max_wait, time.perf_counter() - started)
+            self.in_use += 1
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.waits.pop(threading.get_ident(), None)
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open = max(0, self.open - 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_pool_size': self.max_pool_size,
+                'open': self.open,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'saturation': round(self.in_use / self.max_pool_size, 4) if self.max_pool_size else 0,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+# A collection of the current process's client. Every call goes through the MongoDB
+# breaker; cursors returned by find() are iterated outside of it.
+class ManagedCollection:
+    def __init__(self, clients, name):
+        self._clients = clients
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._clients.collection(self._name), attr)
+        if not callable(value):
+            return value
+        breaker = self._clients.mongo_breaker
+
+        def call(*args, **kwargs):
+            with breaker.guard():
+                return value(*args, **kwargs)
+        return call
+
+    def __getitem__(self, name):
+        return self._clients.collection(self._name)[name]
+
+
+# Async twin of ManagedCollection around a collection of the async client
+class AsyncManagedCollection:
+    def __init__(self, collection, breaker):
+        self._collection = collection
+        self._breaker = breaker
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if not inspect.iscoroutinefunction(value):
+            return value
+        breaker = self._breaker
+
+        async def call(*args, **kwargs):
+            with breaker.guard():
+                return await value(*args, **kwargs)
+        return call
+
+
+class Clients:
+    def __init__(self, mongodb_uri=None, gemini_api_key=None, database=MONGO_DATABASE):
+        self.mongodb_uri = mongodb_uri
+        self.gemini_api_key = gemini_api_key
+        self.database = database
+        self.lock = threading.Lock()
+        self.mongo_breaker = CircuitBreaker(
+            'MongoDB',
+            failure_threshold=int(os.getenv('MONGO_BREAKER_FAILURES', '5')),
+            reset_seconds=float(os.getenv('MONGO_BREAKER_RESET_SECONDS', '10')),
+        )
+        self.gemini_breaker = CircuitBreaker(
+            'Gemini',
+            failure_threshold=int(os.getenv('GEMINI_BREAKER_FAILURES', '5')),
+            reset_seconds=float(os.getenv('GEMINI_BREAKER_RESET_SECONDS', '30')),
+        )
+        # Tests and benchmarks swap the Gemini client for a fake one
+        self.gemini_override = None
+        self.reset()
+        os.register_at_fork(after_in_child=self.after_fork)
+
+    def reset(self):
+        self.mongo_client = None
+        self.pool_monitor = None
+        self.async_mongo_client = None
+        self.async_pool_monitor = None
+        self.collections = {}
+        self.gemini_client = None
+
+    # Drop the clients inherited from the parent process (without closing them, the
+    # parent still uses their sockets); they are rebuilt on first use
+    def after_fork(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def mongo(self):
+        if self.mongo_client is None:
+            with self.lock:
+                if self.mongo_client is None:
+                    options = mongo_options()
+                    self.pool_monitor = PoolMonitor(options['maxPoolSize'])
+                    # connect=False defers connecting until the first operation
+                    self.mongo_client = pymongo.MongoClient(
+                        self.mongodb_uri, connect=False, event_listeners=[self.pool_monitor], **options
+                    )
+        return self.mongo_client
+
+    # Async client for the ASGI routes, it lives on the event loop of the worker
+    def async_mongo(self):
+        if self.async_mongo_client is None:
+            options = mongo_options()
+            self.async_pool_monitor = PoolMonitor(options['maxPoolSize'])
+            self.async_mongo_client = pymongo.AsyncMongoClient(
+                self.mongodb_uri, event_listeners=[self.async_pool_monitor], **options
+            )
+        return self.async_mongo_client
+
+    def async_collection(self, name):
+        return AsyncManagedCollection(self.async_mongo()[self.database][name], self.mongo_breaker)
+
+    def db(self):
+        return self.mongo()[self.database]
+
+    def collection(self, name):
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = self.collections[name] = self.db()[name]
+        return collection
+
+    def managed_collection(self, name):
+        return ManagedCollection(self, name)
+
+    def gemini(self):
+        if self.gemini_override is not None:
+            return self.gemini_override
+        if self.gemini_client is None:
+            with self.lock:
+                if self.gemini_client is None:
+                    self.gemini_client = genai.Client(api_key=self.gemini_api_key, http_options=gemini_http_options())
+        return self.gemini_client
+
+    def stats(self):
+        return {
+            'mongo_pool': self.pool_monitor.stats() if self.pool_monitor else None,
+            'mongo_async_pool': self.async_pool_monitor.stats() if self.async_pool_monitor else None,
+            'mongo_breaker': self.mongo_breaker.stats(),
+            'gemini_breaker': self.gemini_breaker.stats(),
+        }
@@ -0,0 +1,55 @@
+import logging
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Indexes the API relies on, created idempotently at startup.
+
+logger = logging.getLogger(__name__)
+
+INDEX_OPTIONS_CONFLICT = 85
+
+INDEXES = {
+    'users': [
+        ([('email', ASCENDING)], {'unique': True}),
+        ([('auth_token', ASCENDING)], {}),
+        ([('id', ASCENDING)], {}),
+    ],
+    'prediction_history': [
+        # session lookups and the predict/recommend/chat upserts
+        ([('user_id', ASCENDING), ('session_id', ASCENDING), ('disease', ASCENDING)], {}),
+        # newest-first, cursor paginated history of a user
+        ([('user_id', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING)], {}),
+    ],
+}
+
+
+# job_ttl_seconds: how long finished recommendation jobs are kept (RECOMMENDATION_JOB_TTL)
+# recommendation_ttl_seconds: how long generated recommendations are reused (RECOMMENDATION_CACHE_TTL)
+def ensure_indexes(db, job_ttl_seconds=3600, recommendation_ttl_seconds=7 * 24 * 3600):
+    indexes = dict(INDEXES)
+    # finished jobs are only polled for a short while
+    indexes['recommendation_jobs'] = [([('created_at', ASCENDING)], {'expireAfterSeconds': int(job_ttl_seconds)})]
+    # MongoDB removes expired recommendations on its own
+    indexes['recommendation_cache'] = [
+        ([('created_at', ASCENDING)], {'expireAfterSeconds': int(recommendation_ttl_seconds)})
+    ]
+    for collection_name, collection_indexes in indexes.items():
+        for keys, options in collection_indexes:
+            try:
+                db[collection_name].create_index(keys, background=True, **options)
+            except OperationFailure as e:
+                if 'expireAfterSeconds' in options and e.code == INDEX_OPTIONS_CONFLICT:
+                    # The TTL setting changed since the index was built, change it in place
+                    update_ttl(db, collection_name, keys, options['expireAfterSeconds'])
+                else:
+                    logger.warning("Could not create index %s on %s: %s", keys, collection_name, e)
+            except Exception as e:
+                # An index that cannot be built (e.g. duplicate emails) must not stop the API
+                logger.warning("Could not create index %s on %s: %s", keys, collection_name, e)
+
+
+def update_ttl(db, collection_name, keys, expire_after_seconds):
+    try:
+        db.command('collMod', collection_name, index={'keyPattern': dict(keys), 'expireAfterSeconds': expire_after_seconds})
+    except Exception as e:
+        logger.warning("Could not change the TTL of index %s on %s: %s", keys, collection_name, e)
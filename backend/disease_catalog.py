@@ -0,0 +1,85 @@
+import json
+import math
+import threading
+from disease_forms import form_field
+from static_assets import compressed_variants, make_etag
+
+# Disease metadata served by GET /api/diseases: one prediction form field per
+# feature of the current model's schema, in model order, with its widget
+# (disease_forms.py), the training range the model accepts and, for categorical
+# features, the labels.
+#
+# The document only changes when a model release is published, so it is built once
+# per set of model versions, with its ETag and compressed variants. A request costs
+# one version lookup per disease; a client that sends back the ETag gets a 304.
+
+def _bound(value):
+    return round(value, 4) if math.isfinite(value) else None
+
+
+class DiseaseCatalog:
+    def __init__(self, registry, specs):
+        self.registry = registry
+        self.specs = specs
+        self.lock = threading.Lock()
+        # disease (None for all) -> (model versions, body, etag, compressed variants)
+        self.entries = {}
+        self.builds = 0
+        self.errors = 0
+
+    def __contains__(self, disease):
+        return disease in self.specs
+
+    def describe(self, disease):
+        model_set = self.registry.get(disease)
+        schema = model_set.schema
+        fields = []
+        for name in schema.features:
+            field = form_field(disease, name)
+            if name in schema.ranges:
+                low, high = schema.ranges[name]
+                field['accepted'] = [_bound(low), _bound(high)]
+            if name in schema.categories:
+                field['categories'] = schema.categories[name]
+            fields.append(field)
+        return {
+            'disease': disease,
+            'model_version': model_set.version,
+            'positive': str(self.specs[disease]['positive']),
+            'fields': fields,
+        }
+
+    def _versions(self, diseases):
+        return tuple(self.registry.version(disease) for disease in diseases)
+
+    # (body, etag, compressed variants) of one disease, or of all of them when disease is None
+    def get(self, disease=None):
+        diseases = list(self.specs) if disease is None else [disease]
+        versions = self._versions(diseases)
+        entry = self.entries.get(disease)
+        if entry is not None and entry[0] == versions:
+            return entry[1:]
+        try:
+            if disease is None:
+                document = {'diseases': {name: self.describe(name) for name in diseases}}
+            else:
+                document = self.describe(disease)
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            raise
+        body = json.dumps(document, separators=(',', ':')).encode()
+        entry = (versions, body, make_etag(body), compressed_variants(body))
+        with self.lock:
+            self.entries[disease] = entry
+            self.builds += 1
+        return entry[1:]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'cached': len(self.entries),
+                'builds': self.builds,
+                'errors': self.errors,
+                'bytes': sum(len(entry[1]) for entry in self.entries.values()),
+            }
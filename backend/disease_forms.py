@@ -0,0 +1,175 @@
+from disease_specs import DISEASES
+
+# Prediction form widgets of every disease, served by GET /api/diseases (see
+# disease_catalog.py) so the frontend does not bundle its own copy. The fields
+# themselves and their order come from the feature schema of the model being served;
+# this only says how to show each feature:
+#   label    field label
+#   icon     lucide-react icon name
+#   type     'number', 'switch' or 'checkbox' (switches and checkboxes send 0 or 1)
+#   unit     unit shown next to a number field
+#   min, max, step
+#            limits of the number input, the clinically plausible values the form
+#            accepts; the API's own bounds are the model's training ranges
+#   options  labels of the two switch positions
+
+FORM_WIDGETS = {
+    'diabetes': {
+        'Pregnancies': {'label': 'Number of Pregnancies', 'icon': 'Baby',
+            'type': 'number', 'min': 0, 'max': 20},
+        'Glucose': {'label': 'Glucose Level', 'icon': 'Droplet',
+            'type': 'number', 'unit': 'mg/dL', 'min': 0, 'max': 500},
+        'BloodPressure': {'label': 'Blood Pressure', 'icon': 'Activity',
+            'type': 'number', 'unit': 'mmHg', 'min': 0, 'max': 180},
+        'SkinThickness': {'label': 'Skin Thickness (mm)', 'icon': 'Ruler',
+            'type': 'number', 'unit': 'mm', 'min': 0, 'max': 100},
+        'Insulin': {'label': 'Insulin Level', 'icon': 'Syringe',
+            'type': 'number', 'unit': 'mu U/ml', 'min': 0, 'max': 1000},
+        'BMI': {'label': 'Body Mass Index', 'icon': 'BarChart2',
+            'type': 'number', 'unit': '', 'step': 0.01, 'min': 0, 'max': 100},
+        'DiabetesPedigreeFunction': {'label': 'Diabetes Pedigree Function', 'icon': 'LineChart',
+            'type': 'number', 'min': 0, 'max': 5},
+        'Age': {'label': 'Age', 'icon': 'Calendar', 'type': 'number', 'min': 0, 'max': 120},
+    },
+    'heart': {
+        'age': {'label': 'Age', 'icon': 'Calendar',
+            'type': 'number', 'unit': 'years', 'min': 0, 'max': 120},
+        'sex': {'label': 'Are You Male ?', 'icon': 'User', 'type': 'checkbox'},
+        'cp': {'label': 'Chest Pain Type (1-4)', 'icon': 'HeartPulse',
+            'type': 'number', 'min': 1, 'max': 4},
+        'trestbps': {'label': 'Resting Blood Pressure', 'icon': 'Activity',
+            'type': 'number', 'unit': 'mmHg', 'min': 0, 'max': 300},
+        'chol': {'label': 'Cholesterol (mg/dL)', 'icon': 'Droplet',
+            'type': 'number', 'unit': 'mg/dL', 'min': 0, 'max': 1000},
+        'fbs': {'label': 'Fasting Blood Sugar > 120 mg/dL', 'icon': 'Flame',
+            'type': 'switch', 'options': ['No', 'Yes']},
+        'restecg': {'label': 'Resting ECG Results', 'icon': 'Brain',
+            'type': 'number', 'min': 0, 'max': 2},
+        'thalach': {'label': 'Maximum Heart Rate Achieved', 'icon': 'ActivitySquare',
+            'type': 'number', 'unit': 'bpm', 'min': 0, 'max': 300},
+        'exang': {'label': 'Exercise Induced Angina', 'icon': 'Slash', 'type': 'switch'},
+        'oldpeak': {'label': 'ST Depression', 'icon': 'TrendingDown',
+            'type': 'number', 'unit': '', 'step': 0.1, 'min': 0, 'max': 10},
+        'slope': {'label': 'Slope of Peak Exercise ST Segment', 'icon': 'BarChart2',
+            'type': 'number', 'min': 1, 'max': 3},
+        'ca': {'label': 'Number of Major Vessels', 'icon': 'Layers',
+            'type': 'number', 'min': 0, 'max': 3},
+        'thal': {'label': 'Thalassemia (1-3)', 'icon': 'Shield',
+            'type': 'number', 'min': 1, 'max': 3},
+    },
+    'lung': {
+        'GENDER': {'label': 'Are You Male ?', 'icon': 'User', 'type': 'checkbox'},
+        'AGE': {'label': 'Age', 'icon': 'Calendar',
+            'type': 'number', 'unit': 'years', 'step': 1, 'min': 0, 'max': 120},
+        'SMOKING': {'label': 'Smoking Level', 'icon': 'Cigarette',
+            'type': 'number', 'min': 1, 'max': 2},
+        'YELLOW_FINGERS': {'label': 'Yellow Fingers', 'icon': 'Hand',
+            'type': 'number', 'min': 1, 'max': 2},
+        'ANXIETY': {'label': 'Anxiety Level', 'icon': 'Brain', 'type': 'number', 'min': 1, 'max': 2},
+        'PEER_PRESSURE': {'label': 'Peer Pressure', 'icon': 'Users',
+            'type': 'number', 'min': 1, 'max': 2},
+        'CHRONIC DISEASE': {'label': 'Chronic Disease', 'icon': 'Syringe',
+            'type': 'number', 'min': 1, 'max': 2},
+        'FATIGUE': {'label': 'Fatigue Level', 'icon': 'BatteryLow',
+            'type': 'number', 'min': 1, 'max': 2},
+        'ALLERGY': {'label': 'Allergy Presence', 'icon': 'Asterisk',
+            'type': 'number', 'min': 1, 'max': 2},
+        'WHEEZING': {'label': 'Wheezing', 'icon': 'Wind', 'type': 'number', 'min': 1, 'max': 2},
+        'ALCOHOL CONSUMING': {'label': 'Alcohol Consumption Level', 'icon': 'Wine',
+            'type': 'number', 'min': 1, 'max': 2},
+        'COUGHING': {'label': 'Coughing Severity', 'icon': 'Mic',
+            'type': 'number', 'min': 1, 'max': 2},
+        'SHORTNESS OF BREATH': {'label': 'Shortness of Breath', 'icon': 'Slash',
+            'type': 'number', 'min': 1, 'max': 2},
+        'SWALLOWING DIFFICULTY': {'label': 'Swallowing Difficulty', 'icon': 'AlertTriangle',
+            'type': 'number', 'min': 1, 'max': 2},
+        'CHEST PAIN': {'label': 'Chest Pain', 'icon': 'Heart', 'type': 'number', 'min': 1, 'max': 2},
+    },
+    'parkinsons': {
+        'MDVP:Fo(Hz)': {'label': 'Average Vocal Fundamental Frequency (Hz)', 'icon': 'Mic',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Fhi(Hz)': {'label': 'Maximum Vocal Frequency (Hz)', 'icon': 'ArrowUpCircle',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Flo(Hz)': {'label': 'Minimum Vocal Frequency (Hz)', 'icon': 'ArrowDownCircle',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Jitter(%)': {'label': 'Jitter Percentage', 'icon': 'Percent',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Jitter(Abs)': {'label': 'Absolute Jitter', 'icon': 'LineChart',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:RAP': {'label': 'Relative Average Perturbation', 'icon': 'AudioWaveform',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:PPQ': {'label': 'Pitch Period Perturbation Quotient', 'icon': 'Waves',
+            'type': 'number', 'min': 0, 'max': 100},
+        'Jitter:DDP': {'label': 'DDP Jitter Metric', 'icon': 'AudioWaveform',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Shimmer': {'label': 'Shimmer', 'icon': 'Sun', 'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:Shimmer(dB)': {'label': 'Shimmer in dB', 'icon': 'Volume2',
+            'type': 'number', 'min': 0, 'max': 100},
+        'Shimmer:APQ3': {'label': 'Amplitude Perturbation Quotient (3)', 'icon': 'BarChart',
+            'type': 'number', 'min': 0, 'max': 100},
+        'Shimmer:APQ5': {'label': 'Amplitude Perturbation Quotient (5)', 'icon': 'BarChart',
+            'type': 'number', 'min': 0, 'max': 100},
+        'MDVP:APQ': {'label': 'Average Amplitude Perturbation Quotient', 'icon': 'Settings2',
+            'type': 'number', 'min': 0, 'max': 100},
+        'Shimmer:DDA': {'label': 'Difference of Differences of Amplitude', 'icon': 'Waves',
+            'type': 'number', 'min': 0, 'max': 100},
+        'NHR': {'label': 'Noise-to-Harmonics Ratio', 'icon': 'Slash',
+            'type': 'number', 'min': 0, 'max': 100},
+        'HNR': {'label': 'Harmonics-to-Noise Ratio', 'icon': 'VolumeX',
+            'type': 'number', 'min': 0, 'max': 100},
+        'RPDE': {'label': 'Recurrence Period Density Entropy', 'icon': 'Repeat',
+            'type': 'number', 'min': 0, 'max': 100},
+        'DFA': {'label': 'Detrended Fluctuation Analysis', 'icon': 'LineChart',
+            'type': 'number', 'min': 0, 'max': 100},
+        'spread1': {'label': 'Nonlinear Dynamics Spread 1', 'icon': 'MoveDiagonal',
+            'type': 'number', 'min': 0, 'max': 100},
+        'spread2': {'label': 'Nonlinear Dynamics Spread 2', 'icon': 'MoveDiagonal',
+            'type': 'number', 'min': 0, 'max': 100},
+        'D2': {'label': 'Correlation Dimension (D2)', 'icon': 'Grid3x3',
+            'type': 'number', 'min': 0, 'max': 100},
+        'PPE': {'label': 'Pitch Period Entropy', 'icon': 'Waves',
+            'type': 'number', 'min': 0, 'max': 100},
+    },
+    'liver': {
+        'Age': {'label': 'Age', 'icon': 'Calendar',
+            'type': 'number', 'unit': 'years', 'min': 0, 'max': 120},
+        'Gender': {'label': 'Are You Male ?', 'icon': 'User', 'type': 'checkbox'},
+        'BMI': {'label': 'Body Mass Index', 'icon': 'BarChart2',
+            'type': 'number', 'unit': 'mg/dL', 'step': 0.1, 'min': 0, 'max': 100},
+        'AlcoholConsumption': {'label': 'Alcohol Consumption Level', 'icon': 'Wine',
+            'type': 'number', 'unit': 'mg/dL', 'step': 0.1, 'min': 0, 'max': 100},
+        'Smoking': {'label': 'Do You Smoke ?', 'icon': 'AlarmSmoke',
+            'type': 'switch', 'options': ['No', 'Yes']},
+        'GeneticRisk': {'label': 'Genetic Risk Level', 'icon': 'AlertTriangle',
+            'type': 'number', 'min': 0, 'max': 10, 'step': 0.1},
+        'PhysicalActivity': {'label': 'Physical Activity Index', 'icon': 'PersonStanding',
+            'type': 'number', 'min': 0, 'max': 10, 'step': 0.1},
+        'Diabetes': {'label': 'Diabetes', 'icon': 'Thermometer',
+            'type': 'switch', 'options': ['No', 'Yes']},
+        'Hypertension': {'label': 'Hypertension', 'icon': 'Zap',
+            'type': 'switch', 'options': ['No', 'Yes']},
+        'LiverFunctionTest': {'label': 'Liver Function Test Result', 'icon': 'FlaskConical',
+            'type': 'number', 'min': 0, 'max': 10, 'step': 0.1},
+    },
+}
+
+
+# Form field of one feature: its widget, or a plain number input for a feature a
+# model gained before its widget was added here
+def form_field(disease, name):
+    return {'name': name, 'label': name, **FORM_WIDGETS[disease].get(name, {'type': 'number'})}
+
+
+# Every feature needs a widget and every widget a feature: a typo in a name would
+# otherwise fall back to the bare feature name. Checked at import.
+def check_widgets():
+    for disease, widgets in FORM_WIDGETS.items():
+        features = DISEASES[disease]['features']
+        unknown = [name for name in widgets if name not in features]
+        missing = [name for name in features if name not in widgets]
+        if unknown or missing:
+            raise ValueError(f"Form widgets of {disease} do not match its features: "
+                             f"unknown {unknown}, missing {missing}")
+
+
+check_widgets()
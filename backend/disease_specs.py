@@ -0,0 +1,70 @@
+# Declarative description of every disease model, shared by the training pipeline
+# (training/train_models.py) and the API.
+#
+#   csv          dataset in training/
+#   target       label column
+#   positive     label value reported as 'Positive'
+#   drop         ID columns that are not features
+#   categorical  string columns label-encoded before training
+#   features     model inputs, in training column order
+
+DISEASES = {
+    'diabetes': {
+        'csv': 'diabetes.csv',
+        'target': 'Outcome',
+        'positive': 1,
+        'drop': [],
+        'categorical': [],
+        'features': [
+            'Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI',
+            'DiabetesPedigreeFunction', 'Age',
+        ],
+    },
+    'heart': {
+        'csv': 'heart.csv',
+        'target': 'target',
+        'positive': 1,
+        'drop': [],
+        'categorical': [],
+        'features': [
+            'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak',
+            'slope', 'ca', 'thal',
+        ],
+    },
+    'lung': {
+        'csv': 'lung.csv',
+        'target': 'LUNG_CANCER',
+        'positive': 'YES',
+        'drop': [],
+        'categorical': ['GENDER'],
+        'features': [
+            'GENDER', 'AGE', 'SMOKING', 'YELLOW_FINGERS', 'ANXIETY', 'PEER_PRESSURE', 'CHRONIC DISEASE',
+            'FATIGUE', 'ALLERGY', 'WHEEZING', 'ALCOHOL CONSUMING', 'COUGHING', 'SHORTNESS OF BREATH',
+            'SWALLOWING DIFFICULTY', 'CHEST PAIN',
+        ],
+    },
+    'parkinsons': {
+        'csv': 'parkinsons.csv',
+        'target': 'status',
+        'positive': 1,
+        'drop': ['name'],
+        'categorical': [],
+        'features': [
+            'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 'MDVP:Jitter(Abs)',
+            'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP', 'MDVP:Shimmer', 'MDVP:Shimmer(dB)', 'Shimmer:APQ3',
+            'Shimmer:APQ5', 'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR', 'RPDE', 'DFA', 'spread1',
+            'spread2', 'D2', 'PPE',
+        ],
+    },
+    'liver': {
+        'csv': 'Liver.csv',
+        'target': 'Diagnosis',
+        'positive': 1,
+        'drop': [],
+        'categorical': [],
+        'features': [
+            'Age', 'Gender', 'BMI', 'AlcoholConsumption', 'Smoking', 'GeneticRisk', 'PhysicalActivity',
+            'Diabetes', 'Hypertension', 'LiverFunctionTest',
+        ],
+    },
+}
@@ -0,0 +1,133 @@
+import json
+import math
+import numpy as np
+
+# Compiled per-disease feature schema for decoding prediction requests.
+#
+# A request's named fields are written straight into a float64 row in training
+# column order, in one pass that also label-encodes categorical fields and checks
+# every value is a finite number within the accepted range. Once a row has been
+# decoded it is known to be valid, so the model can skip its own input validation.
+#
+# train_models.py writes the schema of each release next to its models. Ranges are
+# the observed training range widened by RANGE_TOLERANCE times its span on both
+# sides: a sanity bound against garbage input, not a clinical limit.
+
+RANGE_TOLERANCE = 2.0
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return float(value.strip())
+    raise TypeError
+
+
+class FeatureSchema:
+    # categories maps a categorical feature to its encoder classes (code = position)
+    def __init__(self, disease, features, categories=None, ranges=None):
+        self.disease = disease
+        self.features = list(features)
+        self.categories = {name: [str(label) for label in labels] for name, labels in (categories or {}).items()}
+        self.ranges = {name: (float(low), float(high)) for name, (low, high) in (ranges or {}).items()}
+        self.size = len(self.features)
+        self.index = {name: i for i, name in enumerate(self.features)}
+
+        # One precomputed entry per feature: (position, name, category codes, low, high)
+        self.fields = []
+        for i, name in enumerate(self.features):
+            codes = None
+            if name in self.categories:
+                codes = {}
+                for code, label in enumerate(self.categories[name]):
+                    codes[label] = code
+                    codes[label.lower()] = code
+            low, high = self.ranges.get(name, (-math.inf, math.inf))
+            self.fields.append((i, name, codes, low, high))
+
+    @classmethod
+    def from_training(cls, disease, X, encoders=None, tolerance=RANGE_TOLERANCE):
+        ranges = {}
+        for name in X.columns:
+            low, high = float(X[name].min()), float(X[name].max())
+            margin = (high - low) * tolerance
+            ranges[name] = (low - margin, high + margin)
+        categories = {name: list(encoder.classes_) for name, encoder in (encoders or {}).items()}
+        return cls(disease, X.columns, categories, ranges)
+
+    def to_dict(self):
+        return {'features': self.features, 'categories': self.categories, 'ranges': self.ranges}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, disease, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(disease, data['features'], data.get('categories'), data.get('ranges'))
+
+    # Resolve the row position of every field of a record. Objects must be keyed by
+    # feature name, a misspelled or renamed field is an error rather than being scored
+    # against some other feature. Lists are taken positionally, in training order.
+    def _positions(self, record):
+        if isinstance(record, (list, tuple)):
+            if len(record) != self.size:
+                raise SchemaError(f"{self.disease.capitalize()} model expects {self.size} input values, but got {len(record)}")
+            return self.fields, dict(zip(self.features, record))
+        unknown = [str(name) for name in record if name not in self.index]
+        missing = [name for name in self.features if name not in record]
+        if unknown:
+            message = f"Unknown fields: {', '.join(unknown)}"
+            if missing:
+                message += f"; missing fields: {', '.join(missing)}"
+            raise SchemaError(message)
+        if missing:
+            raise SchemaError(f"Missing fields: {', '.join(missing)}")
+        return self.fields, record
+
+    # Decode one JSON record into out (a preallocated float64 row), returns out
+    def decode(self, record, out=None):
+        if not isinstance(record, (dict, list, tuple)):
+            raise SchemaError('Input record must be a JSON object or array')
+        if out is None:
+            out = np.empty(self.size, dtype=np.float64)
+        fields, record = self._positions(record)
+        for i, name, codes, low, high in fields:
+            value = record[name]
+            if codes is not None and isinstance(value, str) and value.strip().lower() in codes:
+                out[i] = codes[value.strip().lower()]
+                continue
+            try:
+                number = _number(value)
+            except (TypeError, ValueError):
+                if codes is not None:
+                    raise SchemaError(f"{name} must be one of {', '.join(self.categories[name])}") from None
+                raise SchemaError(f"{name} must be numeric") from None
+            if not math.isfinite(number):
+                raise SchemaError(f"{name} must be a finite number")
+            if codes is not None and not (number.is_integer() and 0 <= number < len(self.categories[name])):
+                raise SchemaError(f"{name} must be one of {', '.join(self.categories[name])}")
+            if not low <= number <= high:
+                raise SchemaError(f"{name} must be between {low:g} and {high:g}")
+            out[i] = number
+        return out
+
+    # Decode many records into one preallocated matrix, returns (matrix, errors by row)
+    def decode_many(self, records):
+        matrix = np.empty((len(records), self.size), dtype=np.float64)
+        errors = {}
+        for row, record in enumerate(records):
+            try:
+                self.decode(record, matrix[row])
+            except SchemaError as e:
+                errors[row] = str(e)
+        return matrix, errors
@@ -0,0 +1,260 @@
+import os
+import time
+import numpy as np
+
+# Compiled, model-agnostic inference for the RandomForest classifiers.
+#
+# Every tree of a fitted forest is flattened into shared node arrays and the
+# StandardScaler is folded into the split thresholds, so serving a batch is a
+# handful of vectorized gathers over raw feature values instead of a scaler
+# transform plus one sklearn call per tree.
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'training')
+
+SIGN_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+
+
+# Map float64 values to int64 keys that sort in the same order as the floats
+def _float_to_key(values):
+    bits = np.asarray(values, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & SIGN_MASK), bits)
+
+
+def _key_to_float(keys):
+    bits = np.where(keys < 0, (-keys) | ~SIGN_MASK, keys)
+    return bits.view(np.float64)
+
+
+# sklearn scales in float64, casts to float32 and compares against the float64
+# threshold. That chain is monotonic in the raw value, so for every split there is
+# a largest raw float64 that still goes left; find it by bisecting over the
+# ordered float64 keys. This keeps predictions bit-for-bit identical to sklearn.
+def fold_thresholds(thresholds, means, scales):
+    # The bisection probes raw values up to the float64 limits, where scaling and the
+    # float32 cast overflow to +-inf. sklearn overflows the same way on such inputs
+    # and inf still compares correctly with every threshold, so the warning is noise.
+    def goes_left(keys):
+        with np.errstate(over='ignore'):
+            scaled = (_key_to_float(keys) - means) / scales
+            return scaled.astype(np.float32) <= thresholds
+
+    max_float = np.finfo(np.float64).max
+    lo = np.full(thresholds.shape, _float_to_key(-max_float), dtype=np.int64)
+    hi = np.full(thresholds.shape, _float_to_key(max_float), dtype=np.int64)
+
+    none_left = ~goes_left(lo)
+    all_left = goes_left(hi)
+    # Bisect so that goes_left(lo) stays True and goes_left(hi) stays False;
+    # the key range spans less than 2**64 values so 64 halvings always converge
+    for _ in range(64):
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        left = goes_left(mid)
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+
+    folded = _key_to_float(lo)
+    folded = np.where(none_left, -np.inf, folded)
+    return np.where(all_left, np.inf, folded)
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        self.n_features = int(feature.max()) + 1 if feature.size else 0
+        # Children interleaved as [left, right] per node, indexed by node * 2 + go_right
+        self.children = np.stack([left, right], axis=1).ravel()
+
+    # Walk every tree for every row at once, returning leaf indices (n_rows, n_trees).
+    # Rows go in blocks so the per-step node arrays stay in cache, and the walk uses
+    # flat takes: the feature value of a row is X.ravel()[row * n_columns + feature].
+    def apply(self, X, block_size=2048):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        leaves = np.empty((X.shape[0], self.roots.size), dtype=self.left.dtype)
+        for start in range(0, X.shape[0], block_size):
+            block = X[start:start + block_size]
+            values = block.ravel()
+            offsets = (np.arange(block.shape[0], dtype=np.int64) * X.shape[1])[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.roots.size))
+            for _ in range(self.max_depth):
+                go_right = ~(values.take(offsets + self.feature.take(nodes)) <= self.threshold.take(nodes))
+                nodes = self.children.take(nodes * 2 + go_right)
+            leaves[start:start + block.shape[0]] = nodes
+        return leaves
+
+    def predict_proba(self, X):
+        leaf_values = self.value[self.apply(X)]
+        # Accumulate tree by tree (cumsum is sequential) to reproduce sklearn's sum exactly
+        proba = np.cumsum(leaf_values, axis=1)[:, -1]
+        return proba / self.roots.size
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    # Class probabilities plus path-based feature contributions to class_index, in the
+    # same walk. Every split a row passes adds value[child] - value[node] of that class
+    # to the split feature, so per row bias + contributions.sum() equals the class
+    # probability (up to float rounding). Returns (proba, bias, contributions).
+    def explain(self, X, class_index, block_size=2048):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        n_rows, n_columns = X.shape
+        class_value = np.ascontiguousarray(self.value[:, class_index])
+        contributions = np.zeros((n_rows, n_columns), dtype=np.float64)
+        leaves = np.empty((n_rows, self.roots.size), dtype=self.left.dtype)
+        for start in range(0, n_rows, block_size):
+            block = X[start:start + block_size]
+            values = block.ravel()
+            offsets = (np.arange(block.shape[0], dtype=np.int64) * n_columns)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.roots.size))
+            totals = np.zeros(block.shape[0] * n_columns, dtype=np.float64)
+            for _ in range(self.max_depth):
+                slots = offsets + self.feature.take(nodes)
+                go_right = ~(values.take(slots) <= self.threshold.take(nodes))
+                children = self.children.take(nodes * 2 + go_right)
+                # Leaves point at themselves, so their difference is zero
+                totals += np.bincount(
+                    slots.ravel(), (class_value.take(children) - class_value.take(nodes)).ravel(), totals.size
+                )
+                nodes = children
+            leaves[start:start + block.shape[0]] = nodes
+            contributions[start:start + block.shape[0]] = totals.reshape(block.shape[0], n_columns)
+        proba = np.cumsum(self.value[leaves], axis=1)[:, -1] / self.roots.size
+        bias = float(class_value.take(self.roots).mean())
+        return proba, bias, contributions / self.roots.size
+
+    def arrays(self):
+        return {
+            'feature': self.feature, 'threshold': self.threshold, 'left': self.left,
+            'right': self.right, 'value': self.value, 'roots': self.roots,
+            'classes': self.classes, 'max_depth': np.array(self.max_depth),
+        }
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, **self.arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    # One plain .npy file per array, so the forest can be memory-mapped
+    def save_arrays(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self.arrays().items():
+            np.save(os.path.join(directory, f'{name}.npy'), array, allow_pickle=False)
+
+    # Map the arrays read-only: pages are loaded on first use and shared by every
+    # worker process through the OS page cache
+    @classmethod
+    def load_arrays(cls, directory, mmap_mode='r'):
+        names = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes', 'max_depth')
+        return cls(**{
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in names
+        })
+
+
+# Flatten a fitted RandomForestClassifier and its StandardScaler into a CompiledForest
+def compile_forest(model, scaler):
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(offset, offset + n_nodes, dtype=np.int32)
+        is_leaf = tree.children_left == -1
+
+        # Leaves point at themselves so extra walking steps are no-ops
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        threshold = np.full(n_nodes, np.inf)
+        split = ~is_leaf
+        threshold[split] = fold_thresholds(
+            tree.threshold[split], scaler.mean_[feature[split]], scaler.scale_[feature[split]]
+        )
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+        features.append(feature)
+        thresholds.append(threshold)
+        values.append(tree.value[:, 0, :model.n_classes_].astype(np.float64))
+        roots.append(offset)
+
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    # Store string labels (e.g. lung 'YES'/'NO') as a fixed width array so no pickle is needed
+    classes = np.asarray(model.classes_)
+    if classes.dtype == object:
+        classes = classes.astype(str)
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        classes=classes,
+        max_depth=max_depth,
+    )
+
+
+# Raise if the compiled forest disagrees with sklearn on the given raw inputs
+def verify_forest(forest, model, scaler, X):
+    X = np.asarray(X, dtype=np.float64)
+    expected = model.predict_proba(scaler.transform(X))
+    actual = forest.predict_proba(X)
+    if not np.array_equal(expected, actual):
+        mismatches = int(np.sum(np.any(expected != actual, axis=1)))
+        raise AssertionError(f"Compiled forest differs from sklearn on {mismatches} of {len(X)} rows")
+
+
+# Load a disease's forest from a directory, preferring the memory-mappable layout
+def load_forest(disease, directory=MODEL_DIR):
+    path = os.path.join(directory, f'{disease}_forest')
+    if os.path.isdir(path):
+        return CompiledForest.load_arrays(path)
+    if os.path.exists(path + '.npz'):
+        return CompiledForest.load(path + '.npz')
+    return None
+
+
+def _percentiles(timings):
+    timings_ms = np.array(timings) * 1000
+    return np.percentile(timings_ms, 50), np.percentile(timings_ms, 99)
+
+
+def _time_calls(fn, rows, repeat):
+    timings = []
+    for i in range(repeat):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        fn(row)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+# Compare single-row p50/p99 latency of sklearn and the compiled engine
+def benchmark(disease, model, scaler, forest, X, repeat=200):
+    X = np.asarray(X, dtype=np.float64)
+    rows = [X[i:i + 1] for i in range(len(X))]
+    sklearn_times = _time_calls(lambda row: model.predict(scaler.transform(row)), rows, repeat)
+    engine_times = _time_calls(forest.predict, rows, repeat)
+    sk_p50, sk_p99 = _percentiles(sklearn_times)
+    en_p50, en_p99 = _percentiles(engine_times)
+    print(
+        f"{disease}: sklearn p50={sk_p50:.3f}ms p99={sk_p99:.3f}ms | "
+        f"compiled p50={en_p50:.3f}ms p99={en_p99:.3f}ms | "
+        f"speedup p50={sk_p50 / en_p50:.1f}x p99={sk_p99 / en_p99:.1f}x"
+    )
+    return {
+        'sklearn_p50_ms': sk_p50, 'sklearn_p99_ms': sk_p99,
+        'compiled_p50_ms': en_p50, 'compiled_p99_ms': en_p99,
+    }
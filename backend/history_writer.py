@@ -0,0 +1,349 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from clients import CircuitOpenError
+
+# Write-behind buffer for the prediction history upserts.
+#
+# With write-behind enabled, update() queues the upsert and returns immediately. A
+# flusher thread sends everything queued in one ordered bulk_write once
+# flush_interval has passed since the oldest queued write, or as soon as max_batch
+# writes are waiting. Updates to the same (session_id, user_id, disease) document
+# are coalesced while they wait: $set keeps the latest values, $setOnInsert the
+# first, $inc adds up and $push concatenates the pushed items.
+#
+# Reads that must see a session's own writes (the chat context, history pages)
+# call sync() first, which flushes the matching documents right away.
+#
+# Failed flushes are retried with backoff, newer updates of a document stay behind
+# its failed ones. $push and $inc are not idempotent, so every flushed update also
+# records its write id in the document's write_ids; a write whose outcome is unknown
+# (the connection dropped mid-flush) is only resent if its id is missing. After
+# max_attempts a write is dropped and counted. Remaining writes are flushed when
+# the process exits.
+#
+# Without write-behind, update() is a plain update_one(..., upsert=True).
+
+logger = logging.getLogger(__name__)
+
+# Write ids kept per document to recognize already applied writes
+WRITE_IDS_KEPT = 20
+
+
+def _key(history_filter):
+    return tuple(sorted(history_filter.items()))
+
+
+# Fold update b into update a (both applied in that order), returns False if unsupported
+def merge_update(a, b):
+    if any(operator not in ('$set', '$setOnInsert', '$inc', '$push') for operator in b):
+        return False
+    for field, spec in b.get('$push', {}).items():
+        previous = a.get('$push', {}).get(field)
+        if previous is not None and (
+            not isinstance(previous, dict) or not isinstance(spec, dict) or '$each' not in previous
+            or '$each' not in spec or previous.get('$slice') != spec.get('$slice')
+        ):
+            return False
+    for field, value in b.get('$set', {}).items():
+        a.setdefault('$set', {})[field] = value
+    for field, value in b.get('$setOnInsert', {}).items():
+        a.setdefault('$setOnInsert', {}).setdefault(field, value)
+    for field, value in b.get('$inc', {}).items():
+        increments = a.setdefault('$inc', {})
+        increments[field] = increments.get(field, 0) + value
+    for field, spec in b.get('$push', {}).items():
+        pushes = a.setdefault('$push', {})
+        if field in pushes:
+            pushes[field] = dict(pushes[field], **{'$each': pushes[field]['$each'] + spec['$each']})
+        else:
+            pushes[field] = spec
+    return True
+
+
+class PendingWrite:
+    def __init__(self, update, callback):
+        self.update = update
+        self.callbacks = [callback] if callback else []
+        self.queued_at = time.monotonic()
+        self.write_id = None
+        self.attempts = 0
+        self.uncertain = False
+        self.coalesced = 0
+
+    # The update actually sent, recording its write id in the document
+    def operation(self):
+        update = {operator: dict(fields) for operator, fields in self.update.items()}
+        update.setdefault('$push', {})['write_ids'] = {'$each': [self.write_id], '$slice': -WRITE_IDS_KEPT}
+        return update
+
+
+class HistoryWriter:
+    def __init__(self, collection, enabled=False, flush_interval=0.2, max_batch=500, max_pending=10000,
+                 max_attempts=5, retry_backoff=0.5):
+        self.collection = collection
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.flushes = 0
+        self.flushed = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.dropped = 0
+        self.sync_fallbacks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.reset()
+        if enabled:
+            os.register_at_fork(after_in_child=self.reset)
+            atexit.register(self.close)
+
+    # The flusher thread does not survive a fork, the child starts its own
+    def reset(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.flush_lock = threading.Lock()
+        # key -> (filter, [PendingWrite]) in the order the writes have to be applied
+        self.pending = OrderedDict()
+        self.pending_count = 0
+        self.thread = None
+        self.closed = False
+        self.paused_until = 0.0
+
+    # (Re)start the flusher, also when it died
+    def _start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self.thread.start()
+
+    # Upsert a history document; callback() runs once the write has reached MongoDB
+    def update(self, history_filter, update, callback=None):
+        if not self.enabled:
+            self.collection.update_one(history_filter, update, upsert=True)
+            if callback:
+                callback()
+            return
+        with self.lock:
+            if self.closed or self.pending_count >= self.max_pending:
+                full = True
+            else:
+                full = False
+                self._start()
+                self._queue(history_filter, update, callback)
+                # An idle flusher waits without a timeout, a busy one wakes on its own
+                if self.pending_count == 1 or self.pending_count >= self.max_batch:
+                    self.wakeup.notify()
+        if full:
+            # Backpressure rather than unbounded memory while MongoDB falls behind
+            self.sync_fallbacks += 1
+            self.collection.update_one(history_filter, update, upsert=True)
+            if callback:
+                callback()
+
+    def _queue(self, history_filter, update, callback):
+        key = _key(history_filter)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = (history_filter, [])
+        writes = entry[1]
+        last = writes[-1] if writes else None
+        if last is not None and last.attempts == 0:
+            merged = {operator: dict(fields) for operator, fields in last.update.items()}
+            if merge_update(merged, update):
+                last.update = merged
+                last.coalesced += 1
+                if callback:
+                    last.callbacks.append(callback)
+                self.coalesced += 1
+                return
+        writes.append(PendingWrite(update, callback))
+        self.pending_count += 1
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.closed:
+                    now = time.monotonic()
+                    if self.pending and now >= self.paused_until:
+                        oldest = min(writes[0].queued_at for _, writes in self.pending.values())
+                        if self.pending_count >= self.max_batch or now - oldest >= self.flush_interval:
+                            break
+                        timeout = oldest + self.flush_interval - now
+                    elif self.pending:
+                        timeout = self.paused_until - now
+                    else:
+                        timeout = None
+                    self.wakeup.wait(timeout)
+                if self.closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Keep the flusher alive, queued writes are retried after a pause
+                logger.exception("History flush failed")
+                with self.lock:
+                    self.paused_until = time.monotonic() + self.retry_backoff
+
+    # Flush the queued writes of the documents matching match (all when None), returns
+    # the number of writes that reached MongoDB
+    def flush(self, match=None):
+        with self.flush_lock:
+            with self.lock:
+                if match is None:
+                    keys = list(self.pending)
+                else:
+                    keys = [key for key, (history_filter, _) in self.pending.items()
+                            if all(history_filter.get(name) == value for name, value in match.items())]
+                batch = [(key, self.pending.pop(key)) for key in keys]
+                self.pending_count -= sum(len(writes) for _, (_, writes) in batch)
+            if not batch:
+                return 0
+            return self._write(batch)
+
+    def _write(self, batch):
+        # Writes whose outcome is unknown are resent only if MongoDB has not seen them
+        for key, (history_filter, writes) in batch:
+            if any(write.uncertain for write in writes):
+                try:
+                    document = self.collection.find_one(history_filter, {'write_ids': 1}) or {}
+                except Exception as e:
+                    # Nothing was sent, but the lookup counts as an attempt so an
+                    # unreachable database ends in drops rather than endless retries
+                    logger.warning("History write lookup failed: %s", e)
+                    for _, (_, pending) in batch:
+                        for write in pending:
+                            write.attempts += 1
+                    self._requeue(batch, failed_from=0, uncertain=True)
+                    return 0
+                applied = set(document.get('write_ids', []))
+                writes[:] = [write for write in writes if write.write_id not in applied]
+
+        operations = []
+        written = []
+        for key, (history_filter, writes) in batch:
+            for write in writes:
+                write.write_id = write.write_id or uuid.uuid4().hex
+                write.attempts += 1
+                operations.append(UpdateOne(history_filter, write.operation(), upsert=True))
+                written.append((key, history_filter, write))
+        if not operations:
+            return 0
+
+        try:
+            self.collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors') or []
+            if not errors:
+                # Only the write concern failed: the writes may or may not have been applied
+                logger.warning("History flush of %d writes not acknowledged: %s", len(written),
+                               e.details.get('writeConcernErrors'))
+                self._requeue_writes(written, uncertain=True)
+                return 0
+            # Ordered: everything before the first error was applied, nothing after it
+            index = errors[0]['index']
+            self._done(written[:index])
+            key, history_filter, write = written[index]
+            logger.warning("Dropping history write for %s: %s", history_filter, errors[0].get('errmsg'))
+            self.dropped += 1
+            self._requeue_writes(written[index + 1:], uncertain=False)
+            return index
+        except (CircuitOpenError, PyMongoError) as e:
+            logger.warning("History flush of %d writes failed: %s", len(written), e)
+            self._requeue_writes(written, uncertain=not isinstance(e, CircuitOpenError))
+            return 0
+        self._done(written)
+        return len(written)
+
+    def _done(self, written):
+        now = time.monotonic()
+        self.flushes += 1
+        self.flushed += len(written)
+        for _, _, write in written:
+            lag = now - write.queued_at
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            for callback in write.callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning("History write callback failed: %s", e)
+
+    def _requeue(self, batch, failed_from=0, uncertain=False):
+        written = [(key, history_filter, write) for key, (history_filter, writes) in batch for write in writes]
+        self._requeue_writes(written[failed_from:], uncertain)
+
+    # Put failed writes back in front of anything queued for their documents since
+    def _requeue_writes(self, written, uncertain):
+        retry = OrderedDict()
+        for key, history_filter, write in written:
+            if write.attempts >= self.max_attempts:
+                logger.warning("Dropping history write for %s after %d attempts", history_filter, write.attempts)
+                self.dropped += 1
+                continue
+            write.uncertain = write.uncertain or uncertain
+            retry.setdefault(key, (history_filter, []))[1].append(write)
+        if not retry:
+            return
+        with self.lock:
+            self.retries += sum(len(writes) for _, writes in retry.values())
+            for key, (history_filter, writes) in retry.items():
+                newer = self.pending.pop(key, (history_filter, []))[1]
+                self.pending[key] = (history_filter, writes + newer)
+                self.pending_count += len(writes)
+            attempts = max(write.attempts for _, writes in retry.values() for write in writes)
+            self.paused_until = time.monotonic() + self.retry_backoff * 2 ** (attempts - 1)
+            self.wakeup.notify()
+
+    # Make the queued writes of matching documents visible before reading them
+    def sync(self, **match):
+        if self.enabled and self.has_pending(**match):
+            self.flush(match)
+
+    def has_pending(self, **match):
+        with self.lock:
+            return any(
+                all(history_filter.get(name) == value for name, value in match.items())
+                for history_filter, _ in self.pending.values()
+            )
+
+    # Stop the flusher and write what is left, retrying while attempts remain
+    def close(self, timeout=10):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.wakeup.notify()
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            if self.flush() == 0 and self.pending:
+                time.sleep(min(self.retry_backoff, max(0.0, deadline - time.monotonic())))
+        if self.pending_count:
+            logger.warning("Dropping %d unflushed history writes at shutdown", self.pending_count)
+            self.dropped += self.pending_count
+
+    def stats(self):
+        with self.lock:
+            oldest = min((writes[0].queued_at for _, writes in self.pending.values() if writes), default=None)
+            pending = self.pending_count
+        return {
+            'enabled': self.enabled,
+            'pending': pending,
+            'oldest_pending_ms': round((time.monotonic() - oldest) * 1000, 3) if oldest is not None else 0,
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'sync_fallbacks': self.sync_fallbacks,
+            'last_flush_lag_ms': round(self.last_lag * 1000, 3),
+            'max_flush_lag_ms': round(self.max_lag * 1000, 3),
+        }
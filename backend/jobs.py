@@ -0,0 +1,199 @@
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+# In-process background jobs for slow upstream calls (Gemini recommendations).
+#
+# submit() records a job and returns at once; a bounded pool of worker threads runs
+# the handler, retrying failures the classifier deems retryable with exponential
+# backoff and jitter. When the upstream says it is rate limited (HTTP 429 or an open
+# circuit breaker) the whole pool pauses for the advised delay instead of every
+# worker hitting it again. At most max_pending jobs wait; beyond that submit()
+# raises QueueFullError so the caller can shed load.
+#
+# Job state lives in memory, where pollers can wait on it, and is mirrored to a
+# MongoDB collection so that a poll reaching another worker process still finds it.
+# Jobs are lost if their process exits before they ran.
+#
+# A job is queued, running, retrying (waiting out a backoff), then done or failed.
+
+class QueueFullError(Exception):
+    pass
+
+
+# Default classifier: retry everything, never pause, returns (retryable, delay, rate_limited)
+def retry_everything(error):
+    return True, None, False
+
+
+class JobQueue:
+    def __init__(self, handler, collection=None, workers=4, max_pending=100, max_attempts=4,
+                 backoff_seconds=1.0, max_backoff_seconds=30.0, classify=retry_everything, ttl_seconds=3600):
+        self.handler = handler
+        self.collection = collection
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.classify = classify
+        self.ttl_seconds = ttl_seconds
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    # Worker threads do not survive a fork, the child starts its own on first submit
+    def reset(self):
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.jobs = OrderedDict()
+        self.threads = []
+        self.queued = 0
+        self.running = 0
+        self.paused_until = 0.0
+
+    def _start_workers(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                worker.start()
+                self.threads.append(worker)
+
+    # Queue payload for the handler, returns the public view of the new job
+    def submit(self, payload, owner=None):
+        self._start_workers()
+        now = datetime.now()
+        job = {
+            'job_id': uuid.uuid4().hex, 'status': 'queued', 'owner': owner, 'attempts': 0,
+            'error': None, 'result': None, 'created_at': now, 'updated_at': now,
+        }
+        done = threading.Event()
+        with self.lock:
+            if self.queued >= self.max_pending:
+                raise QueueFullError(f"{self.max_pending} jobs are already waiting, try again later")
+            self.queued += 1
+            self._prune()
+            self.jobs[job['job_id']] = (job, done)
+            self.submitted += 1
+        # Stored before a worker can pick it up, so 'queued' never overwrites a later status
+        self._store(job)
+        self.pending.put((job, payload, done))
+        return self.view(job)
+
+    # Drop finished jobs older than the TTL, oldest first
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self.jobs:
+            job, done = next(iter(self.jobs.values()))
+            if not done.is_set() or job['updated_at'].timestamp() > cutoff:
+                break
+            self.jobs.popitem(last=False)
+
+    def _store(self, job):
+        if self.collection is None:
+            return
+        try:
+            fields = dict(job)
+            job_id = fields.pop('job_id')
+            self.collection.update_one({'_id': job_id}, {'$set': fields}, upsert=True)
+        except Exception:
+            pass
+
+    def _update(self, job, **fields):
+        job.update(fields, updated_at=datetime.now())
+        self._store(job)
+
+    def _work(self):
+        while True:
+            job, payload, done = self.pending.get()
+            with self.lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                self._run(job, payload)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                done.set()
+
+    def _run(self, job, payload):
+        while True:
+            self._wait_while_paused()
+            self._update(job, status='running', attempts=job['attempts'] + 1)
+            try:
+                result = self.handler(payload)
+            except Exception as e:
+                retryable, delay, rate_limited = self.classify(e)
+                if not retryable or job['attempts'] >= self.max_attempts:
+                    self._update(job, status='failed', error=str(e))
+                    with self.lock:
+                        self.failed += 1
+                    return
+                # No advised delay (or a zero one, e.g. a breaker about to let a trial
+                # through) must not retry in a tight loop
+                if not delay:
+                    delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (job['attempts'] - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                with self.lock:
+                    self.retries += 1
+                    if rate_limited:
+                        self.rate_limited += 1
+                        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                self._update(job, status='retrying', error=str(e))
+                if not rate_limited:
+                    time.sleep(delay)
+                continue
+            self._update(job, status='done', result=result, error=None)
+            with self.lock:
+                self.completed += 1
+            return
+
+    def _wait_while_paused(self):
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def view(self, job):
+        return {key: value for key, value in job.items() if key != 'owner'}
+
+    # Job by id, returns (view, owner) or (None, None). wait_seconds long-polls a job
+    # of this process until it finishes.
+    def get(self, job_id, wait_seconds=0):
+        entry = self.jobs.get(job_id)
+        if entry is not None:
+            job, done = entry
+            if wait_seconds > 0:
+                done.wait(wait_seconds)
+            return self.view(job), job['owner']
+        if self.collection is None:
+            return None, None
+        document = self.collection.find_one({'_id': job_id})
+        if document is None:
+            return None, None
+        document['job_id'] = document.pop('_id')
+        return self.view(document), document.get('owner')
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'running': self.running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'paused_seconds': round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
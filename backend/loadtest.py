@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import numpy as np
+import uvicorn
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# Local load test of the chat route: threaded Flask (WSGI) versus the ASGI mode.
+#
+# Gemini is replaced by a fake client that answers after --latency seconds, so the
+# numbers show how many chats one process keeps in flight rather than model speed.
+# Chats are sent without a SessionId, so no MongoDB server is needed.
+#
+#   python loadtest.py --concurrency 200 --requests 400 --threads 8
+
+os.environ.setdefault('GEMINI_API_KEY', 'loadtest')
+
+import app as flask_app
+import asgi
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, model, contents, **kwargs):
+        time.sleep(self.latency)
+        return FakeResponse('ok')
+
+
+class FakeAsyncModels:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def generate_content(self, model, contents, **kwargs):
+        await asyncio.sleep(self.latency)
+        return FakeResponse('ok')
+
+
+class FakeClient:
+    def __init__(self, latency):
+        self.models = FakeModels(latency)
+        self.aio = type('FakeAio', (), {'models': FakeAsyncModels(latency)})()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+# Serves connections on a fixed number of threads, like one threaded WSGI worker
+class PooledWSGIServer(BaseWSGIServer):
+    request_queue_size = 4096
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=QuietRequestHandler)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.handle_in_thread, request, client_address)
+
+    def handle_in_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve_wsgi(port, threads, latency):
+    flask_app.clients.gemini_override = FakeClient(latency)
+    PooledWSGIServer('127.0.0.1', port, flask_app.app, threads).serve_forever()
+
+
+def serve_asgi(port, latency):
+    flask_app.clients.gemini_override = FakeClient(latency)
+    uvicorn.run(asgi.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+# Run a server in its own process so the load generator does not compete for its GIL
+def start_server(target, *args):
+    process = multiprocessing.Process(target=target, args=args, daemon=True)
+    process.start()
+    port = args[0]
+    for _ in range(200):
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/health', timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+async def run_load(url, concurrency, total):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(timeout=300, limits=limits) as http:
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await http.post(url, json={'form_data': {}})
+                if response.status_code != 200:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': total,
+        'failures': failures,
+        'wall_s': round(wall, 2),
+        'throughput_rps': round(total / wall, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 1),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare chat concurrency of the WSGI and ASGI serving modes')
+    parser.add_argument('--latency', type=float, default=1.0, help='fake Gemini latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8, help='threads of the WSGI worker')
+    parser.add_argument('--disease', default='diabetes')
+    args = parser.parse_args()
+
+    path = f'/api/chat/{args.disease}'
+    results = {}
+    for mode, target, server_args in [
+        (f'wsgi ({args.threads} threads)', serve_wsgi, (5101, args.threads, args.latency)),
+        ('asgi (1 event loop)', serve_asgi, (5102, args.latency)),
+    ]:
+        process = start_server(target, *server_args)
+        try:
+            url = f'http://127.0.0.1:{server_args[0]}{path}'
+            results[mode] = asyncio.run(run_load(url, args.concurrency, args.requests))
+        finally:
+            process.terminate()
+
+    print(f"{args.requests} chats, concurrency {args.concurrency}, fake Gemini latency {args.latency}s")
+    for mode, result in results.items():
+        print(
+            f"{mode:>20}: {result['throughput_rps']:>7} req/s  wall {result['wall_s']}s  "
+            f"p50 {result['p50_ms']}ms  p99 {result['p99_ms']}ms  failures {result['failures']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Request tracing and Prometheus metrics.
+#
+# Each request starts a trace labelled with its route and disease; span(stage)
+# times one stage of it (auth, history_read, prompt, gemini, ...) into a latency
+# histogram and into the request's Server-Timing header. Histograms are fixed
+# bucket arrays updated under a lock, cheap enough to leave on in production.
+# The trace lives in a context variable, so it follows a request across Flask
+# threads and Starlette tasks alike.
+#
+# Metrics are per process: with several workers, scrape each one or aggregate
+# in Prometheus.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.stats = []
+
+    def histogram(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    # Export the numeric values of a component's stats() dict as gauges <prefix>_<key>
+    def register_stats(self, prefix, stats):
+        self.stats.append((prefix, stats))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self.stats:
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'# TYPE {prefix}_{key} gauge')
+                    lines.append(f'{prefix}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Request latency until the response is returned', ('route', 'disease', 'method', 'status')
+)
+stage_seconds = registry.histogram(
+    'request_stage_duration_seconds', 'Latency of one stage of a request', ('route', 'disease', 'stage')
+)
+inference_seconds = registry.histogram(
+    'model_inference_duration_seconds', 'Model inference latency per call', ('disease',)
+)
+inference_rows = registry.histogram(
+    'model_inference_rows', 'Rows scored per model inference call', ('disease',), buckets=SIZE_BUCKETS
+)
+shadow_rows = registry.counter(
+    'shadow_prediction_rows_total', 'Rows scored again by a candidate model, by agreement with the live model',
+    ('disease', 'candidate', 'outcome')
+)
+shadow_seconds = registry.histogram(
+    'shadow_inference_duration_seconds', 'Candidate model inference latency per shadowed call', ('disease', 'candidate')
+)
+served_rows = registry.counter(
+    'model_served_rows_total', 'Rows answered by the live or the candidate model', ('disease', 'arm')
+)
+gemini_tokens = registry.counter(
+    'gemini_tokens_total', 'Gemini tokens used, by kind (prompt, candidates, total)', ('route', 'disease', 'kind')
+)
+
+
+class Trace:
+    __slots__ = ('route', 'disease', 'started', 'spans')
+
+    def __init__(self, route, disease):
+        self.route = route
+        self.disease = disease
+        self.started = time.perf_counter()
+        self.spans = []
+
+
+current_trace = ContextVar('current_trace', default=None)
+
+
+def start_trace(route, disease=None):
+    trace = Trace(route, disease or '')
+    current_trace.set(trace)
+    return trace
+
+
+# Record the request latency, returns the Server-Timing header value of its spans.
+# The trace stays current so stages of a streamed body are still recorded.
+def finish_trace(method, status):
+    trace = current_trace.get()
+    if trace is None:
+        return None
+    elapsed = time.perf_counter() - trace.started
+    request_seconds.observe((trace.route, trace.disease, method, str(status)), elapsed)
+    timings = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in trace.spans]
+    timings.append(f'total;dur={elapsed * 1000:.2f}')
+    return ', '.join(timings)
+
+
+@contextmanager
+def span(stage):
+    trace = current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            elapsed = time.perf_counter() - started
+            trace.spans.append((stage, elapsed))
+            stage_seconds.observe((trace.route, trace.disease, stage), elapsed)
+
+
+def record_inference(disease, rows, seconds):
+    inference_seconds.observe((disease,), seconds)
+    inference_rows.observe((disease,), rows)
+
+
+def record_shadow(disease, candidate, agreed, disagreed, seconds):
+    shadow_rows.inc((disease, candidate, 'agree'), agreed)
+    shadow_rows.inc((disease, candidate, 'disagree'), disagreed)
+    shadow_seconds.observe((disease, candidate), seconds)
+
+
+# Count the tokens of a Gemini response (or of the last chunk of a stream)
+def record_tokens(response):
+    usage = getattr(response, 'usage_metadata', None)
+    trace = current_trace.get()
+    if usage is None or trace is None:
+        return
+    for kind, field in (('prompt', 'prompt_token_count'), ('candidates', 'candidates_token_count'), ('total', 'total_token_count')):
+        count = getattr(usage, field, None)
+        if count:
+            gemini_tokens.inc((trace.route, trace.disease, kind), count)
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+import numpy as np
+from sklearn import config_context
+from forest_engine import load_forest
+from feature_schema import FeatureSchema
+from disease_specs import DISEASES
+
+# Lazy, versioned registry of the per-disease serving artifacts.
+#
+# train_models.py writes each retrained disease into its own release directory,
+# training/releases/<disease>/<version>/, and then atomically points
+# training/releases/<disease>/CURRENT at it. Nothing is loaded at import: the first
+# request for a disease memory-maps its compiled forest, so worker processes share
+# the pages through the OS page cache, and the sklearn pickles are only unpickled
+# when no forest was exported. When CURRENT changes, a new ModelSet is swapped in;
+# requests that already hold the previous set finish on it.
+#
+# Artifacts written flat into training/ by older versions of train_models.py are
+# still served (versioned by their mtimes) until a release is published.
+#
+# A release can instead be staged as the disease's candidate
+# (training/releases/<disease>/CANDIDATE). It is not served, but candidate() loads
+# it for shadow evaluation and A/B traffic (see shadow.py) until it is published or
+# cleared.
+
+RELEASES_DIR = 'releases'
+CURRENT_FILE = 'CURRENT'
+CANDIDATE_FILE = 'CANDIDATE'
+
+
+class ModelSet:
+    def __init__(self, disease, version, directory):
+        self.disease = disease
+        self.version = version
+        self.directory = directory
+        self.schema = self.load_schema()
+        self.forest = load_forest(disease, directory)
+        self.model = None
+        self.scaler = None
+        if self.forest is None:
+            self.model = self.load_pickle(f'{disease}_model.pkl')
+            self.scaler = self.load_pickle(f'{disease}_scaler.pkl')
+
+    def load_pickle(self, file_name):
+        with open(os.path.join(self.directory, file_name), 'rb') as f:
+            return pickle.load(f)
+
+    # Releases carry the schema generated at training time, flat artifacts fall back to
+    # the spec's features and the encoders pickle (without range checks)
+    def load_schema(self):
+        path = os.path.join(self.directory, f'{self.disease}_schema.json')
+        if os.path.exists(path):
+            return FeatureSchema.load(self.disease, path)
+        categories = {}
+        if os.path.exists(os.path.join(self.directory, f'{self.disease}_encoders.pkl')):
+            encoders = self.load_pickle(f'{self.disease}_encoders.pkl')
+            categories = {name: list(encoder.classes_) for name, encoder in encoders.items()}
+        return FeatureSchema(self.disease, DISEASES[self.disease]['features'], categories)
+
+    # Rows come from FeatureSchema.decode and are already validated
+    def predict(self, data):
+        if self.forest is not None:
+            return self.forest.predict(data)
+        with config_context(assume_finite=True):
+            return self.model.predict(self.scaler.transform(data))
+
+    # Predictions, positive class probabilities and the path contributions of every
+    # feature to them, returns (predictions, probabilities, bias, contributions).
+    # Contributions need the compiled forest, without it bias and contributions are None.
+    def explain(self, data):
+        positive = str(DISEASES[self.disease]['positive'])
+        if self.forest is not None:
+            classes = self.forest.classes
+            index = [str(label) for label in classes].index(positive)
+            proba, bias, contributions = self.forest.explain(data, index)
+        else:
+            classes = self.model.classes_
+            index = [str(label) for label in classes].index(positive)
+            bias = contributions = None
+            with config_context(assume_finite=True):
+                proba = self.model.predict_proba(self.scaler.transform(data))
+        return classes.take(np.argmax(proba, axis=1)), proba[:, index], bias, contributions
+
+
+def release_dir(model_dir, disease, version):
+    return os.path.join(model_dir, RELEASES_DIR, disease, version)
+
+
+def read_pointer(model_dir, disease, pointer_file):
+    try:
+        with open(os.path.join(model_dir, RELEASES_DIR, disease, pointer_file)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_pointer(model_dir, disease, pointer_file, version):
+    pointer = os.path.join(model_dir, RELEASES_DIR, disease, pointer_file)
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(pointer + '.tmp', pointer)
+
+
+# Point CURRENT at a finished release (atomic rename) and prune all but the newest releases.
+# Workers that still map a pruned release keep reading it until they swap. Publishing
+# the staged candidate promotes it, the staged candidate is never pruned.
+def publish_release(model_dir, disease, version, keep=3):
+    disease_dir = os.path.join(model_dir, RELEASES_DIR, disease)
+    write_pointer(model_dir, disease, CURRENT_FILE, version)
+    candidate = read_pointer(model_dir, disease, CANDIDATE_FILE)
+    if candidate == version:
+        clear_candidate(model_dir, disease)
+    releases = sorted(
+        name for name in os.listdir(disease_dir)
+        if name not in (CURRENT_FILE, CANDIDATE_FILE) and not name.endswith('.tmp')
+    )
+    for name in releases[:-keep] if keep else []:
+        if name not in (version, candidate):
+            shutil.rmtree(os.path.join(disease_dir, name), ignore_errors=True)
+
+
+# Stage a finished release as the candidate of a disease, replacing any previous one
+def stage_candidate(model_dir, disease, version):
+    write_pointer(model_dir, disease, CANDIDATE_FILE, version)
+
+
+def clear_candidate(model_dir, disease):
+    try:
+        os.remove(os.path.join(model_dir, RELEASES_DIR, disease, CANDIDATE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def new_release_version():
+    return time.strftime('%Y%m%d%H%M%S') + f'-{os.getpid()}'
+
+
+class ModelRegistry:
+    def __init__(self, model_dir, diseases, reload_interval=5, on_reload=None):
+        self.model_dir = model_dir
+        self.diseases = tuple(diseases)
+        self.reload_interval = reload_interval
+        self.on_reload = on_reload
+        self.sets = {}
+        self.checked_at = {}
+        self.locks = {disease: threading.Lock() for disease in self.diseases}
+        self.candidates = {}
+        self.candidate_checked_at = {}
+        self.candidate_locks = {disease: threading.Lock() for disease in self.diseases}
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    def __contains__(self, disease):
+        return disease in self.locks
+
+    def __iter__(self):
+        return iter(self.diseases)
+
+    # Resolve where the current artifacts of a disease live, returns (version, directory)
+    def locate(self, disease):
+        version = read_pointer(self.model_dir, disease, CURRENT_FILE)
+        if version:
+            return version, release_dir(self.model_dir, disease, version)
+        return self.flat_version(disease), self.model_dir
+
+    # Staged candidate of a disease, returns (version, directory) or (None, None)
+    def locate_candidate(self, disease):
+        version = read_pointer(self.model_dir, disease, CANDIDATE_FILE)
+        if version:
+            return version, release_dir(self.model_dir, disease, version)
+        return None, None
+
+    # Fingerprint of flat artifacts on disk, changes whenever they are rewritten
+    def flat_version(self, disease):
+        digest = hashlib.blake2b(digest_size=8)
+        for file_name in (f'{disease}_model.pkl', f'{disease}_scaler.pkl', f'{disease}_forest.npz', f'{disease}_forest'):
+            path = os.path.join(self.model_dir, file_name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f'{file_name}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+        return digest.hexdigest()
+
+    # Current ModelSet of a disease, loaded on first use and re-checked at most every reload_interval
+    def get(self, disease):
+        return self._get(disease, self.sets, self.checked_at, self.locks[disease], self.locate)
+
+    # Staged candidate ModelSet of a disease, None when there is none
+    def candidate(self, disease):
+        return self._get(
+            disease, self.candidates, self.candidate_checked_at, self.candidate_locks[disease], self.locate_candidate
+        )
+
+    def _get(self, disease, sets, checked_at, lock, locate):
+        current = sets.get(disease)
+        if disease in sets and time.monotonic() - checked_at[disease] < self.reload_interval:
+            return current
+        # While one thread loads a new release the others keep serving the current one
+        if not lock.acquire(blocking=disease not in sets):
+            return current
+        try:
+            current = sets.get(disease)
+            if disease in sets and time.monotonic() - checked_at[disease] < self.reload_interval:
+                return current
+            checked_at[disease] = time.monotonic()
+            version, directory = locate(disease)
+            if version is None:
+                sets[disease] = None
+                return None
+            if current is not None and version == current.version:
+                return current
+            try:
+                loaded = ModelSet(disease, version, directory)
+            except Exception:
+                if current is None:
+                    raise
+                # Artifacts are probably still being written, retry on the next check
+                self.failed_reloads += 1
+                return current
+            sets[disease] = loaded
+            if current is not None and sets is self.sets:
+                self.reloads += 1
+                if self.on_reload:
+                    self.on_reload(disease, version)
+            return loaded
+        finally:
+            lock.release()
+
+    def version(self, disease):
+        return self.get(disease).version
+
+    def stats(self):
+        return {
+            'loaded': {disease: model_set.version for disease, model_set in self.sets.items()},
+            'candidates': {disease: model_set.version for disease, model_set in self.candidates.items() if model_set},
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+        }
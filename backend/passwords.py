@@ -0,0 +1,136 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing on a small pool of worker processes.
+#
+# scrypt and pbkdf2 are slow on purpose. Run on the request threads, a burst of
+# sign-ins takes every core the prediction routes need. The pool caps hashing at
+# `workers` processes running at a lower CPU priority (`nice`), and at most
+# max_pending hashes are queued. Beyond that, PasswordHasherBusyError is raised and
+# the caller answers 503 instead of queueing more CPU work.
+#
+# `method` is a werkzeug method string such as 'scrypt:32768:8:1' or
+# 'pbkdf2:sha256:600000'. A stored hash made with other parameters still verifies,
+# and verify() also returns a new hash with the current parameters for the caller
+# to store (rehash on login).
+#
+# With workers=0 hashing runs inline on the calling thread.
+
+class PasswordHasherBusyError(Exception):
+    pass
+
+
+# The full method string werkzeug stores for method (it fills in default parameters)
+@functools.lru_cache(maxsize=8)
+def stored_method(method):
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+# Returns (valid, new_hash), new_hash is set when the stored hash used other parameters
+def verify_password(stored, password, method):
+    if not stored or not check_password_hash(stored, password):
+        return False, None
+    if stored.split('$', 1)[0] == stored_method(method):
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+def lower_priority(nice):
+    if nice:
+        os.nice(nice)
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt:32768:8:1', workers=2, max_pending=32, nice=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.nice = nice
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    # A forked child cannot use the parent's pool, it starts its own on first use
+    def reset(self):
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.executor = None
+        self.in_flight = 0
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a process that runs threads can copy a held lock. As with
+                # any spawn pool, a script importing this must guard its entry point.
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=lower_priority, initargs=(self.nice,)
+                )
+            return self.executor
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise PasswordHasherBusyError(f"{self.max_pending} password checks are already waiting, try again later")
+        started = time.perf_counter()
+        with self.lock:
+            self.in_flight += 1
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._executor().submit(fn, *args).result()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - started
+            self.slots.release()
+
+    def hash(self, password):
+        result = self._run(hash_password, password, self.method)
+        with self.lock:
+            self.hashes += 1
+        return result
+
+    # Returns (valid, new_hash), store new_hash when it is not None
+    def verify(self, stored, password):
+        valid, new_hash = self._run(verify_password, stored, password, self.method)
+        with self.lock:
+            self.verifications += 1
+            if new_hash:
+                self.rehashes += 1
+        return valid, new_hash
+
+    # Start the worker processes now rather than on the first sign-in
+    def warm(self):
+        if self.workers > 0:
+            executor = self._executor()
+            for future in [executor.submit(stored_method, self.method) for _ in range(self.workers)]:
+                future.result()
+
+    def stats(self):
+        with self.lock:
+            calls = self.hashes + self.verifications
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'in_flight': self.in_flight,
+                'hashes': self.hashes,
+                'verifications': self.verifications,
+                'rehashes': self.rehashes,
+                'rejected': self.rejected,
+                'mean_ms': round(self.total_seconds / calls * 1000, 3) if calls else 0.0,
+            }
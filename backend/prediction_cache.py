@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Bounded LRU/TTL cache of prediction results.
+#
+# Entries are content addressed: the key is a digest of the disease, the version
+# of the model that produced the result and the canonical float64 feature vector,
+# so a retrained model can never be answered from an older model's entries.
+
+
+def make_key(disease, model_version, values):
+    # Adding 0.0 folds -0.0 into 0.0 so equal vectors always hash the same
+    canonical = np.ascontiguousarray(np.asarray(values, dtype=np.float64) + 0.0)
+    digest = hashlib.blake2b(canonical.tobytes(), digest_size=16).hexdigest()
+    return (disease, model_version, digest)
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Drop every entry of a disease whose model version is no longer current
+    def invalidate(self, disease, current_version=None):
+        with self.lock:
+            stale = [
+                key for key in self.entries
+                if key[0] == disease and key[1] != current_version
+            ]
+            for key in stale:
+                del self.entries[key]
+            self.evictions += len(stale)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
@@ -0,0 +1,265 @@
+import logging
+import math
+import os
+import threading
+import time
+from google.genai import errors
+
+# Prompts for the Gemini routes, split into a fixed preamble and per-request text.
+#
+# The preambles (persona, tone, output structure) are built once at import. They are
+# sent as the system instruction. When context caching is enabled they are instead
+# uploaded once as cached content and referenced by name, so the fixed tokens are
+# not resent or billed at the full input rate on every call. A cache is created and
+# refreshed in a background thread; until it exists, or when the API refuses it
+# (for example a preamble below the model's minimum cacheable size), calls send the
+# plain system instruction and creation is retried later.
+#
+# The per-request text is fitted to a token budget: the oldest conversation
+# messages are dropped first, and long free text is cut. Tokens are counted with the
+# SDK's local tokenizer when it is installed, otherwise estimated from characters
+# per token, calibrated on the prompt token counts Gemini reports for real calls.
+
+logger = logging.getLogger(__name__)
+
+
+class Preamble:
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+
+
+class Prompt:
+    def __init__(self, preamble, text):
+        self.preamble = preamble
+        self.text = text
+
+    def __len__(self):
+        return len(self.preamble.text) + len(self.text)
+
+
+CHAT_PREAMBLE = Preamble('chat', """You are a professional, AI-powered **medical assistant chatbot** specializing in diseases related to the **heart, lungs, liver, parkinsons, and diabetes**. You are not a doctor, but you provide **medically accurate, empathetic, and easy-to-understand explanations**. You act as a supportive first step in a patient's health journey and always encourage consulting a licensed healthcare provider for diagnosis, treatment, or emergencies.
+
+Your communication style should be:
+
+* **Professional and caring**
+* **Short, clear sentences**, like a helpful human would speak
+* **Simple language**, avoiding complex jargon unless it's explained
+* **Reassuring and non-alarming**, especially when discussing serious topics
+
+When responding:
+
+* Use a **natural, conversational tone**—you should sound like a real person who cares.
+* Keep sentences **concise and human-like**, especially in follow-up answers.
+* Provide helpful guidance on symptoms, risk factors, diagnosis, and general treatment options.
+* Encourage users to seek professional care for medical decisions or emergencies.
+* Never offer a direct diagnosis or prescribe treatments.
+* If the user describes urgent symptoms (like chest pain or shortness of breath), **strongly recommend immediate medical attention.**
+
+Include statements like:
+
+* "I'm here to help explain things, but a doctor should confirm anything medical."
+* "If you feel worse or unsure, it's safest to talk to a healthcare provider."
+* "That sounds serious—please get medical help right away."
+
+Context:
+
+- The user has access to our disease prediction system
+- Available predictions: diabetes, parkinsons, heart disease, lung disease and liver disease.
+- Our system provides recommendations based on AI analysis
+- Each message gives the disease the user is consulting about, their form data, prediction and recommendation, and the conversation so far
+- If there is no prediction, ask the user to fill in the form and hit the get prediction button; if there is no recommendation, ask them to hit the get recommendation button
+
+Use this context to generate a short, supportive, and medically-informed response to the user's last message.""")
+
+RECOMMENDATION_PREAMBLE = Preamble('recommendation', """You write health recommendations for the results of our disease prediction system.
+Based on the values given, if the person has the disease, explain the possible causes (with subheading).
+If not, skip this section. Then, in the next subheading, highlight any abnormal (high/low) values and provide normal ranges.
+Next, give proper health recommendations. Lastly, suggest appropriate foods that can help improve any abnormal values.""")
+
+
+class TokenCounter:
+    def __init__(self, model, chars_per_token=4.0):
+        self.model = model
+        self.chars_per_token = chars_per_token
+        self.tokenizer = None
+        self.tokenizer_loaded = False
+        self.calibrations = 0
+
+    # The local tokenizer is optional (google-genai[local-tokenizer]) and loads its vocabulary on first use
+    def _tokenizer(self):
+        if not self.tokenizer_loaded:
+            self.tokenizer_loaded = True
+            try:
+                from google.genai.local_tokenizer import LocalTokenizer
+                self.tokenizer = LocalTokenizer(model_name=self.model)
+            except Exception as e:
+                logger.info("Local tokenizer unavailable, estimating token counts: %s", e)
+        return self.tokenizer
+
+    def count(self, text):
+        tokenizer = self._tokenizer()
+        if tokenizer is not None:
+            try:
+                return tokenizer.count_tokens(text).total_tokens
+            except Exception:
+                pass
+        return math.ceil(len(text) / self.chars_per_token)
+
+    # Calibrate the estimate on a prompt Gemini reported prompt_tokens for
+    def observe(self, characters, prompt_tokens):
+        if characters and prompt_tokens:
+            self.chars_per_token += 0.1 * (characters / prompt_tokens - self.chars_per_token)
+            self.calibrations += 1
+
+    # text cut to about max_tokens tokens
+    def truncate(self, text, max_tokens):
+        if self.count(text) <= max_tokens:
+            return text
+        return text[:int(max_tokens * self.chars_per_token)].rstrip() + ' [...]'
+
+
+class PromptBuilder:
+    def __init__(self, counter, token_budget=4000, recommendation_share=0.25):
+        self.counter = counter
+        self.token_budget = token_budget
+        self.recommendation_share = recommendation_share
+        self.built = 0
+        self.trimmed = 0
+        self.preamble_tokens = {}
+
+    def _preamble_tokens(self, preamble):
+        if preamble.name not in self.preamble_tokens:
+            self.preamble_tokens[preamble.name] = self.counter.count(preamble.text)
+        return self.preamble_tokens[preamble.name]
+
+    # parameters: compact "Name value, ..." line, or None when no form data was given
+    def chat(self, disease, parameters, prediction, recommendation, summary, messages):
+        budget = self.token_budget - self._preamble_tokens(CHAT_PREAMBLE)
+        if recommendation:
+            recommendation = self.counter.truncate(recommendation, int(budget * self.recommendation_share))
+        lines = [
+            f"Consulting about: {disease}",
+            f"Form data: {parameters or 'not provided'}",
+            f"Prediction: {prediction or 'none yet'}",
+            f"Recommendation: {recommendation or 'none yet'}",
+        ]
+        if summary:
+            lines.append(f"Summary of the earlier conversation: {summary}")
+        header = '\n'.join(lines + ['Conversation:'])
+        turns = [f"User: {msg['message']}" if msg['user'] else f"Assistant: {msg['message']}" for msg in messages]
+        available = budget - self.counter.count(header)
+
+        # Keep the longest recent run of turns that fits, always the last one
+        low, high = 0, max(len(turns) - 1, 0)
+        while low < high:
+            middle = (low + high) // 2
+            if self.counter.count('\n'.join(turns[middle:])) <= available:
+                high = middle
+            else:
+                low = middle + 1
+        if low:
+            self.trimmed += 1
+        self.built += 1
+        return Prompt(CHAT_PREAMBLE, header + '\n' + '\n'.join(turns[low:]))
+
+    def recommendation(self, findings, prediction):
+        budget = self.token_budget - self._preamble_tokens(RECOMMENDATION_PREAMBLE)
+        text = f"The diagnosis is: {prediction}."
+        cut = self.counter.truncate(findings, budget - self.counter.count(text))
+        if cut is not findings:
+            self.trimmed += 1
+        self.built += 1
+        return Prompt(RECOMMENDATION_PREAMBLE, f"{cut}\n\n{text}")
+
+    # Learn from the prompt token count Gemini reported for a call
+    def observe(self, prompt, response):
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None)
+        if isinstance(prompt_tokens, int):
+            self.counter.observe(len(prompt), prompt_tokens)
+
+    def stats(self):
+        return {
+            'token_budget': self.token_budget,
+            'built': self.built,
+            'trimmed': self.trimmed,
+            'chars_per_token': round(self.counter.chars_per_token, 3),
+            'calibrations': self.counter.calibrations,
+            'local_tokenizer': self.counter.tokenizer is not None,
+        }
+
+
+class PreambleCache:
+    def __init__(self, client, model, enabled=False, ttl_seconds=3600, retry_seconds=600, refresh_margin=300):
+        self.client = client
+        self.model = model
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.refresh_margin = refresh_margin
+        self.created = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+        # preamble name -> (cached content name or None, expires or retry time)
+        self.entries = {}
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.creating = set()
+
+    # generate_content config for a preamble: its cached content, or the plain system instruction
+    def config(self, preamble):
+        name = self._cached_name(preamble) if self.enabled else None
+        if name:
+            self.hits += 1
+            return {'cached_content': name}
+        self.misses += 1
+        return {'system_instruction': preamble.text}
+
+    def _cached_name(self, preamble):
+        now = time.time()
+        with self.lock:
+            name, until = self.entries.get(preamble.name, (None, 0))
+            due = now >= until - self.refresh_margin if name else now >= until
+            if due and preamble.name not in self.creating:
+                self.creating.add(preamble.name)
+                threading.Thread(target=self._create, args=(preamble,), daemon=True).start()
+        return name if name and now < until else None
+
+    def _create(self, preamble):
+        try:
+            cache = self.client().caches.create(model=self.model, config={
+                'system_instruction': preamble.text,
+                'display_name': f'medinsight-{preamble.name}',
+                'ttl': f'{self.ttl_seconds}s',
+            })
+            entry = (cache.name, time.time() + self.ttl_seconds)
+            self.created += 1
+        except Exception as e:
+            logger.warning("Could not cache the %s preamble, sending it inline: %s", preamble.name, e)
+            entry = (None, time.time() + self.retry_seconds)
+            self.failures += 1
+        with self.lock:
+            self.entries[preamble.name] = entry
+            self.creating.discard(preamble.name)
+
+    # A request naming cached content was refused (expired or deleted early), stop
+    # using it until it is recreated
+    def failed(self, preamble, config, error):
+        if 'cached_content' in config and isinstance(error, errors.ClientError):
+            with self.lock:
+                self.entries.pop(preamble.name, None)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'cached': sum(1 for name, _ in self.entries.values() if name),
+            'created': self.created,
+            'failures': self.failures,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
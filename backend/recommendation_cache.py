@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from prediction_cache import PredictionCache
+
+# Persistent cache for Gemini recommendations.
+#
+# Recommendations only depend on the disease, the submitted form values, the
+# prediction and the model that explained it (the prompt quotes the model's
+# probability and feature contributions, which change with a new release), so
+# identical requests are answered from an in-memory LRU, then from
+# the MongoDB `recommendation_cache` collection, and only then from Gemini.
+# Concurrent identical misses share a single upstream call (single flight).
+# Stored recommendations expire through the TTL index on created_at, built with
+# the other indexes in db_indexes.py.
+
+
+def _normalize_value(value):
+    try:
+        return repr(float(value))
+    except (TypeError, ValueError):
+        return str(value).strip().lower()
+
+
+# Canonical cache key for a recommend request body (form values plus 'prediction')
+# and the version of the model it is explained with
+def recommendation_key(disease, input_data, prediction=None, model_version=None):
+    fields = {
+        str(name).strip(): _normalize_value(value)
+        for name, value in input_data.items() if name != 'prediction'
+    }
+    if prediction is None:
+        prediction = input_data.get('prediction', 'Unknown')
+    payload = json.dumps([disease, fields, str(prediction).strip().lower(), model_version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RecommendationCache:
+    # model_version(disease) returns the current model version, None leaves it out of the keys
+    def __init__(self, collection, ttl_seconds=7 * 24 * 3600, memory_entries=1000, model_version=None):
+        self.collection = collection
+        self.model_version = model_version
+        self.memory = PredictionCache(max_entries=memory_entries, ttl_seconds=ttl_seconds)
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.upstream_calls = 0
+        self.shared_calls = 0
+        self.store_hits = 0
+        self.async_collection = None
+        self.async_in_flight = {}
+
+    def key(self, disease, input_data, prediction=None):
+        version = self.model_version(disease) if self.model_version else None
+        return recommendation_key(disease, input_data, prediction, version)
+
+    # Use an async MongoDB collection for the a* methods (ASGI serving mode)
+    def attach_async_collection(self, collection):
+        self.async_collection = collection
+
+    def _load(self, key):
+        if self.collection is None:
+            return None
+        try:
+            document = self.collection.find_one({'_id': key}, {'recommendation': 1})
+        except Exception:
+            return None
+        return document.get('recommendation') if document else None
+
+    def _store(self, key, disease, recommendation):
+        # Nothing generated (a blocked response) is not an answer worth repeating
+        if not recommendation:
+            return
+        self.memory.set(key, recommendation)
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': {'disease': disease, 'recommendation': recommendation, 'created_at': datetime.now()}},
+                upsert=True
+            )
+        except Exception:
+            pass
+
+    def get(self, key):
+        recommendation = self.memory.get(key)
+        if recommendation is None:
+            recommendation = self._load(key)
+            if recommendation is not None:
+                self.store_hits += 1
+                self.memory.set(key, recommendation)
+        return recommendation
+
+    def get_cached(self, disease, input_data):
+        return self.get(self.key(disease, input_data))
+
+    def put(self, disease, input_data, recommendation):
+        self._store(self.key(disease, input_data), disease, recommendation)
+
+    # Return the cached recommendation or call generate() once for all concurrent callers
+    def get_or_generate(self, disease, input_data, generate):
+        key = self.key(disease, input_data)
+        recommendation = self.get(key)
+        if recommendation is not None:
+            return recommendation
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+            else:
+                self.shared_calls += 1
+        if not leader:
+            return future.result()
+
+        try:
+            self.upstream_calls += 1
+            recommendation = generate()
+            self._store(key, disease, recommendation)
+            future.set_result(recommendation)
+            return recommendation
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    async def aget(self, key):
+        recommendation = self.memory.get(key)
+        if recommendation is None and self.async_collection is not None:
+            try:
+                document = await self.async_collection.find_one({'_id': key}, {'recommendation': 1})
+            except Exception:
+                document = None
+            recommendation = document.get('recommendation') if document else None
+            if recommendation is not None:
+                self.store_hits += 1
+                self.memory.set(key, recommendation)
+        return recommendation
+
+    async def _astore(self, key, disease, recommendation):
+        if not recommendation:
+            return
+        self.memory.set(key, recommendation)
+        if self.async_collection is None:
+            return
+        try:
+            await self.async_collection.update_one(
+                {'_id': key},
+                {'$set': {'disease': disease, 'recommendation': recommendation, 'created_at': datetime.now()}},
+                upsert=True
+            )
+        except Exception:
+            pass
+
+    async def aget_cached(self, disease, input_data):
+        return await self.aget(self.key(disease, input_data))
+
+    async def aput(self, disease, input_data, recommendation):
+        await self._astore(self.key(disease, input_data), disease, recommendation)
+
+    # Async variant of get_or_generate, generate is a coroutine function
+    async def aget_or_generate(self, disease, input_data, generate):
+        key = self.key(disease, input_data)
+        recommendation = await self.aget(key)
+        if recommendation is not None:
+            return recommendation
+
+        future = self.async_in_flight.get(key)
+        if future is not None:
+            self.shared_calls += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.async_in_flight[key] = future
+        try:
+            self.upstream_calls += 1
+            recommendation = await generate()
+            await self._astore(key, disease, recommendation)
+            future.set_result(recommendation)
+            return recommendation
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other request was waiting for it
+            future.exception()
+            raise
+        finally:
+            self.async_in_flight.pop(key, None)
+
+    # Seed the cache from recommendations already saved in prediction_history
+    def warm_from_history(self, history_collection, limit=1000):
+        warmed = 0
+        documents = history_collection.find(
+            {'recommendation': {'$exists': True, '$ne': ''}, 'input_data': {'$exists': True}},
+            {'disease': 1, 'input_data': 1, 'prediction': 1, 'recommendation': 1, 'recommendation_model_version': 1}
+        ).sort('updated_at', -1).limit(limit)
+        for document in documents:
+            input_data = document.get('input_data') or {}
+            prediction = input_data.get('prediction', document.get('prediction'))
+            if prediction is None:
+                continue
+            # Only recommendations explained by the current model are still valid
+            if self.model_version and document.get('recommendation_model_version') != self.model_version(document['disease']):
+                continue
+            key = self.key(document['disease'], input_data, prediction)
+            if self.get(key) is None:
+                self._store(key, document['disease'], document['recommendation'])
+                warmed += 1
+        return warmed
+
+    def stats(self):
+        return dict(
+            self.memory.stats(),
+            store_hits=self.store_hits,
+            upstream_calls=self.upstream_calls,
+            shared_calls=self.shared_calls,
+            in_flight=len(self.in_flight) + len(self.async_in_flight),
+        )
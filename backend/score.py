@@ -0,0 +1,210 @@
+import argparse
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from disease_specs import DISEASES
+from model_registry import ModelRegistry
+
+# Offline bulk scoring with the same artifacts the API serves.
+#
+# Input CSV or Parquet files are streamed in chunks. Each chunk is decoded with the
+# disease's feature schema into one float64 matrix and scored in a single
+# vectorized call, on a pool of worker processes that share the memory-mapped
+# forest. Results are written in input order as soon as they are ready, and only a
+# few chunks are in flight at a time, so memory stays bounded however large the
+# input is. Extra columns (e.g. the label of a training CSV) are carried through.
+#
+#   python score.py score diabetes training/diabetes.csv scored.csv
+#   python score.py generate diabetes 1000000 /tmp/diabetes_1m.csv
+#   python score.py score diabetes /tmp/diabetes_1m.csv /tmp/scored.parquet --workers 4
+#
+# Parquet input and output need pyarrow (requirements-dev.txt).
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training')
+
+registry = None
+
+
+def get_model_set(disease):
+    global registry
+    if registry is None:
+        registry = ModelRegistry(MODEL_DIR, list(DISEASES))
+    return registry.get(disease)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        sys.exit('Parquet files need pyarrow: pip install -r requirements-dev.txt')
+    return pyarrow
+
+
+# Vectorized twin of FeatureSchema.decode, returns (matrix, valid rows mask)
+def decode_frame(schema, frame):
+    matrix = np.empty((len(frame), schema.size), dtype=np.float64)
+    valid = np.ones(len(frame), dtype=bool)
+    for i, name, codes, low, high in schema.fields:
+        column = frame[name]
+        if codes is not None and column.dtype.kind not in 'biuf':
+            labels = column.astype(str).str.strip().str.lower()
+            values = pd.to_numeric(labels.map(codes).fillna(labels), errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+        ok = np.isfinite(values) & (values >= low) & (values <= high)
+        if codes is not None:
+            ok &= (values >= 0) & (values < len(schema.categories[name])) & (np.floor(values) == values)
+        valid &= ok
+        matrix[:, i] = values
+    return matrix, valid
+
+
+# Score one chunk (runs in a worker process), returns the chunk with a prediction column
+# and its label counts. For CSV output the chunk comes back already serialized, so the
+# writing process only appends text.
+def score_chunk(disease, frame, as_csv=False):
+    model_set = get_model_set(disease)
+    missing = [name for name in model_set.schema.features if name not in frame.columns]
+    if missing:
+        raise KeyError(f"Input is missing columns: {', '.join(missing)}")
+    matrix, valid = decode_frame(model_set.schema, frame)
+    labels = np.full(len(frame), 'Invalid', dtype=object)
+    if valid.any():
+        predictions = np.asarray(model_set.predict(matrix[valid]))
+        labels[valid] = np.where(predictions == DISEASES[disease]['positive'], 'Positive', 'Negative')
+    frame = frame.assign(prediction=labels)
+    counts = {label: int(count) for label, count in frame['prediction'].value_counts().items()}
+    if as_csv:
+        return list(frame.columns), frame.to_csv(header=False, index=False), counts
+    return list(frame.columns), frame, counts
+
+
+def read_chunks(path, chunk_size):
+    if path.endswith('.parquet'):
+        pyarrow = import_pyarrow()
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.writer = None
+        self.file = None
+
+    # chunk is a DataFrame, or CSV text without a header
+    def write(self, columns, chunk):
+        if self.parquet:
+            pyarrow = import_pyarrow()
+            table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+            return
+        if self.file is None:
+            self.file = open(self.path, 'w', newline='')
+            self.file.write(pd.DataFrame(columns=columns).to_csv(index=False))
+        self.file.write(chunk if isinstance(chunk, str) else chunk.to_csv(header=False, index=False))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+
+def score_file(disease, input_path, output_path, chunk_size, workers):
+    writer = ChunkWriter(output_path)
+    rows = 0
+    counts = {}
+    started = time.perf_counter()
+
+    as_csv = not writer.parquet
+
+    def collect(result):
+        nonlocal rows
+        columns, chunk, chunk_counts = result
+        writer.write(columns, chunk)
+        for label, count in chunk_counts.items():
+            counts[label] = counts.get(label, 0) + count
+            rows += count
+
+    try:
+        if workers <= 1:
+            for frame in read_chunks(input_path, chunk_size):
+                collect(score_chunk(disease, frame, as_csv))
+        else:
+            # At most two chunks per worker are held in memory at any time
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for frame in read_chunks(input_path, chunk_size):
+                    pending.append(executor.submit(score_chunk, disease, frame, as_csv))
+                    if len(pending) >= workers * 2:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Scored {rows} {disease} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s), peak RSS {peak_mb:.0f} MB")
+    print(', '.join(f"{label}: {count}" for label, count in sorted(counts.items())))
+
+
+# Write a synthetic input of `rows` rows by resampling the training CSV with noise, in chunks
+def generate_file(disease, rows, output_path, chunk_size, seed=0):
+    spec = DISEASES[disease]
+    source = pd.read_csv(os.path.join(MODEL_DIR, spec['csv']))[spec['features']]
+    numeric = [name for name in spec['features'] if name not in spec['categorical']]
+    spread = source[numeric].std().to_numpy() * 0.05
+    low, high = source[numeric].min().to_numpy(), source[numeric].max().to_numpy()
+    rng = np.random.default_rng(seed)
+    writer = ChunkWriter(output_path)
+    try:
+        for start in range(0, rows, chunk_size):
+            frame = source.sample(min(chunk_size, rows - start), replace=True, random_state=rng).reset_index(drop=True)
+            noise = rng.normal(0, 1, (len(frame), len(numeric))) * spread
+            frame[numeric] = np.clip(frame[numeric].to_numpy(dtype=np.float64) + noise, low, high)
+            writer.write(list(frame.columns), frame)
+    finally:
+        writer.close()
+    print(f"Wrote {rows} synthetic {disease} rows to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk score CSV or Parquet files with the served models')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    score = commands.add_parser('score', help='score an input file')
+    score.add_argument('disease', choices=list(DISEASES))
+    score.add_argument('input')
+    score.add_argument('output')
+    score.add_argument('--chunk-size', type=int, default=50000)
+    score.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    generate = commands.add_parser('generate', help='write a synthetic input file for benchmarking')
+    generate.add_argument('disease', choices=list(DISEASES))
+    generate.add_argument('rows', type=int)
+    generate.add_argument('output')
+    generate.add_argument('--chunk-size', type=int, default=100000)
+    generate.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'score':
+        score_file(args.disease, args.input, args.output, args.chunk_size, args.workers)
+    else:
+        generate_file(args.disease, args.rows, args.output, args.chunk_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
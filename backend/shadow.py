@@ -0,0 +1,168 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from metrics import record_shadow, served_rows
+
+# Shadow evaluation and A/B serving of the staged candidate models (see
+# model_registry.py for staging).
+#
+# observe() is called with every matrix the live model scored. When the disease has
+# a candidate, the matrix is queued for a background thread that scores it again
+# with the candidate and records how many rows agree with the live predictions and
+# how the candidate's latency compares on exactly the same rows. The request only
+# pays for copying the rows and queueing them. At most max_pending matrices wait;
+# beyond that they are skipped rather than queued without bound, and sample_rate
+# shadows only a share of the calls.
+#
+# route() sends traffic_percent of the single predictions to the candidate instead.
+#
+# Candidates are looked up by the background thread too, every refresh_interval,
+# so loading a newly staged candidate never blocks a request. A candidate trained on
+# different features is ignored, the rows are decoded with the live schema.
+
+class ShadowEvaluator:
+    def __init__(self, registry, enabled=True, sample_rate=1.0, traffic_percent=0.0, workers=1, max_pending=256,
+                 refresh_interval=5):
+        self.registry = registry
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.traffic_percent = traffic_percent
+        self.workers = workers
+        self.max_pending = max_pending
+        self.refresh_interval = refresh_interval
+        self.candidates = {}
+        self.refreshed_at = {}
+        # (disease, live version, candidate version) -> [calls, rows, agreed, live seconds, candidate seconds]
+        self.comparisons = {}
+        # (disease, arm) -> rows served
+        self.served = {}
+        self.skipped = 0
+        self.errors = 0
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    # The worker threads do not survive a fork, the child starts its own on first use
+    def reset(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+        self.refreshing = set()
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shadow')
+            return self.executor
+
+    # Staged candidate as last seen by the background thread, None when there is none
+    def candidate(self, disease):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if now - self.refreshed_at.get(disease, -self.refresh_interval) >= self.refresh_interval:
+            with self.lock:
+                refresh = disease not in self.refreshing
+                if refresh:
+                    self.refreshing.add(disease)
+                    self.refreshed_at[disease] = now
+            if refresh:
+                self._executor().submit(self._refresh, disease)
+        return self.candidates.get(disease)
+
+    # Only a candidate that reads the same features as the live model can score its rows
+    def _refresh(self, disease):
+        try:
+            candidate = self.registry.candidate(disease)
+            live = self.registry.get(disease)
+            if candidate is not None and (
+                candidate.version == live.version or list(candidate.schema.features) != list(live.schema.features)
+            ):
+                candidate = None
+            self.candidates[disease] = candidate
+        except Exception:
+            self.candidates[disease] = None
+            self.errors += 1
+        finally:
+            with self.lock:
+                self.refreshing.discard(disease)
+
+    # Model set that serves a single prediction: the candidate for traffic_percent of
+    # them, otherwise None for the live model
+    def route(self, disease):
+        if self.traffic_percent <= 0 or random.random() * 100 >= self.traffic_percent:
+            return None
+        return self.candidate(disease)
+
+    def count_served(self, disease, arm, rows):
+        served_rows.inc((disease, arm), rows)
+        with self.lock:
+            self.served[(disease, arm)] = self.served.get((disease, arm), 0) + rows
+
+    # Queue a live-scored matrix for scoring with the candidate
+    def observe(self, disease, live_set, rows, predictions, seconds):
+        candidate = self.candidate(disease)
+        if candidate is None:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.skipped += 1
+                return
+            self.pending += 1
+        self._executor().submit(self._compare, disease, live_set.version, candidate, rows.copy(), predictions, seconds)
+
+    def _compare(self, disease, live_version, candidate, rows, predictions, live_seconds):
+        try:
+            started = time.perf_counter()
+            candidate_predictions = candidate.predict(rows)
+            seconds = time.perf_counter() - started
+            agreed = int(np.count_nonzero(
+                np.asarray(candidate_predictions).astype(str) == np.asarray(predictions).astype(str)
+            ))
+            record_shadow(disease, candidate.version, agreed, len(rows) - agreed, seconds)
+            with self.lock:
+                key = (disease, live_version, candidate.version)
+                comparison = self.comparisons.setdefault(key, [0, 0, 0, 0.0, 0.0])
+                comparison[0] += 1
+                comparison[1] += len(rows)
+                comparison[2] += agreed
+                comparison[3] += live_seconds
+                comparison[4] += seconds
+        except Exception:
+            with self.lock:
+                self.errors += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            comparisons = {key: list(values) for key, values in self.comparisons.items()}
+            served = dict(self.served)
+            stats = {
+                'enabled': self.enabled,
+                'traffic_percent': self.traffic_percent,
+                'pending': self.pending,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'rows': sum(values[1] for values in comparisons.values()),
+                'agreed': sum(values[2] for values in comparisons.values()),
+            }
+        stats['agreement_rate'] = round(stats['agreed'] / stats['rows'], 4) if stats['rows'] else 0.0
+        stats['comparisons'] = [
+            {
+                'disease': disease, 'live_version': live_version, 'candidate_version': candidate_version,
+                'calls': calls, 'rows': rows, 'agreement_rate': round(agreed / rows, 4) if rows else 0.0,
+                'live_ms_per_call': round(live_seconds / calls * 1000, 4),
+                'candidate_ms_per_call': round(candidate_seconds / calls * 1000, 4),
+                'latency_delta_ms': round((candidate_seconds - live_seconds) / calls * 1000, 4),
+            }
+            for (disease, live_version, candidate_version), (calls, rows, agreed, live_seconds, candidate_seconds)
+            in comparisons.items()
+        ]
+        stats['served_rows'] = {f'{disease}:{arm}': rows for (disease, arm), rows in served.items()}
+        return stats
@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+from flask import Response
+
+# Precompressed, precomputed responses for the built frontend (dist/).
+#
+# At build time precompress() writes a .gz (and, when the optional brotli module is
+# installed, a .br) next to every compressible file, so no request pays for
+# compression. At startup StaticAssets reads dist once into memory: the body of
+# every file and of its compressed variants, a strong ETag and the cache headers.
+# A request then only picks the encoding its Accept-Encoding allows and answers 304
+# when If-None-Match already names the ETag.
+#
+# Vite names the files it emits under assets/ after a hash of their content, so a
+# changed file gets a new URL: they are cached for a year as immutable. Every other
+# file (index.html, favicon, manifest) is revalidated on each use, which is what
+# picks up a new build. Paths that are not files are client-side routes and get
+# index.html.
+#
+# Run `python static_assets.py dist` after building the frontend. Without sidecar
+# files, startup compresses in memory instead.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preference order when a client accepts several
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')] if brotli else [('gzip', '.gz')]
+SUFFIXES = {'.br', '.gz'}
+
+# Already compressed formats gain nothing
+COMPRESSIBLE = re.compile(r'\.(html|js|mjs|css|json|map|svg|txt|xml|ico|webmanifest)$')
+MIN_COMPRESS_SIZE = 1024
+
+# name-<hash>.<ext> as emitted by Vite
+HASHED_ASSET = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8,}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+# Compressed variants of data worth sending: encoding -> bytes
+def compressed_variants(data):
+    variants = {}
+    if len(data) >= MIN_COMPRESS_SIZE:
+        for encoding, _ in ENCODINGS:
+            body = compress(data, encoding)
+            if len(body) < len(data):
+                variants[encoding] = body
+    return variants
+
+
+def make_etag(data):
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+# The first of the available encodings the Accept-Encoding header allows (q > 0), None for identity
+def negotiate(accept_encoding, available):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding, _ in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def if_none_match(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+# Write the compressed sidecar files of every compressible file under root, returns
+# how many were written. Sidecars newer than their file are kept.
+def precompress(root):
+    written = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.splitext(name)[1] in SUFFIXES or not COMPRESSIBLE.search(name):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in ENCODINGS:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                if len(data) < MIN_COMPRESS_SIZE:
+                    continue
+                body = compress(data, encoding)
+                if len(body) < len(data):
+                    with open(target, 'wb') as f:
+                        f.write(body)
+                    written += 1
+    return written
+
+
+class Asset:
+    def __init__(self, path, data, variants, mimetype, cache_control):
+        self.path = path
+        self.data = data
+        self.variants = variants
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.etag = make_etag(data)
+
+
+class StaticAssets:
+    def __init__(self, root, index='index.html'):
+        self.root = root
+        self.index = index
+        self.assets = None
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.not_modified = 0
+
+    # Read root into memory on first use, dist does not exist when only the API runs
+    def load(self):
+        with self.lock:
+            if self.assets is None:
+                self.assets = self._scan()
+            return self.assets
+
+    def _scan(self):
+        assets = {}
+        if not os.path.isdir(self.root):
+            return assets
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if os.path.splitext(name)[1] in SUFFIXES:
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                variants = {}
+                if COMPRESSIBLE.search(name):
+                    for encoding, suffix in ENCODINGS:
+                        if os.path.exists(path + suffix):
+                            with open(path + suffix, 'rb') as f:
+                                variants[encoding] = f.read()
+                    if not variants:
+                        variants = compressed_variants(data)
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                if mimetype.startswith('text/') or mimetype in ('application/javascript', 'application/json'):
+                    mimetype += '; charset=utf-8'
+                cache_control = IMMUTABLE if HASHED_ASSET.match(relative) else REVALIDATE
+                assets[relative] = Asset(relative, data, variants, mimetype, cache_control)
+        return assets
+
+    # The asset for a request path: the file, index.html for a client-side route, or None
+    def resolve(self, path):
+        assets = self.load()
+        path = path.strip('/') or self.index
+        asset = assets.get(path)
+        if asset is None and '.' not in path.rsplit('/', 1)[-1]:
+            asset = assets.get(self.index)
+        return asset
+
+    def response(self, path, headers):
+        asset = self.resolve(path)
+        if asset is None:
+            return None
+        response = cached_response(asset.data, asset.etag, asset.variants, headers, asset.cache_control,
+                                   asset.mimetype)
+        with self.lock:
+            if response.status_code == 304:
+                self.not_modified += 1
+            else:
+                self.bytes_sent += response.content_length or 0
+                self.bytes_saved += len(asset.data) - (response.content_length or 0)
+        return response
+
+    def stats(self):
+        assets = self.load()
+        with self.lock:
+            return {
+                'files': len(assets),
+                'precompressed': sum(1 for asset in assets.values() if asset.variants),
+                'immutable': sum(1 for asset in assets.values() if asset.cache_control == IMMUTABLE),
+                'encodings': [encoding for encoding, _ in ENCODINGS],
+                'not_modified': self.not_modified,
+                'bytes_sent': self.bytes_sent,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+# Response for a precomputed body: the best variant the client accepts, or 304 when
+# the client already holds it. Each encoding has its own ETag, as they are different
+# representations of the same file.
+def cached_response(data, etag, variants, headers, cache_control, mimetype):
+    encoding = negotiate(headers.get('Accept-Encoding'), variants)
+    if encoding:
+        etag = etag[:-1] + '-' + encoding + '"'
+    response_headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if if_none_match(headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=response_headers)
+    body = data
+    if encoding:
+        body = variants[encoding]
+        response_headers['Content-Encoding'] = encoding
+    return Response(body, content_type=mimetype, headers=response_headers)
+
+
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), 'dist')
+    print(f"Wrote {precompress(root)} compressed files under {root} ({', '.join(e for e, _ in ENCODINGS)})")
@@ -0,0 +1,39 @@
+import json
+import threading
+
+# Helpers for the Server-Sent Events variants of the LLM routes.
+
+
+# Format one SSE message, data is JSON encoded so newlines in the text stay intact
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+# Per-route time to first byte: first streamed token, or the whole response when buffered
+class TimeToFirstByte:
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds):
+        with self.lock:
+            samples = self.samples.setdefault(route, [])
+            samples.append(seconds * 1000)
+            if len(samples) > self.window:
+                del samples[0]
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            result = {}
+            for route, samples in self.samples.items():
+                ordered = sorted(samples)
+                result[route] = {
+                    'count': self.counts[route],
+                    'p50_ms': round(ordered[len(ordered) // 2], 3),
+                    'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+                }
+            return result
@@ -0,0 +1,93 @@
+import time
+from types import SimpleNamespace
+import pytest
+import auth_cache
+from auth_cache import TokenCache, watch_token_changes
+
+
+def test_confirmed_token_is_remembered_until_it_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('auth_cache.time.monotonic', lambda: now[0])
+    cache = TokenCache(ttl_seconds=30)
+    assert cache.get('token') is None
+    cache.set('token', 'user')
+    now[0] += 29
+    assert cache.get('token') == 'user'
+    now[0] += 2
+    assert cache.get('token') is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'misses': 2, 'hit_rate': 0.3333}
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = TokenCache(max_entries=2)
+    cache.set('a', 'user-a')
+    cache.set('b', 'user-b')
+    cache.get('a')
+    cache.set('c', 'user-c')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'user-a'
+
+
+def test_invalidation_by_token_and_by_user():
+    cache = TokenCache()
+    cache.set('a', 'user-1')
+    cache.set('b', 'user-1')
+    cache.set('c', 'user-2')
+    cache.invalidate('c')
+    assert cache.get('c') is None
+    cache.invalidate_user('user-1')
+    assert cache.stats()['entries'] == 0
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = TokenCache(ttl_seconds=0)
+    cache.set('token', 'user')
+    assert cache.get('token') is None
+
+
+class Stop(Exception):
+    pass
+
+
+class FakeStream(list):
+    def __enter__(self):
+        return iter(self)
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+# A change stream that delivers its changes once, then loses the connection
+class FakeUsers:
+    def __init__(self, changes):
+        self.streams = [FakeStream(changes)]
+
+    def watch(self, pipeline):
+        if not self.streams:
+            raise ConnectionError('stream closed')
+        return self.streams.pop()
+
+
+def test_token_changes_in_other_workers_invalidate_the_cache(monkeypatch):
+    cache = TokenCache()
+    for token, user in (('a', 'user-1'), ('b', 'user-2'), ('c', 'user-3')):
+        cache.set(token, user)
+    changes = [
+        {'operationType': 'update', 'documentKey': {'_id': 'user-1'},
+         'updateDescription': {'updatedFields': {'auth_token': 'new'}}},
+        # Other fields do not touch the token
+        {'operationType': 'update', 'documentKey': {'_id': 'user-2'},
+         'updateDescription': {'updatedFields': {'name': 'x'}}},
+        {'operationType': 'delete', 'documentKey': {'_id': 'user-3'}},
+    ]
+
+    # Stop the watcher when it pauses before reconnecting
+    def sleep(seconds):
+        raise Stop()
+
+    monkeypatch.setattr(auth_cache, 'time', SimpleNamespace(sleep=sleep, monotonic=time.monotonic))
+    with pytest.raises(Stop):
+        watch_token_changes(FakeUsers(changes), cache)
+    assert cache.get('a') is None
+    assert cache.get('b') == 'user-2'
+    assert cache.get('c') is None
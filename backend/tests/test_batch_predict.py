@@ -0,0 +1,80 @@
+import importlib
+import sys
+import numpy as np
+import pytest
+from batch_records import parse_batch_records
+from disease_specs import DISEASES
+from feature_schema import FeatureSchema
+from prediction_cache import PredictionCache
+
+
+def test_json_array_is_one_record_per_item():
+    assert parse_batch_records(b'[{"a": 1}, [1, 2]]') == [({'a': 1}, None), ([1, 2], None)]
+
+
+def test_ndjson_is_one_record_per_line():
+    body = b'{"a": 1}\n\n{"a": 2}\n'
+    assert parse_batch_records(body) == [({'a': 1}, None), ({'a': 2}, None)]
+
+
+def test_ndjson_with_positional_records():
+    body = b'[1, 2]\n[3, 4]\n'
+    assert parse_batch_records(body) == [([1, 2], None), ([3, 4], None)]
+    assert parse_batch_records(b'[1, 2]\n', 'application/x-ndjson; charset=utf-8') == [([1, 2], None)]
+
+
+def test_invalid_line_fails_only_its_record():
+    records = parse_batch_records(b'{"a": 1}\n{"a": \n{"a": 3}')
+    assert records[0] == ({'a': 1}, None)
+    assert records[1][0] is None and records[1][1].startswith('Invalid JSON record')
+    assert records[2] == ({'a': 3}, None)
+
+
+def test_body_must_be_text():
+    with pytest.raises(ValueError):
+        parse_batch_records(b'\xff\xfe')
+
+
+class FakeModelSet:
+    def __init__(self, disease):
+        self.version = 'test'
+        self.schema = FeatureSchema(disease, DISEASES[disease]['features'])
+
+    # Positive when the first feature is above 50
+    def predict(self, data):
+        return np.where(data[:, 0] > 50, DISEASES['heart']['positive'], 0)
+
+
+# app.py needs Python 3.12 (f-string syntax); MongoDB and the models are not touched
+@pytest.fixture
+def client(monkeypatch):
+    if sys.version_info < (3, 12):
+        pytest.skip('app.py requires Python 3.12')
+    monkeypatch.setenv('MONGO_ENSURE_INDEXES', 'false')
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    app = importlib.import_module('app')
+    model_set = FakeModelSet('heart')
+    monkeypatch.setattr(app.model_registry, 'get', lambda disease: model_set)
+    monkeypatch.setattr(app.model_registry, 'candidate', lambda disease: None)
+    monkeypatch.setattr(app, 'prediction_cache', PredictionCache())
+    return app.app.test_client()
+
+
+def test_batch_endpoint_predicts_every_record(client):
+    width = len(DISEASES['heart']['features'])
+    response = client.post('/api/predict/heart/batch', data='\n'.join([
+        str([60] + [1] * (width - 1)),
+        str([40] + [1] * (width - 1)),
+        '[1, 2]',
+    ]), content_type='application/x-ndjson')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 3 and body['errors'] == 1
+    assert body['results'][0] == {'index': 0, 'prediction': 'Positive'}
+    assert body['results'][1] == {'index': 1, 'prediction': 'Negative'}
+    assert 'error' in body['results'][2]
+
+
+def test_batch_endpoint_rejects_bad_requests(client):
+    assert client.post('/api/predict/nope/batch', data='[]').status_code == 400
+    assert client.post('/api/predict/heart/batch', data='').status_code == 400
@@ -0,0 +1,68 @@
+import threading
+import time
+import pytest
+from batching import MicroBatcher
+
+
+# predict_fn doubling every row, recording the batches it is called with; calls made
+# from a worker thread wait for `release` while it is not set
+class FakeModel:
+    def __init__(self, blocked=False):
+        self.batches = []
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+        self.caller = threading.current_thread()
+
+    def __call__(self, key, rows):
+        self.batches.append(list(rows))
+        if threading.current_thread() is not self.caller:
+            self.release.wait(5)
+        return [row * 2 for row in rows]
+
+
+def test_lone_request_does_not_wait_for_the_window():
+    model = FakeModel()
+    batcher = MicroBatcher(model, window_ms=2000)
+    started = time.perf_counter()
+    assert batcher.predict('heart', 21) == 42
+    assert time.perf_counter() - started < 1
+    assert batcher.metrics()['heart']['immediate'] == 1
+
+
+def test_waiting_requests_share_one_batch():
+    model = FakeModel(blocked=True)
+    batcher = MicroBatcher(model, window_ms=1, max_batch_size=64)
+    first = batcher.submit('heart', 0)
+    while not model.batches:
+        time.sleep(0.001)
+    # Queued while the first batch runs
+    futures = [batcher.submit('heart', row) for row in range(1, 6)]
+    model.release.set()
+    assert first.result(5) == 0
+    assert [future.result(5) for future in futures] == [2, 4, 6, 8, 10]
+    assert model.batches == [[0], [1, 2, 3, 4, 5]]
+    stats = batcher.metrics()['heart']
+    assert stats['batches'] == 2 and stats['max_batch_size'] == 5
+
+
+def test_batch_failure_reaches_every_request():
+    def predict(key, rows):
+        raise ValueError('bad rows')
+
+    batcher = MicroBatcher(predict)
+    with pytest.raises(ValueError, match='bad rows'):
+        batcher.predict('heart', 1)
+
+
+def test_stalled_worker_falls_back_to_a_direct_call():
+    model = FakeModel(blocked=True)
+    batcher = MicroBatcher(model, timeout_ms=50)
+    assert batcher.predict('heart', 3) == 6
+    # Queued behind the stalled batch: cancelled after the timeout and never predicted by the worker
+    assert batcher.predict('heart', 4) == 8
+    model.release.set()
+    time.sleep(0.05)
+    assert batcher.metrics()['heart']['timeouts'] == 2
+    # The worker's stalled batch, then the two direct calls
+    assert model.batches == [[3], [3], [4]]
@@ -0,0 +1,80 @@
+import mongomock
+import pytest
+from chat_history import (
+    ChatSummarizer, append_messages_update, backfill_message_count, needs_message_count, recent_messages_projection,
+    summary_chunk,
+)
+
+HISTORY = {'session_id': 's', 'user_id': 'u', 'disease': 'heart'}
+
+
+def messages(start, stop):
+    return [{'user': i % 2 == 0, 'message': f'm{i}'} for i in range(start, stop)]
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().db.prediction_history
+
+
+def test_append_keeps_the_latest_messages_and_counts_all(collection):
+    collection.update_one(HISTORY, append_messages_update(messages(0, 4), max_messages=5), upsert=True)
+    collection.update_one(HISTORY, append_messages_update(messages(4, 7), max_messages=5), upsert=True)
+    document = collection.find_one(HISTORY)
+    assert document['messages'] == messages(2, 7)
+    assert document['message_count'] == 7
+
+
+def test_projection_reads_only_recent_messages(collection):
+    collection.insert_one(dict(HISTORY, messages=messages(0, 10), message_count=10))
+    document = collection.find_one(HISTORY, recent_messages_projection(3))
+    assert document['messages'] == messages(7, 10)
+
+
+def test_summary_chunk_skips_the_window_and_what_is_summarized():
+    document = {'messages': messages(0, 20), 'message_count': 20, 'summarized_count': 4}
+    assert summary_chunk(document, window=12) == (messages(4, 8), 8)
+    assert summary_chunk(dict(document, summarized_count=8), window=12) == ([], 8)
+
+
+def test_summary_chunk_after_older_messages_were_trimmed():
+    # 30 messages written, the first 10 trimmed from the stored array
+    document = {'messages': messages(10, 30), 'message_count': 30, 'summarized_count': 12}
+    assert summary_chunk(document, window=12) == (messages(12, 18), 18)
+    # Messages trimmed before they were summarized are skipped
+    assert summary_chunk(dict(document, summarized_count=0), window=12) == (messages(10, 18), 18)
+
+
+def test_legacy_documents_are_counted_once(collection):
+    collection.insert_one(dict(HISTORY, messages=messages(0, 30)))
+    document = collection.find_one(HISTORY, recent_messages_projection(12))
+    assert needs_message_count(document)
+    assert backfill_message_count(collection, HISTORY) == 30
+    collection.update_one(HISTORY, append_messages_update(messages(30, 32), max_messages=200))
+    assert collection.find_one(HISTORY)['message_count'] == 32
+    # Already counted, the backfill leaves the count alone
+    assert backfill_message_count(collection, HISTORY) == 32
+    assert not needs_message_count(collection.find_one(HISTORY, recent_messages_projection(12)))
+
+
+def test_prompt_context_covers_every_unsummarized_message():
+    summarizer = ChatSummarizer(None, None, window=12, batch=8)
+    assert summarizer.context_size(5, 0) == 12
+    assert summarizer.context_size(19, 0) == 19
+    assert summarizer.context_size(40, 24) == 16
+    # A summary is due, the prompt does not grow past what triggers it
+    assert summarizer.context_size(60, 0) == 20
+    assert not summarizer.needs_summary(19, 0)
+    assert summarizer.needs_summary(20, 0)
+
+
+def test_summarize_folds_messages_that_left_the_window(collection):
+    collection.insert_one(dict(HISTORY, messages=messages(0, 20), message_count=20))
+    prompts = []
+    summarizer = ChatSummarizer(collection, lambda prompt: prompts.append(prompt) or 'summary', window=12, batch=8)
+    assert summarizer.summarize(HISTORY) == 'summary'
+    assert 'm7' in prompts[0] and 'm8' not in prompts[0]
+    document = collection.find_one(HISTORY)
+    assert document['chat_summary'] == 'summary'
+    assert document['summarized_count'] == 8
+    assert summarizer.summarize(HISTORY) is None
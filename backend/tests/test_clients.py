@@ -0,0 +1,66 @@
+import time
+import pytest
+from clients import CircuitBreaker, CircuitOpenError, classify_upstream_error
+
+
+def fail(breaker, error):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def test_breaker_opens_after_consecutive_upstream_failures():
+    breaker = CircuitBreaker('gemini', failure_threshold=2, reset_seconds=30)
+    fail(breaker, TimeoutError())
+    assert breaker.stats()['state'] == 'closed'
+    fail(breaker, TimeoutError())
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.before()
+    assert 29 < info.value.retry_after <= 30
+    assert breaker.stats()['rejected'] == 1 and breaker.stats()['opened'] == 1
+
+
+def test_caller_errors_do_not_count():
+    breaker = CircuitBreaker('gemini', failure_threshold=1)
+    fail(breaker, ValueError('bad request'))
+    assert breaker.stats()['state'] == 'closed'
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker('gemini', failure_threshold=1, reset_seconds=0.05)
+    fail(breaker, TimeoutError())
+    time.sleep(0.06)
+    breaker.before()
+    # While the trial runs its outcome is unknown: wait a full reset period
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.before()
+    assert info.value.retry_after == 0.05
+    breaker.success()
+    assert breaker.stats()['state'] == 'closed'
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker('gemini', failure_threshold=3, reset_seconds=0.05)
+    for _ in range(3):
+        fail(breaker, TimeoutError())
+    time.sleep(0.06)
+    fail(breaker, TimeoutError())
+    assert breaker.stats()['state'] == 'open' and breaker.stats()['opened'] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+
+def test_abandoned_trial_frees_the_slot():
+    breaker = CircuitBreaker('gemini', failure_threshold=1, reset_seconds=0.05)
+    fail(breaker, TimeoutError())
+    time.sleep(0.06)
+    with pytest.raises(GeneratorExit):
+        with breaker.guard():
+            raise GeneratorExit()
+    breaker.before()
+
+
+def test_open_breaker_is_a_rate_limit_for_the_job_queue():
+    assert classify_upstream_error(CircuitOpenError('gemini is unavailable', 12.5)) == (True, 12.5, True)
+    assert classify_upstream_error(TimeoutError()) == (True, None, False)
+    assert classify_upstream_error(ValueError()) == (False, None, False)
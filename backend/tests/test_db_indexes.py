@@ -0,0 +1,46 @@
+from pymongo.errors import OperationFailure
+from db_indexes import INDEX_OPTIONS_CONFLICT, ensure_indexes
+
+
+# Records create_index calls; TTL indexes already exist with the ttl given
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def create_index(self, keys, background=False, **options):
+        existing = self.db.ttls.get(self.name)
+        if 'expireAfterSeconds' in options and existing not in (None, options['expireAfterSeconds']):
+            raise OperationFailure('Index already exists with different options', code=INDEX_OPTIONS_CONFLICT)
+        self.db.created.append((self.name, keys, options))
+
+
+class FakeDb:
+    def __init__(self, ttls=None):
+        self.ttls = ttls or {}
+        self.created = []
+        self.commands = []
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    def command(self, name, collection_name, **options):
+        self.commands.append((name, collection_name, options))
+
+
+def test_ttl_indexes_are_created_with_the_configured_ttl():
+    db = FakeDb()
+    ensure_indexes(db, job_ttl_seconds=60, recommendation_ttl_seconds=120)
+    created = {name: options for name, _, options in db.created}
+    assert created['recommendation_jobs'] == {'expireAfterSeconds': 60}
+    assert created['recommendation_cache'] == {'expireAfterSeconds': 120}
+    assert not db.commands
+
+
+def test_changed_ttl_is_updated_in_place():
+    db = FakeDb(ttls={'recommendation_cache': 604800})
+    ensure_indexes(db, recommendation_ttl_seconds=3600)
+    assert db.commands == [(
+        'collMod', 'recommendation_cache',
+        {'index': {'keyPattern': {'created_at': 1}, 'expireAfterSeconds': 3600}},
+    )]
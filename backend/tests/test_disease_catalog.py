@@ -0,0 +1,48 @@
+import json
+from disease_catalog import DiseaseCatalog
+from disease_specs import DISEASES
+from feature_schema import FeatureSchema
+
+
+class FakeModelSet:
+    def __init__(self, disease, version, features):
+        self.version = version
+        self.schema = FeatureSchema(disease, features, categories={'GENDER': ['F', 'M']},
+                                    ranges={'AGE': (20.0, float('inf'))})
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.sets = {disease: FakeModelSet(disease, 'v1', spec['features']) for disease, spec in DISEASES.items()}
+
+    def get(self, disease):
+        return self.sets[disease]
+
+    def version(self, disease):
+        return self.sets[disease].version
+
+
+def test_fields_follow_the_model_schema():
+    registry = FakeRegistry()
+    catalog = DiseaseCatalog(registry, DISEASES)
+    body, etag, _ = catalog.get('lung')
+    document = json.loads(body)
+    assert [field['name'] for field in document['fields']] == DISEASES['lung']['features']
+    gender, age = document['fields'][:2]
+    assert gender['label'] == 'Are You Male ?' and gender['categories'] == ['F', 'M']
+    assert age['accepted'] == [20.0, None]
+
+    # A release with a feature the forms do not know yet still gets a field
+    registry.sets['lung'] = FakeModelSet('lung', 'v2', DISEASES['lung']['features'] + ['OXYGEN'])
+    body, new_etag, _ = catalog.get('lung')
+    assert new_etag != etag
+    assert json.loads(body)['fields'][-1] == {'name': 'OXYGEN', 'label': 'OXYGEN', 'type': 'number'}
+
+
+def test_documents_are_built_once_per_model_versions():
+    catalog = DiseaseCatalog(FakeRegistry(), DISEASES)
+    first = catalog.get()
+    assert catalog.get() == first
+    assert list(json.loads(first[0])['diseases']) == list(DISEASES)
+    assert catalog.stats()['builds'] == 1
+    assert 'heart' in catalog and 'nope' not in catalog
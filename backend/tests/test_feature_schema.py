@@ -0,0 +1,62 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from feature_schema import FeatureSchema, SchemaError
+
+
+@pytest.fixture
+def schema():
+    return FeatureSchema(
+        'lung', ['GENDER', 'AGE', 'SMOKING'],
+        categories={'GENDER': ['F', 'M']},
+        ranges={'AGE': (0, 120), 'SMOKING': (1, 2)}
+    )
+
+
+def test_decodes_named_fields_in_training_order(schema):
+    row = schema.decode({'SMOKING': '2', 'AGE': 64, 'GENDER': 'm'})
+    assert row.tolist() == [1.0, 64.0, 2.0]
+
+
+def test_decodes_arrays_positionally(schema):
+    assert schema.decode(['F', 30, 1]).tolist() == [0.0, 30.0, 1.0]
+    with pytest.raises(SchemaError, match='expects 3 input values'):
+        schema.decode(['F', 30])
+
+
+def test_unknown_names_are_rejected(schema):
+    with pytest.raises(SchemaError, match='Unknown fields: Gender, Age, Smoking'):
+        schema.decode({'Gender': 'M', 'Age': 30, 'Smoking': 1})
+    with pytest.raises(SchemaError, match='Unknown fields: SMOKER; missing fields: SMOKING'):
+        schema.decode({'GENDER': 'M', 'AGE': 30, 'SMOKER': 1})
+    with pytest.raises(SchemaError, match='Missing fields: SMOKING'):
+        schema.decode({'GENDER': 'M', 'AGE': 30})
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'GENDER': 'X', 'AGE': 30, 'SMOKING': 1}, 'GENDER must be one of F, M'),
+    ({'GENDER': 2, 'AGE': 30, 'SMOKING': 1}, 'GENDER must be one of F, M'),
+    ({'GENDER': 'M', 'AGE': 'old', 'SMOKING': 1}, 'AGE must be numeric'),
+    ({'GENDER': 'M', 'AGE': math.nan, 'SMOKING': 1}, 'AGE must be a finite number'),
+    ({'GENDER': 'M', 'AGE': 130, 'SMOKING': 1}, 'AGE must be between 0 and 120'),
+])
+def test_invalid_values(schema, record, message):
+    with pytest.raises(SchemaError, match=message):
+        schema.decode(record)
+
+
+def test_decode_many_reports_errors_by_row(schema):
+    matrix, errors = schema.decode_many([['M', 40, 2], {'GENDER': 'M'}, ['F', 20, 1]])
+    assert matrix[[0, 2]].tolist() == [[1.0, 40.0, 2.0], [0.0, 20.0, 1.0]]
+    assert list(errors) == [1]
+
+
+def test_training_ranges_are_widened_and_saved(tmp_path):
+    X = pd.DataFrame({'a': [0.0, 10.0], 'b': [5.0, 5.0]})
+    schema = FeatureSchema.from_training('heart', X, tolerance=0.5)
+    assert schema.ranges == {'a': (-5.0, 15.0), 'b': (5.0, 5.0)}
+    schema.save(tmp_path / 'schema.json')
+    loaded = FeatureSchema.load('heart', tmp_path / 'schema.json')
+    assert loaded.to_dict() == schema.to_dict()
+    assert np.array_equal(loaded.decode({'a': -5, 'b': 5}), [-5.0, 5.0])
@@ -0,0 +1,55 @@
+import warnings
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from forest_engine import CompiledForest, compile_forest, fold_thresholds
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.normal(100, 30, 400), rng.uniform(0, 1, 400), rng.integers(0, 4, 400)])
+    y = (X[:, 0] / 100 + X[:, 1] + rng.normal(0, 0.3, 400) > 1.5).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+
+def test_matches_sklearn(fitted):
+    model, scaler, X = fitted
+    forest = compile_forest(model, scaler)
+    rng = np.random.default_rng(1)
+    # Training rows plus unseen ones, including values far outside the training range
+    rows = np.vstack([X, rng.normal(100, 200, (200, 3)), [[1e9, -1e9, 0.0]]])
+    expected = model.predict_proba(scaler.transform(rows))
+    assert np.array_equal(forest.predict_proba(rows), expected)
+    assert np.array_equal(forest.predict(rows), model.predict(scaler.transform(rows)))
+
+
+def test_contributions_add_up_to_probability(fitted):
+    model, scaler, X = fitted
+    forest = compile_forest(model, scaler)
+    proba, bias, contributions = forest.explain(X[:50], 1)
+    assert np.allclose(bias + contributions.sum(axis=1), proba[:, 1])
+
+
+def test_arrays_round_trip(fitted, tmp_path):
+    model, scaler, X = fitted
+    forest = compile_forest(model, scaler)
+    forest.save(tmp_path / 'forest.npz')
+    loaded = CompiledForest.load(tmp_path / 'forest.npz')
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_folding_is_exact_and_quiet():
+    thresholds = np.array([0.5, -1.0, 3e38])
+    means = np.array([1.0, 2.0, 0.0])
+    scales = np.array([1e-3, 2.0, 1e-300])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        folded = fold_thresholds(thresholds, means, scales)
+    for raw, threshold, mean, scale in zip(folded, thresholds, means, scales):
+        # The folded value is the largest raw value that still goes left
+        assert np.float32((raw - mean) / scale) <= threshold
+        assert np.float32((np.nextafter(raw, np.inf) - mean) / scale) > threshold
@@ -0,0 +1,138 @@
+from pymongo.errors import AutoReconnect, BulkWriteError
+from history_writer import HistoryWriter, merge_update
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.failures = []
+        self.lookup_failures = 0
+
+    def _document(self, history_filter):
+        return self.documents.setdefault(tuple(sorted(history_filter.items())), {})
+
+    def find_one(self, history_filter, projection=None):
+        if self.lookup_failures:
+            self.lookup_failures -= 1
+            raise AutoReconnect('lookup failed')
+        return self.documents.get(tuple(sorted(history_filter.items())))
+
+    # A queued failure is raised after applying the writes it lets through, like a
+    # connection dropped before the acknowledgement
+    def bulk_write(self, operations, ordered=True):
+        failure = self.failures.pop(0) if self.failures else None
+        if isinstance(failure, BulkWriteError) and failure.details.get('writeErrors'):
+            operations = operations[:failure.details['writeErrors'][0]['index']]
+        for operation in operations:
+            document = self._document(operation._filter)
+            for field, value in operation._doc.get('$set', {}).items():
+                document[field] = value
+            for field, value in operation._doc.get('$inc', {}).items():
+                document[field] = document.get(field, 0) + value
+            for field, spec in operation._doc.get('$push', {}).items():
+                document[field] = document.get(field, []) + spec['$each']
+        if failure is not None:
+            raise failure
+
+
+def make_writer(collection, **options):
+    writer = HistoryWriter(collection, **options)
+    # Flushed by hand, no flusher thread
+    writer.enabled = True
+    writer._start = lambda: None
+    return writer
+
+
+def test_merge_update_coalesces_operators():
+    a = {'$set': {'x': 1}, '$setOnInsert': {'created': 1}, '$inc': {'n': 1},
+         '$push': {'messages': {'$each': [1], '$slice': -10}}}
+    b = {'$set': {'x': 2}, '$setOnInsert': {'created': 2}, '$inc': {'n': 2},
+         '$push': {'messages': {'$each': [2], '$slice': -10}}}
+    assert merge_update(a, b)
+    assert a == {'$set': {'x': 2}, '$setOnInsert': {'created': 1}, '$inc': {'n': 3},
+                 '$push': {'messages': {'$each': [1, 2], '$slice': -10}}}
+
+
+def test_merge_update_refuses_what_it_cannot_fold():
+    assert not merge_update({}, {'$unset': {'x': ''}})
+    assert not merge_update({'$push': {'m': {'$each': [1], '$slice': -5}}}, {'$push': {'m': {'$each': [2]}}})
+    assert not merge_update({'$push': {'m': 1}}, {'$push': {'m': {'$each': [2]}}})
+
+
+def test_updates_to_one_document_are_coalesced():
+    collection = FakeCollection()
+    writer = make_writer(collection)
+    writer.update({'session_id': 's'}, {'$inc': {'n': 1}})
+    writer.update({'session_id': 's'}, {'$inc': {'n': 2}})
+    assert writer.stats()['pending'] == 1
+    assert writer.flush() == 1
+    assert collection.documents[(('session_id', 's'),)]['n'] == 3
+
+
+def test_unacknowledged_write_is_not_applied_twice():
+    collection = FakeCollection()
+    collection.failures.append(AutoReconnect('connection dropped'))
+    writer = make_writer(collection, retry_backoff=0)
+    writer.update({'session_id': 's'}, {'$inc': {'n': 1}})
+    assert writer.flush() == 0
+    assert writer.stats()['retries'] == 1
+    # The write reached MongoDB before the connection dropped, the retry sees its id
+    assert writer.flush() == 0
+    assert collection.documents[(('session_id', 's'),)]['n'] == 1
+    assert writer.stats()['pending'] == 0
+
+
+def test_write_concern_error_is_retried_as_uncertain():
+    collection = FakeCollection()
+    collection.failures.append(BulkWriteError({'writeErrors': [], 'writeConcernErrors': [{'errmsg': 'timeout'}]}))
+    writer = make_writer(collection, retry_backoff=0)
+    writer.update({'session_id': 's'}, {'$inc': {'n': 1}})
+    assert writer.flush() == 0
+    assert writer.pending[(('session_id', 's'),)][1][0].uncertain
+    writer.flush()
+    assert collection.documents[(('session_id', 's'),)]['n'] == 1
+
+
+def test_failed_write_is_dropped_and_later_ones_requeued():
+    collection = FakeCollection()
+    collection.failures.append(BulkWriteError({'writeErrors': [{'index': 1, 'errmsg': 'bad'}]}))
+    writer = make_writer(collection, retry_backoff=0)
+    for session in 'abc':
+        writer.update({'session_id': session}, {'$inc': {'n': 1}})
+    assert writer.flush() == 1
+    assert writer.stats()['dropped'] == 1
+    assert writer.flush() == 1
+    assert set(collection.documents) == {(('session_id', 'a'),), (('session_id', 'c'),)}
+
+
+def test_failed_lookup_counts_as_attempt():
+    collection = FakeCollection()
+    collection.failures.append(AutoReconnect('connection dropped'))
+    collection.lookup_failures = 10
+    writer = make_writer(collection, retry_backoff=0, max_attempts=3)
+    writer.update({'session_id': 's'}, {'$inc': {'n': 1}})
+    for _ in range(3):
+        writer.flush()
+    assert writer.stats()['pending'] == 0
+    assert writer.stats()['dropped'] == 1
+
+
+def test_flusher_survives_a_failed_flush():
+    writer = HistoryWriter(FakeCollection(), enabled=True, flush_interval=0, retry_backoff=0)
+    calls = []
+
+    def flush(match=None):
+        calls.append(match)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        with writer.lock:
+            writer.pending.clear()
+            writer.pending_count = 0
+        return 1
+
+    writer.flush = flush
+    writer.update({'session_id': 's'}, {'$inc': {'n': 1}})
+    writer.thread.join(0.5)
+    assert writer.thread.is_alive()
+    assert len(calls) >= 2
+    writer.close()
@@ -0,0 +1,75 @@
+import mongomock
+import pytest
+from jobs import JobQueue, QueueFullError
+
+
+class Flaky:
+    def __init__(self, failures, error=TimeoutError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, payload):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error('upstream failed')
+        return payload['text'].upper()
+
+
+def test_job_runs_and_is_visible_to_other_processes():
+    collection = mongomock.MongoClient().db.recommendation_jobs
+    jobs = JobQueue(Flaky(0), collection, workers=1)
+    job = jobs.submit({'text': 'advice'}, owner='user')
+    assert job['status'] in ('queued', 'running', 'done') and 'owner' not in job
+    view, owner = jobs.get(job['job_id'], wait_seconds=5)
+    assert (view['status'], view['result'], owner) == ('done', 'ADVICE', 'user')
+    # Another worker process only has the MongoDB copy
+    other = JobQueue(Flaky(0), collection)
+    view, owner = other.get(job['job_id'])
+    assert (view['status'], view['result'], owner) == ('done', 'ADVICE', 'user')
+    assert other.get('missing') == (None, None)
+
+
+def test_failures_are_retried_with_backoff():
+    handler = Flaky(2)
+    jobs = JobQueue(handler, workers=1, backoff_seconds=0.001)
+    job = jobs.submit({'text': 'advice'})
+    view, _ = jobs.get(job['job_id'], wait_seconds=5)
+    assert (view['status'], view['attempts'], view['error']) == ('done', 3, None)
+    assert jobs.stats()['retries'] == 2
+
+
+def test_job_fails_after_max_attempts_or_on_a_permanent_error():
+    jobs = JobQueue(Flaky(10), workers=1, max_attempts=2, backoff_seconds=0.001)
+    view, _ = jobs.get(jobs.submit({'text': 'a'})['job_id'], wait_seconds=5)
+    assert (view['status'], view['attempts']) == ('failed', 2)
+
+    jobs = JobQueue(Flaky(1, ValueError), workers=1, classify=lambda error: (False, None, False))
+    view, _ = jobs.get(jobs.submit({'text': 'a'})['job_id'], wait_seconds=5)
+    assert (view['status'], view['attempts'], view['error']) == ('failed', 1, 'upstream failed')
+    assert jobs.stats()['failed'] == 1
+
+
+def test_rate_limit_pauses_the_whole_pool():
+    jobs = JobQueue(Flaky(1), workers=2, classify=lambda error: (True, 0.2, True))
+    job = jobs.submit({'text': 'a'})
+    view, _ = jobs.get(job['job_id'], wait_seconds=5)
+    assert view['status'] == 'done'
+    stats = jobs.stats()
+    assert stats['rate_limited'] == 1 and stats['retries'] == 1
+
+
+def test_full_queue_sheds_load():
+    # No workers: jobs stay queued
+    jobs = JobQueue(Flaky(0), workers=0, max_pending=1)
+    jobs.submit({'text': 'a'})
+    with pytest.raises(QueueFullError):
+        jobs.submit({'text': 'b'})
+
+
+def test_finished_jobs_expire():
+    jobs = JobQueue(Flaky(0), workers=1, ttl_seconds=0)
+    first = jobs.submit({'text': 'a'})
+    jobs.get(first['job_id'], wait_seconds=5)
+    jobs.submit({'text': 'b'})
+    assert jobs.get(first['job_id']) == (None, None)
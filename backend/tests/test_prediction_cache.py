@@ -0,0 +1,49 @@
+import numpy as np
+from prediction_cache import PredictionCache, make_key
+
+
+def test_key_is_content_addressed():
+    assert make_key('heart', 'v1', [1, 2.0, -0.0]) == make_key('heart', 'v1', np.array([1.0, 2.0, 0.0]))
+    assert make_key('heart', 'v1', [1, 2]) != make_key('heart', 'v2', [1, 2])
+    assert make_key('heart', 'v1', [1, 2]) != make_key('heart', 'v1', [1, 3])
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('prediction_cache.time.monotonic', lambda: now[0])
+    cache = PredictionCache(ttl_seconds=10)
+    cache.set('a', 1)
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+def test_invalidate_drops_older_versions():
+    cache = PredictionCache()
+    cache.set(make_key('heart', 'v1', [1]), 'old')
+    cache.set(make_key('heart', 'v2', [1]), 'new')
+    cache.set(make_key('lung', 'v1', [1]), 'other')
+    cache.invalidate('heart', 'v2')
+    assert cache.get(make_key('heart', 'v1', [1])) is None
+    assert cache.get(make_key('heart', 'v2', [1])) == 'new'
+    assert cache.get(make_key('lung', 'v1', [1])) == 'other'
@@ -0,0 +1,77 @@
+from prompts import CHAT_PREAMBLE, PromptBuilder, TokenCounter
+
+
+# Character estimate only: the local tokenizer would download its vocabulary
+def estimating_counter():
+    counter = TokenCounter('gemini-test')
+    counter.tokenizer_loaded = True
+    return counter
+
+
+def turns(count, length=40):
+    return [{'user': i % 2 == 0, 'message': f'{i:03d}' + 'x' * length} for i in range(count)]
+
+
+def chat(builder, messages, recommendation='Eat well.'):
+    return builder.chat('heart', 'Age 50', 'Positive', recommendation, 'Talked about diet.', messages)
+
+
+def test_short_conversation_is_kept_whole():
+    builder = PromptBuilder(estimating_counter(), token_budget=4000)
+    prompt = chat(builder, turns(6))
+    assert prompt.preamble is CHAT_PREAMBLE
+    assert all(message['message'] in prompt.text for message in turns(6))
+    assert 'Summary of the earlier conversation: Talked about diet.' in prompt.text
+    assert builder.stats()['trimmed'] == 0
+
+
+def test_oldest_turns_are_dropped_to_fit_the_budget():
+    counter = estimating_counter()
+    preamble_tokens = counter.count(CHAT_PREAMBLE.text)
+    builder = PromptBuilder(counter, token_budget=preamble_tokens + 200)
+    messages = turns(40)
+    prompt = chat(builder, messages)
+    assert counter.count(prompt.text) <= 200
+    kept = [message for message in messages if message['message'] in prompt.text]
+    assert kept and len(kept) < len(messages)
+    # A recent run of turns, always ending with the last message
+    assert kept == messages[-len(kept):]
+    assert builder.stats()['trimmed'] == 1
+
+
+def test_last_message_is_kept_even_over_budget():
+    counter = estimating_counter()
+    builder = PromptBuilder(counter, token_budget=counter.count(CHAT_PREAMBLE.text) + 50)
+    messages = turns(3, length=1000)
+    prompt = chat(builder, messages)
+    assert messages[-1]['message'] in prompt.text
+    assert messages[-2]['message'] not in prompt.text
+
+
+def test_long_recommendation_is_cut_to_its_share():
+    counter = estimating_counter()
+    builder = PromptBuilder(counter, token_budget=counter.count(CHAT_PREAMBLE.text) + 400, recommendation_share=0.25)
+    prompt = chat(builder, turns(2), recommendation='advice ' * 1000)
+    line = next(line for line in prompt.text.splitlines() if line.startswith('Recommendation: '))
+    assert line.endswith('[...]')
+    assert counter.count(line) <= 100 + 10
+
+
+def test_recommendation_findings_are_cut_to_the_budget():
+    counter = estimating_counter()
+    builder = PromptBuilder(counter, token_budget=1000)
+    prompt = builder.recommendation('Health parameters: Age 50', 'Positive')
+    assert prompt.text == 'Health parameters: Age 50\n\nThe diagnosis is: Positive.'
+    prompt = builder.recommendation('value ' * 10000, 'Positive')
+    assert counter.count(prompt.preamble.text) + counter.count(prompt.text) <= 1000 + 5
+    assert prompt.text.endswith('The diagnosis is: Positive.')
+
+
+def test_estimate_is_calibrated_on_reported_usage():
+    counter = estimating_counter()
+    builder = PromptBuilder(counter)
+    prompt = builder.recommendation('Health parameters: Age 50', 'Positive')
+    usage = type('Usage', (), {'prompt_token_count': len(prompt) // 2})()
+    builder.observe(prompt, type('Response', (), {'usage_metadata': usage})())
+    assert counter.calibrations == 1
+    assert counter.chars_per_token < 4.0
@@ -0,0 +1,124 @@
+import threading
+import time
+from recommendation_cache import RecommendationCache, recommendation_key
+
+RECORD = {'Glucose': 148, 'BMI': 33.6, 'Age': 50, 'prediction': 'Positive'}
+
+
+# Local stand-in for the genai client: counts generate_content calls
+class FakeModels:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, model, contents, **kwargs):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        return type('Response', (), {'text': f'recommendation {call}'})()
+
+
+def generator(models):
+    return lambda: models.generate_content(model='fake', contents='prompt').text
+
+
+# Minimal prediction_history collection for warm_from_history
+class FakeCursor(list):
+    def sort(self, field, direction):
+        return FakeCursor(sorted(self, key=lambda document: document[field], reverse=direction < 0))
+
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+
+class FakeHistory:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        return FakeCursor(document for document in self.documents if document.get('recommendation'))
+
+
+def test_cache_hit_skips_upstream():
+    models = FakeModels()
+    cache = RecommendationCache(None)
+    first = cache.get_or_generate('diabetes', RECORD, generator(models))
+    second = cache.get_or_generate('diabetes', dict(RECORD), generator(models))
+    assert first == second == 'recommendation 1'
+    assert models.calls == 1
+    assert cache.stats()['upstream_calls'] == 1
+
+
+def test_key_ignores_formatting_but_not_values():
+    assert recommendation_key('diabetes', {'Glucose': '148', ' BMI': 33.6, 'prediction': 'positive '}) == \
+        recommendation_key('diabetes', {'Glucose': 148.0, 'BMI': '33.6', 'prediction': 'Positive'})
+    assert recommendation_key('diabetes', RECORD) != recommendation_key('diabetes', dict(RECORD, Glucose=149))
+    assert recommendation_key('diabetes', RECORD) != recommendation_key('diabetes', dict(RECORD, prediction='Negative'))
+
+
+def test_new_model_version_misses():
+    models = FakeModels()
+    versions = {'diabetes': 'v1'}
+    cache = RecommendationCache(None, model_version=versions.get)
+    cache.get_or_generate('diabetes', RECORD, generator(models))
+    versions['diabetes'] = 'v2'
+    assert cache.get_or_generate('diabetes', RECORD, generator(models)) == 'recommendation 2'
+    assert models.calls == 2
+
+
+def test_concurrent_misses_share_one_call():
+    models = FakeModels(delay=0.1)
+    cache = RecommendationCache(None)
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        start.wait()
+        results.append(cache.get_or_generate('diabetes', RECORD, generator(models)))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert models.calls == 1
+    assert results == ['recommendation 1'] * 8
+    assert cache.stats()['shared_calls'] == 7
+
+
+def test_failed_call_is_not_cached():
+    cache = RecommendationCache(None)
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    try:
+        cache.get_or_generate('diabetes', RECORD, fail)
+    except RuntimeError:
+        pass
+    models = FakeModels()
+    assert cache.get_or_generate('diabetes', RECORD, generator(models)) == 'recommendation 1'
+
+
+def test_warm_from_history():
+    history = FakeHistory([
+        {'disease': 'diabetes', 'input_data': RECORD, 'recommendation': 'saved', 'updated_at': 2,
+         'recommendation_model_version': 'v1'},
+        {'disease': 'diabetes', 'input_data': dict(RECORD, Age=60), 'recommendation': 'old model', 'updated_at': 1,
+         'recommendation_model_version': 'v0'},
+    ])
+    models = FakeModels()
+    cache = RecommendationCache(None, model_version=lambda disease: 'v1')
+    assert cache.warm_from_history(history) == 1
+    assert cache.get_or_generate('diabetes', RECORD, generator(models)) == 'saved'
+    assert models.calls == 0
+    assert cache.get_cached('diabetes', dict(RECORD, Age=60)) is None
+
+
+def test_empty_recommendations_are_not_cached():
+    cache = RecommendationCache(None)
+    cache.put('diabetes', RECORD, '')
+    assert cache.get(cache.key('diabetes', RECORD)) is None
+    assert cache.get_or_generate('diabetes', RECORD, lambda: 'generated') == 'generated'
@@ -0,0 +1,96 @@
+import numpy as np
+from shadow import ShadowEvaluator
+
+
+class FakeSchema:
+    def __init__(self, features):
+        self.features = features
+
+
+# Predicts 1 where the first feature is above its threshold
+class FakeModelSet:
+    def __init__(self, version, threshold=0.5, features=('a', 'b')):
+        self.version = version
+        self.threshold = threshold
+        self.schema = FakeSchema(list(features))
+
+    def predict(self, rows):
+        return (rows[:, 0] > self.threshold).astype(int)
+
+
+class FakeRegistry:
+    def __init__(self, live, candidate=None):
+        self.live = live
+        self.staged = candidate
+
+    def get(self, disease):
+        return self.live
+
+    def candidate(self, disease):
+        return self.staged
+
+
+# Wait for the queued background work, a new pool is started on next use
+def drain(shadow):
+    shadow._executor().shutdown(wait=True)
+    shadow.executor = None
+
+
+def loaded(registry, **options):
+    shadow = ShadowEvaluator(registry, **options)
+    shadow.candidate('heart')
+    drain(shadow)
+    return shadow
+
+
+def score(shadow, live, rows):
+    predictions = live.predict(rows)
+    shadow.observe('heart', live, rows, predictions, 0.001)
+    drain(shadow)
+
+
+def test_candidate_scores_the_same_rows_in_the_background():
+    live = FakeModelSet('v1', threshold=0.5)
+    shadow = loaded(FakeRegistry(live, FakeModelSet('v2', threshold=0.7)))
+    score(shadow, live, np.array([[0.1, 0], [0.6, 0], [0.8, 0], [0.9, 0]]))
+    stats = shadow.stats()
+    assert (stats['rows'], stats['agreed'], stats['agreement_rate']) == (4, 3, 0.75)
+    comparison = stats['comparisons'][0]
+    assert (comparison['live_version'], comparison['candidate_version'], comparison['calls']) == ('v1', 'v2', 1)
+
+
+def test_nothing_is_shadowed_without_a_usable_candidate():
+    live = FakeModelSet('v1')
+    for candidate in (None, FakeModelSet('v1'), FakeModelSet('v2', features=('a', 'c'))):
+        shadow = loaded(FakeRegistry(live, candidate))
+        assert shadow.candidate('heart') is None
+        score(shadow, live, np.zeros((2, 2)))
+        assert shadow.stats()['rows'] == 0
+
+
+def test_rows_are_skipped_when_too_many_wait():
+    live = FakeModelSet('v1')
+    shadow = loaded(FakeRegistry(live, FakeModelSet('v2')), max_pending=0)
+    score(shadow, live, np.zeros((2, 2)))
+    assert shadow.stats()['skipped'] == 1 and shadow.stats()['rows'] == 0
+
+
+def test_candidate_failure_is_counted():
+    live = FakeModelSet('v1')
+    candidate = FakeModelSet('v2')
+    candidate.predict = lambda rows: 1 / 0
+    shadow = loaded(FakeRegistry(live, candidate))
+    score(shadow, live, np.zeros((2, 2)))
+    assert shadow.stats()['errors'] == 1 and shadow.stats()['pending'] == 0
+
+
+def test_traffic_share_is_routed_to_the_candidate():
+    live = FakeModelSet('v1')
+    candidate = FakeModelSet('v2')
+    assert loaded(FakeRegistry(live, candidate), traffic_percent=100).route('heart') is candidate
+    assert loaded(FakeRegistry(live, candidate), traffic_percent=0).route('heart') is None
+
+
+def test_disabled_evaluator_has_no_candidate():
+    shadow = ShadowEvaluator(FakeRegistry(FakeModelSet('v1'), FakeModelSet('v2')), enabled=False)
+    assert shadow.candidate('heart') is None
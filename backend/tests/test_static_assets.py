@@ -0,0 +1,66 @@
+import gzip
+import pytest
+import static_assets
+from static_assets import StaticAssets, cached_response, compressed_variants, make_etag, negotiate
+
+BODY = b'<html>' + b'x' * 4096 + b'</html>'
+
+
+def test_negotiate_prefers_the_best_accepted_encoding():
+    assert negotiate('gzip, deflate', {'gzip': b''}) == 'gzip'
+    assert negotiate('gzip;q=0', {'gzip': b''}) is None
+    assert negotiate('*', {'gzip': b''}) == 'gzip'
+    assert negotiate('br', {'gzip': b''}) is None
+    assert negotiate(None, {'gzip': b''}) is None
+    assert negotiate('gzip;q=bad', {'gzip': b''}) is None
+
+
+def test_negotiate_prefers_brotli_when_available():
+    if static_assets.brotli is None:
+        pytest.skip('brotli is not installed')
+    assert negotiate('gzip, br', {'gzip': b'', 'br': b''}) == 'br'
+    assert negotiate('gzip, br;q=0', {'gzip': b'', 'br': b''}) == 'gzip'
+
+
+def test_cached_response_sends_the_compressed_variant():
+    variants = {'gzip': gzip.compress(BODY)}
+    response = cached_response(BODY, make_etag(BODY), variants, {'Accept-Encoding': 'gzip'}, 'no-cache', 'text/html')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_cached_response_answers_304_per_encoding():
+    etag = make_etag(BODY)
+    variants = {'gzip': gzip.compress(BODY)}
+    compressed = cached_response(BODY, etag, variants, {'Accept-Encoding': 'gzip'}, 'no-cache', 'text/html')
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']}
+    assert cached_response(BODY, etag, variants, headers, 'no-cache', 'text/html').status_code == 304
+    # The gzip ETag does not validate the identity representation
+    headers = {'If-None-Match': compressed.headers['ETag']}
+    response = cached_response(BODY, etag, variants, headers, 'no-cache', 'text/html')
+    assert response.status_code == 200 and response.get_data() == BODY
+    headers = {'If-None-Match': 'W/' + etag}
+    assert cached_response(BODY, etag, variants, headers, 'no-cache', 'text/html').status_code == 304
+
+
+def test_small_bodies_are_not_compressed():
+    assert compressed_variants(b'{}') == {}
+
+
+def test_assets_are_served_with_their_cache_policy(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'index.html').write_bytes(BODY)
+    (tmp_path / 'assets' / 'index-AbC12_xY.js').write_bytes(b'console.log(1)')
+    assert static_assets.precompress(str(tmp_path)) >= 1
+    assets = StaticAssets(str(tmp_path))
+    index = assets.response('/', {'Accept-Encoding': 'gzip'})
+    assert index.headers['Cache-Control'] == 'no-cache'
+    assert gzip.decompress(index.get_data()) == BODY
+    script = assets.response('/assets/index-AbC12_xY.js', {})
+    assert script.headers['Cache-Control'] == static_assets.IMMUTABLE
+    # Client-side routes get index.html, missing files nothing
+    assert assets.response('/disease-form/heart', {}).get_data() == BODY
+    assert assets.response('/missing.js', {}) is None
+    assert assets.stats()['files'] == 2
@@ -1,6 +1,12 @@
 import os
+import sys
+import time
 import pickle
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 
@@ -8,139 +14,149 @@ from sklearn.ensemble import RandomForestClassifier
 BASE_DIR = os.path.dirname(__file__)  # training folder
 DATA_DIR = BASE_DIR  # datasets in training/
 MODEL_DIR = BASE_DIR  # models and scalers in training/
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')  # parsed datasets
 
-def save_pickle(obj, file_name):
-    with open(os.path.join(MODEL_DIR, file_name), 'wb') as f:
-        pickle.dump(obj, f)
-
-# --------- DIABETES ---------
-def train_diabetes():
-    df = pd.read_csv(os.path.join(DATA_DIR, 'diabetes.csv'))
-    X = df.drop('Outcome', axis=1)
-    y = df['Outcome']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+# Make the backend serving modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.abspath(BASE_DIR)))
+from forest_engine import compile_forest, verify_forest, benchmark
+from model_registry import release_dir, publish_release, new_release_version, read_pointer, stage_candidate, CANDIDATE_FILE
+from disease_specs import DISEASES
+from feature_schema import FeatureSchema
 
-    model = RandomForestClassifier()
-    model.fit(X_scaled, y)
-
-    save_pickle(model, 'diabetes_model.pkl')
-    save_pickle(scaler, 'diabetes_scaler.pkl')
-    print("Diabetes model and scaler saved.")
-
-# --------- HEART ---------
-def train_heart():
-    df = pd.read_csv(os.path.join(DATA_DIR, 'heart.csv'))
-    X = df.drop('target', axis=1)
-    y = df['target']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+# Fixed seed so retraining on the same data gives the same models
+RANDOM_STATE = int(os.getenv('TRAIN_RANDOM_STATE', '42'))
 
-    model = RandomForestClassifier()
-    model.fit(X_scaled, y)
-
-    save_pickle(model, 'heart_model.pkl')
-    save_pickle(scaler, 'heart_scaler.pkl')
-    print("Heart model and scaler saved.")
-
-# --------- LUNG ---------
-def train_lung():
-    df = pd.read_csv(os.path.join(DATA_DIR, 'lung.csv'))
-    #print("Lung Columns:", df.columns)  # Debug
-
-    target_col = 'LUNG_CANCER'
-    if target_col not in df.columns:
-        raise KeyError(f"Lung dataset must have '{target_col}' as target column.")
-
-    X = df.drop(target_col, axis=1)
-    y = df[target_col]
+def save_pickle(obj, directory, file_name):
+    with open(os.path.join(directory, file_name), 'wb') as f:
+        pickle.dump(obj, f)
 
-    # Encode categorical columns
-    cat_cols = X.select_dtypes(include='object').columns
+# --------- DATASETS ---------
+# Parse a CSV once and keep it as one array per column, keyed by the file content,
+# so later runs load it without going through the CSV parser
+def load_dataset(file_name):
+    path = os.path.join(DATA_DIR, file_name)
+    with open(path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f'{file_name}.{digest}.npz')
+    if os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            columns = [str(name) for name in data['columns']]
+            return pd.DataFrame({name: data[f'column_{i}'] for i, name in enumerate(columns)})
+
+    df = pd.read_csv(path)
+    arrays = {}
+    for i, name in enumerate(df.columns):
+        # Text columns are stored as fixed width strings so no pickle is needed
+        numeric = df[name].dtype.kind in 'biuf'
+        arrays[f'column_{i}'] = df[name].to_numpy() if numeric else df[name].to_numpy(dtype=str)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path + '.tmp', 'wb') as f:
+        np.savez(f, columns=np.array(df.columns, dtype=str), **arrays)
+    os.replace(cache_path + '.tmp', cache_path)
+    return df
+
+# --------- PIPELINE ---------
+# Train one disease from its spec into the release `version`, returns its timings in seconds.
+# A candidate release is staged for shadow evaluation instead of being published.
+def train_disease(disease, version, n_jobs=1, run_benchmark=False, candidate=False):
+    spec = DISEASES[disease]
+    timings = {}
+
+    started = time.perf_counter()
+    df = load_dataset(spec['csv'])
+    if spec['target'] not in df.columns:
+        raise KeyError(f"{disease.capitalize()} dataset must have '{spec['target']}' as target column.")
+    X = df.drop(columns=[spec['target']] + spec['drop'])
+    y = df[spec['target']]
+    if list(X.columns) != spec['features']:
+        raise KeyError(f"{disease.capitalize()} dataset columns do not match its features in disease_specs.py")
+
+    # Encode categorical columns (e.g., lung GENDER)
     le_dict = {}
-    for col in cat_cols:
+    for col in spec['categorical']:
         le = LabelEncoder()
         X[col] = le.fit_transform(X[col])
         le_dict[col] = le
-    save_pickle(le_dict, 'lung_encoders.pkl')
+    timings['load'] = time.perf_counter() - started
 
+    started = time.perf_counter()
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    model = RandomForestClassifier()
+    model = RandomForestClassifier(n_jobs=n_jobs, random_state=RANDOM_STATE)
     model.fit(X_scaled, y)
-
-    save_pickle(model, 'lung_model.pkl')
-    save_pickle(scaler, 'lung_scaler.pkl')
-    print("Lung model, scaler, and encoders saved.")
-
-# --------- PARKINSON ---------
-def train_parkinson():
-    df = pd.read_csv(os.path.join(DATA_DIR, 'parkinsons.csv'))
-    #print("Parkinson Columns:", df.columns)  # Debug
-
-    # Drop ID/Name column if it exists
-    if 'name' in df.columns:
-        df = df.drop('name', axis=1)
-    elif 'id' in df.columns:
-        df = df.drop('id', axis=1)
-    elif 'phon_R01_S01_1' in df.columns:
-        df = df.drop('phon_R01_S01_1', axis=1)
+    # Serving predicts a few rows at a time, where extra threads only add overhead
+    model.set_params(n_jobs=None)
+    timings['fit'] = time.perf_counter() - started
+
+    # Export the forest with the scaler folded in for the compiled serving engine
+    started = time.perf_counter()
+    directory = release_dir(MODEL_DIR, disease, version)
+    os.makedirs(directory, exist_ok=True)
+    save_pickle(model, directory, f'{disease}_model.pkl')
+    save_pickle(scaler, directory, f'{disease}_scaler.pkl')
+    save_pickle(le_dict, directory, f'{disease}_encoders.pkl')
+    FeatureSchema.from_training(disease, X, le_dict).save(os.path.join(directory, f'{disease}_schema.json'))
+    forest = compile_forest(model, scaler)
+    verify_forest(forest, model, scaler, X)
+    forest.save_arrays(os.path.join(directory, f'{disease}_forest'))
+    # Every artifact is written, the server can swap to (or shadow) the release now
+    if candidate:
+        stage_candidate(MODEL_DIR, disease, version)
     else:
-        # Try dropping the first column as ID
-        df = df.drop(df.columns[0], axis=1)
-    
-    X = df.drop('status', axis=1)
-    y = df['status']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    model = RandomForestClassifier()
-    model.fit(X_scaled, y)
-
-    save_pickle(model, 'parkinsons_model.pkl')
-    save_pickle(scaler, 'parkinsons_scaler.pkl')
-    print("Parkinson model and scaler saved.")
-
-
-# --------- LIVER ---------
-def train_liver():
-    df = pd.read_csv(os.path.join(DATA_DIR, 'Liver.csv'))
-    #print("Liver Columns:", df.columns)  # Debug
-
-    target_col = 'Diagnosis'
-    if target_col not in df.columns:
-        raise KeyError(f"Liver dataset must have '{target_col}' as target column.")
-
-    X = df.drop(target_col, axis=1)
-    y = df[target_col]
-
-    # Encode categorical columns (e.g., Gender)
-    cat_cols = X.select_dtypes(include='object').columns
-    le_dict = {}
-    for col in cat_cols:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col])
-        le_dict[col] = le
-    save_pickle(le_dict, 'liver_encoders.pkl')
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    model = RandomForestClassifier()
-    model.fit(X_scaled, y)
-
-    save_pickle(model, 'liver_model.pkl')
-    save_pickle(scaler, 'liver_scaler.pkl')
-    print("Liver model, scaler, and encoders saved.")
+        publish_release(MODEL_DIR, disease, version)
+    timings['export'] = time.perf_counter() - started
+
+    if run_benchmark:
+        benchmark(disease, model, scaler, forest, X)
+    return timings
+
+def print_report(results, wall_clock):
+    print(f"{'disease':<12}{'load':>9}{'fit':>9}{'export':>9}{'total':>9}")
+    for disease, timings in results.items():
+        total = sum(timings.values())
+        print(f"{disease:<12}{timings['load']:>8.2f}s{timings['fit']:>8.2f}s{timings['export']:>8.2f}s{total:>8.2f}s")
+    work = sum(sum(timings.values()) for timings in results.values())
+    print(f"Trained {len(results)} models in {wall_clock:.2f}s wall clock ({work:.2f}s of work)")
+
+# Train the diseases in parallel, one process per disease, sharing the cores between their fits
+def train_all(diseases, workers=None, run_benchmark=False, candidate=False):
+    version = new_release_version()
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(diseases)))
+    n_jobs = max(1, cpus // workers)
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = {disease: train_disease(disease, version, n_jobs, run_benchmark, candidate) for disease in diseases}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                disease: executor.submit(train_disease, disease, version, n_jobs, run_benchmark, candidate)
+                for disease in diseases
+            }
+            results = {disease: future.result() for disease, future in futures.items()}
+    print_report(results, time.perf_counter() - started)
+    return results
 
 # -------------------- MAIN --------------------
 if __name__ == '__main__':
-    train_diabetes()
-    train_heart()
-    train_lung()
-    train_parkinson()
-    train_liver()
+    parser = argparse.ArgumentParser(description='Train the disease models and publish them as a new release')
+    parser.add_argument('diseases', nargs='*', help=f"diseases to train (default: all of {', '.join(DISEASES)})")
+    parser.add_argument('--workers', type=int, default=None, help='training processes (default: one per core)')
+    parser.add_argument('--benchmark', action='store_true', help='compare sklearn and compiled single-row latency')
+    parser.add_argument('--candidate', action='store_true', help='stage the new models as candidates for shadow evaluation instead of serving them')
+    parser.add_argument('--promote', action='store_true', help='publish the staged candidates without training')
+    args = parser.parse_args()
+
+    unknown = [disease for disease in args.diseases if disease not in DISEASES]
+    if unknown:
+        parser.error(f"unknown disease: {', '.join(unknown)}")
+    if args.promote:
+        for disease in args.diseases or list(DISEASES):
+            version = read_pointer(MODEL_DIR, disease, CANDIDATE_FILE)
+            if version:
+                publish_release(MODEL_DIR, disease, version)
+                print(f"{disease}: promoted candidate {version}")
+    else:
+        train_all(args.diseases or list(DISEASES), args.workers, args.benchmark, args.candidate)
@@ -2,12 +2,12 @@ import { useEffect, useState } from "react";
 import { useAuth } from "@/context/AuthContext";
 import PredictionHistory from "@/components/PredictionHistory";
 import api from "@/lib/api";
-import type { diseaseInputs } from "@/data/diseaseInputs";
+import type { Disease } from "@/lib/diseases";
 import { useNotification } from "@/context/Notification";
 
 export interface Predictions {
   session_id: string;
-  disease: keyof typeof diseaseInputs;
+  disease: Disease;
   updated_at: string;
   prediction: string;
 }
@@ -17,7 +17,9 @@ export default function Profile() {
   const { showNotification } = useNotification();
 
   const [history, setHistory] = useState<Predictions[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchHistory = async () => {
@@ -25,6 +27,7 @@ export default function Profile() {
       try {
         const response = await api.get(`/api/prediction_history`);
         setHistory(response.data.history || []);
+        setNextCursor(response.data.next_cursor || null);
       } catch (e) {
         console.error(e);
         showNotification("Error fetching history", "error");
@@ -35,6 +38,23 @@ export default function Profile() {
     if (user) fetchHistory();
   }, [user]);
 
+  const loadMoreHistory = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(`/api/prediction_history`, {
+        params: { cursor: nextCursor },
+      });
+      setHistory((prev) => [...prev, ...(response.data.history || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (e) {
+      console.error(e);
+      showNotification("Error fetching history", "error");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (!user) {
     return (
       <div className="max-w-2xl mx-auto mt-16 p-8 bg-white rounded-2xl shadow text-center">
@@ -85,6 +105,15 @@ export default function Profile() {
             }}
           >
             <PredictionHistory history={history} />
+            {nextCursor && (
+              <button
+                onClick={loadMoreHistory}
+                disabled={loadingMore}
+                className="mt-4 text-emerald-600 hover:underline disabled:text-gray-400"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
         )}
       </div>
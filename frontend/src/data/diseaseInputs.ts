@@ -1,659 +0,0 @@
-import {
-  type LucideIcon,
-  Ruler,
-  Baby,
-  Droplet,
-  HeartPulse,
-  Syringe,
-  Activity,
-  BarChart2,
-  LineChart,
-  Calendar,
-  User,
-  Flame,
-  Brain,
-  ActivitySquare,
-  Slash,
-  TrendingDown,
-  Layers,
-  Shield,
-  Wine,
-  AlarmSmoke,
-  AlertTriangle,
-  PersonStanding,
-  Thermometer,
-  Zap,
-  FlaskConical,
-  Cigarette,
-  Hand,
-  Users,
-  BatteryLow,
-  Asterisk,
-  Wind,
-  Mic,
-  Heart,
-  ArrowUpCircle,
-  ArrowDownCircle,
-  Percent,
-  AudioWaveform,
-  Waves,
-  Sun,
-  Volume2,
-  BarChart,
-  Grid3x3,
-  MoveDiagonal,
-  Repeat,
-  VolumeX,
-  Settings2,
-} from "lucide-react";
-
-interface InputFieldBase {
-  name: string;
-  label: string;
-  type: "number" | "switch" | "checkbox";
-  icon: LucideIcon;
-}
-
-interface NumberInput extends InputFieldBase {
-  type: "number";
-  min?: number;
-  max?: number;
-  step?: number;
-  unit?: string;
-}
-
-interface SwitchInput extends InputFieldBase {
-  type: "switch";
-  options?: string[];
-}
-
-interface CheckboxInput extends InputFieldBase {
-  type: "checkbox";
-}
-
-type InputField = NumberInput | SwitchInput | CheckboxInput;
-
-export interface DiseaseInputs {
-  liver: InputField[];
-  lung: InputField[];
-  diabetes: InputField[];
-  heart: InputField[];
-  parkinsons: InputField[];
-}
-
-const diabetesFields: DiseaseInputs["diabetes"] = [
-  {
-    name: "Pregnancies",
-    label: "Number of Pregnancies",
-    icon: Baby,
-    type: "number",
-    min: 0,
-    max: 20,
-  },
-  {
-    name: "Glucose",
-    label: "Glucose Level",
-    icon: Droplet,
-    type: "number",
-    unit: "mg/dL",
-    min: 0,
-    max: 500,
-  },
-  {
-    name: "BloodPressure",
-    label: "Blood Pressure",
-    icon: Activity,
-    type: "number",
-    unit: "mmHg",
-    min: 0,
-    max: 180,
-  },
-  {
-    name: "SkinThickness",
-    label: "Skin Thickness (mm)",
-    icon: Ruler,
-    type: "number",
-    unit: "mm",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Insulin",
-    label: "Insulin Level",
-    icon: Syringe,
-    type: "number",
-    unit: "mu U/ml",
-    min: 0,
-    max: 1000,
-  },
-  {
-    name: "BMI",
-    label: "Body Mass Index",
-    icon: BarChart2,
-    type: "number",
-    unit: "",
-    step: 0.01,
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "DiabetesPedigreeFunction",
-    label: "Diabetes Pedigree Function",
-    icon: LineChart,
-    type: "number",
-    min: 0,
-    max: 5,
-  },
-  {
-    name: "Age",
-    label: "Age",
-    icon: Calendar,
-    type: "number",
-    min: 0,
-    max: 120,
-  },
-];
-
-const heartFields: DiseaseInputs["heart"] = [
-  {
-    name: "age",
-    label: "Age",
-    icon: Calendar,
-    type: "number",
-    unit: "years",
-    min: 0,
-    max: 120,
-  },
-  {
-    name: "sex",
-    label: "Are You Male ?",
-    icon: User,
-    type: "checkbox",
-  },
-  {
-    name: "cp",
-    label: "Chest Pain Type (1-4)",
-    icon: HeartPulse,
-    type: "number",
-    min: 1,
-    max: 4,
-  },
-  {
-    name: "trestbps",
-    label: "Resting Blood Pressure",
-    icon: Activity,
-    type: "number",
-    unit: "mmHg",
-    min: 0,
-    max: 300,
-  },
-  {
-    name: "chol",
-    label: "Cholesterol (mg/dL)",
-    icon: Droplet,
-    type: "number",
-    unit: "mg/dL",
-    min: 0,
-    max: 1000,
-  },
-  {
-    name: "fbs",
-    label: "Fasting Blood Sugar > 120 mg/dL",
-    icon: Flame,
-    type: "switch",
-    options: ["No", "Yes"],
-  },
-  {
-    name: "restecg",
-    label: "Resting ECG Results",
-    icon: Brain,
-    type: "number",
-    min: 0,
-    max: 2,
-  },
-  {
-    name: "thalach",
-    label: "Maximum Heart Rate Achieved",
-    icon: ActivitySquare,
-    type: "number",
-    unit: "bpm",
-    min: 0,
-    max: 300,
-  },
-  {
-    name: "exang",
-    label: "Exercise Induced Angina",
-    icon: Slash,
-    type: "switch",
-  },
-  {
-    name: "oldpeak",
-    label: "ST Depression",
-    icon: TrendingDown,
-    type: "number",
-    unit: "",
-    step: 0.1,
-    min: 0,
-    max: 10,
-  },
-  {
-    name: "slope",
-    label: "Slope of Peak Exercise ST Segment",
-    icon: BarChart2,
-    type: "number",
-    min: 1,
-    max: 3,
-  },
-  {
-    name: "ca",
-    label: "Number of Major Vessels",
-    icon: Layers,
-    type: "number",
-    min: 0,
-    max: 3,
-  },
-  {
-    name: "thal",
-    label: "Thalassemia (1-3)",
-    icon: Shield,
-    type: "number",
-    min: 1,
-    max: 3,
-  },
-];
-
-const liverFields: DiseaseInputs["liver"] = [
-  {
-    name: "Age",
-    label: "Age",
-    icon: Calendar,
-    type: "number",
-    unit: "years",
-    min: 0,
-    max: 120,
-  },
-  {
-    name: "Gender",
-    label: "Are You Male ?",
-    icon: User,
-    type: "checkbox",
-  },
-  {
-    name: "BMI",
-    label: "Body Mass Index",
-    icon: BarChart2,
-    type: "number",
-    unit: "mg/dL",
-    step: 0.1,
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "AlcoholConsumption",
-    label: "Alcohol Consumption Level",
-    icon: Wine,
-    type: "number",
-    unit: "mg/dL",
-    step: 0.1,
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Smoking",
-    label: "Do You Smoke ?",
-    icon: AlarmSmoke,
-    type: "switch",
-    options: ["No", "Yes"],
-  },
-  {
-    name: "GeneticRisk",
-    label: "Genetic Risk Level",
-    icon: AlertTriangle,
-    type: "number",
-    min: 0,
-    max: 10,
-    step: 0.1,
-  },
-  {
-    name: "PhysicalActivity",
-    label: "Physical Activity Index",
-    icon: PersonStanding,
-    type: "number",
-    min: 0,
-    max: 10,
-    step: 0.1,
-  },
-  {
-    name: "Diabetes",
-    label: "Diabetes",
-    icon: Thermometer,
-    type: "switch",
-    options: ["No", "Yes"],
-  },
-  {
-    name: "Hypertension",
-    label: "Hypertension",
-    icon: Zap,
-    type: "switch",
-    options: ["No", "Yes"],
-  },
-  {
-    name: "LiverFunctionTest",
-    label: "Liver Function Test Result",
-    icon: FlaskConical,
-    type: "number",
-    min: 0,
-    max: 10,
-    step: 0.1,
-  },
-];
-
-const lungFields: DiseaseInputs["lung"] = [
-  {
-    name: "GENDER",
-    label: "Are You Male ?",
-    icon: User,
-    type: "checkbox",
-  },
-  {
-    name: "AGE",
-    label: "Age",
-    icon: Calendar,
-    type: "number",
-    unit: "years",
-    step: 1,
-    min: 0,
-    max: 120,
-  },
-  {
-    name: "SMOKING",
-    label: "Smoking Level",
-    icon: Cigarette,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "YELLOW_FINGERS",
-    label: "Yellow Fingers",
-    icon: Hand,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "ANXIETY",
-    label: "Anxiety Level",
-    icon: Brain,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "PEER_PRESSURE",
-    label: "Peer Pressure",
-    icon: Users,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "CHRONIC DISEASE",
-    label: "Chronic Disease",
-    icon: Syringe,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "FATIGUE",
-    label: "Fatigue Level",
-    icon: BatteryLow,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "ALLERGY",
-    label: "Allergy Presence",
-    icon: Asterisk,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "WHEEZING",
-    label: "Wheezing",
-    icon: Wind,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "ALCOHOL CONSUMING",
-    label: "Alcohol Consumption Level",
-    icon: Wine,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "COUGHING",
-    label: "Coughing Severity",
-    icon: Mic,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "SHORTNESS OF BREATH",
-    label: "Shortness of Breath",
-    icon: Slash,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "SWALLOWING DIFFICULTY",
-    label: "Swallowing Difficulty",
-    icon: AlertTriangle,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-  {
-    name: "CHEST PAIN",
-    label: "Chest Pain",
-    icon: Heart,
-    type: "number",
-    min: 1,
-    max: 2,
-  },
-];
-
-const parkinsonsFields: DiseaseInputs["parkinsons"] = [
-  {
-    name: "MDVP:Fo(Hz)",
-    label: "Average Vocal Fundamental Frequency (Hz)",
-    icon: Mic,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Fhi(Hz)",
-    label: "Maximum Vocal Frequency (Hz)",
-    icon: ArrowUpCircle,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Flo(Hz)",
-    label: "Minimum Vocal Frequency (Hz)",
-    icon: ArrowDownCircle,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Jitter(%)",
-    label: "Jitter Percentage",
-    icon: Percent,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Jitter(Abs)",
-    label: "Absolute Jitter",
-    icon: LineChart,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:RAP",
-    label: "Relative Average Perturbation",
-    icon: AudioWaveform,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:PPQ",
-    label: "Pitch Period Perturbation Quotient",
-    icon: Waves,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Jitter:DDP",
-    label: "DDP Jitter Metric",
-    icon: AudioWaveform,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Shimmer",
-    label: "Shimmer",
-    icon: Sun,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:Shimmer(dB)",
-    label: "Shimmer in dB",
-    icon: Volume2,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Shimmer:APQ3",
-    label: "Amplitude Perturbation Quotient (3)",
-    icon: BarChart,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Shimmer:APQ5",
-    label: "Amplitude Perturbation Quotient (5)",
-    icon: BarChart,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "MDVP:APQ",
-    label: "Average Amplitude Perturbation Quotient",
-    icon: Settings2,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "Shimmer:DDA",
-    label: "Difference of Differences of Amplitude",
-    icon: Waves,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "NHR",
-    label: "Noise-to-Harmonics Ratio",
-    icon: Slash,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "HNR",
-    label: "Harmonics-to-Noise Ratio",
-    icon: VolumeX,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "RPDE",
-    label: "Recurrence Period Density Entropy",
-    icon: Repeat,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "DFA",
-    label: "Detrended Fluctuation Analysis",
-    icon: LineChart,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "spread1",
-    label: "Nonlinear Dynamics Spread 1",
-    icon: MoveDiagonal,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "spread2",
-    label: "Nonlinear Dynamics Spread 2",
-    icon: MoveDiagonal,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "D2",
-    label: "Correlation Dimension (D2)",
-    icon: Grid3x3,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-  {
-    name: "PPE",
-    label: "Pitch Period Entropy",
-    icon: Waves,
-    type: "number",
-    min: 0,
-    max: 100,
-  },
-];
-
-export const diseaseInputs: DiseaseInputs = {
-  liver: liverFields,
-  lung: lungFields,
-  diabetes: diabetesFields,
-  heart: heartFields,
-  parkinsons: parkinsonsFields,
-};
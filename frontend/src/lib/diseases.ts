@@ -0,0 +1,142 @@
+import {
+  type LucideIcon,
+  Activity,
+  ActivitySquare,
+  AlarmSmoke,
+  AlertTriangle,
+  ArrowDownCircle,
+  ArrowUpCircle,
+  Asterisk,
+  AudioWaveform,
+  Baby,
+  BarChart,
+  BarChart2,
+  BatteryLow,
+  Brain,
+  Calendar,
+  Cigarette,
+  Droplet,
+  Flame,
+  FlaskConical,
+  Grid3x3,
+  Hand,
+  Heart,
+  HeartPulse,
+  Layers,
+  LineChart,
+  Mic,
+  MoveDiagonal,
+  Percent,
+  PersonStanding,
+  Repeat,
+  Ruler,
+  Settings2,
+  Shield,
+  Slash,
+  Sun,
+  Syringe,
+  Thermometer,
+  TrendingDown,
+  User,
+  Users,
+  Volume2,
+  VolumeX,
+  Waves,
+  Wind,
+  Wine,
+  Zap,
+} from "lucide-react";
+import api from "@/lib/api";
+
+// Prediction form of each disease, served by the backend (GET /api/diseases) from
+// the same feature schemas the models are trained with.
+
+export type Disease = "liver" | "lung" | "diabetes" | "heart" | "parkinsons";
+
+export interface InputField {
+  name: string;
+  label: string;
+  type: "number" | "switch" | "checkbox";
+  icon: string;
+  min?: number;
+  max?: number;
+  step?: number;
+  unit?: string;
+  options?: string[];
+  accepted?: [number | null, number | null]; // range the current model accepts
+  categories?: string[];
+}
+
+export interface DiseaseInfo {
+  disease: Disease;
+  model_version: string;
+  positive: string;
+  fields: InputField[];
+}
+
+export type DiseaseInputs = Record<Disease, DiseaseInfo>;
+
+// lucide icons by the name the backend uses
+export const icons: Record<string, LucideIcon> = {
+  Activity,
+  ActivitySquare,
+  AlarmSmoke,
+  AlertTriangle,
+  ArrowDownCircle,
+  ArrowUpCircle,
+  Asterisk,
+  AudioWaveform,
+  Baby,
+  BarChart,
+  BarChart2,
+  BatteryLow,
+  Brain,
+  Calendar,
+  Cigarette,
+  Droplet,
+  Flame,
+  FlaskConical,
+  Grid3x3,
+  Hand,
+  Heart,
+  HeartPulse,
+  Layers,
+  LineChart,
+  Mic,
+  MoveDiagonal,
+  Percent,
+  PersonStanding,
+  Repeat,
+  Ruler,
+  Settings2,
+  Shield,
+  Slash,
+  Sun,
+  Syringe,
+  Thermometer,
+  TrendingDown,
+  User,
+  Users,
+  Volume2,
+  VolumeX,
+  Waves,
+  Wind,
+  Wine,
+  Zap,
+};
+
+let diseaseInputs: Promise<DiseaseInputs> | null = null;
+
+// fetched once per page load, the browser revalidates it with its ETag
+export const getDiseaseInputs = () => {
+  if (!diseaseInputs) {
+    diseaseInputs = api
+      .get("/api/diseases")
+      .then(({ data }) => data.diseases as DiseaseInputs)
+      .catch((error) => {
+        diseaseInputs = null; // try again on the next use
+        throw error;
+      });
+  }
+  return diseaseInputs;
+};
@@ -1,9 +1,14 @@
 import { useEffect, useRef, useState } from "react";
-import { Loader2, MessageCircle, X } from "lucide-react";
+import { Activity, Loader2, MessageCircle, X } from "lucide-react";
 import { createFileRoute } from "@tanstack/react-router";
 import ReactMarkdown from "react-markdown";
 import api from "@/lib/api";
-import { diseaseInputs, type DiseaseInputs } from "@/data/diseaseInputs";
+import {
+  getDiseaseInputs,
+  icons,
+  type Disease,
+  type DiseaseInputs,
+} from "@/lib/diseases";
 import { AxiosError } from "axios";
 import generateUUID from "@/utils/uuid";
 import { emojis } from "@/data/emojis";
@@ -14,16 +19,20 @@ export const Route = createFileRoute("/disease-form/$disease")({
   beforeLoad: async ({ params, search }) => {
     const { disease } = params;
     const { session_id } = search as { session_id: string };
-    if (session_id) {
-      const {
-        data: { history },
-      } = await api.get(
-        `/api/session_history?session_id=${session_id}&disease=${disease}`
-      );
-      return {
-        history,
-      };
-    }
+    const [diseaseInputs, history] = await Promise.all([
+      getDiseaseInputs(),
+      session_id
+        ? api
+            .get(
+              `/api/session_history?session_id=${session_id}&disease=${disease}`
+            )
+            .then(({ data }) => data.history)
+        : null,
+    ]);
+    return {
+      diseaseInputs,
+      history,
+    };
   },
 });
 
@@ -38,11 +47,12 @@ type UserChat = {
 };
 
 function RouteComponent() {
-  const { disease } = Route.useParams() as { disease: keyof DiseaseInputs };
+  const { disease } = Route.useParams() as { disease: Disease };
   const { session_id } = Route.useSearch() as {
     session_id: string | undefined;
   };
-  const { history } = Route.useRouteContext() as {
+  const { diseaseInputs, history } = Route.useRouteContext() as {
+    diseaseInputs: DiseaseInputs;
     history: {
       prediction: string;
       recommendation: string;
@@ -139,7 +149,7 @@ function RouteComponent() {
     try {
       const {
         data: { prediction },
-      } = await api.post(`/api/predict/${disease}`, formbody); // first get the prediction from this api route
+      } = await api.post(`/api/predict/${disease}?explain=true`, formbody); // first get the prediction from this api route (explained, so the recommendation can reuse it)
       const response = await api.post(`/api/recommend/${disease}`, {
         ...formbody,
         prediction, // use the prediction as request payload
@@ -159,7 +169,7 @@ function RouteComponent() {
 
   const handleFormSubmit = (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
-    const body = diseaseInputs[disease].map((obj) => {
+    const body = diseaseInputs[disease].fields.map((obj) => {
       const input = formData[obj.name];
       const isNumber = obj.type == "number";
       return [obj.name, !isNumber && !input ? "0" : input];
@@ -216,7 +226,7 @@ function RouteComponent() {
   }
 
   const renderInput = (input: any) => {
-    const Icon = input.icon;
+    const Icon = icons[input.icon] || Activity;
     const baseInputClasses =
       "w-full px-4 py-3 rounded-lg border-2 border-gray-200 focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition-all duration-200";
     const labelClasses = "block text-lg font-medium text-gray-700 mb-2";
@@ -328,7 +338,7 @@ function RouteComponent() {
         <div
           className={`grid grid-cols-1 ${isChatOpen ? "md:px-4" : "md:grid-cols-2"} gap-6`}
         >
-          {diseaseInputs[disease].map((input) => (
+          {diseaseInputs[disease].fields.map((input) => (
             <div key={input.name}>{renderInput(input)}</div>
           ))}
         </div>